@@ -0,0 +1,37 @@
+"""
+Data locations and process settings.
+
+All paths are resolved to absolute paths at import, so every worker
+process (and every script) opens the same files no matter which
+directory it was started from.
+"""
+
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATA_DIR = Path(os.environ.get("DATA_DIR", ".")).resolve()
+DB_PATH = Path(os.environ.get("DB_PATH", DATA_DIR / "journal_forest.db")).resolve()
+CHROMA_DB_PATH = Path(os.environ.get("CHROMA_DB_PATH", DATA_DIR / "chroma_db")).resolve()
+EXACT_INDEX_PATH = Path(os.environ.get("EXACT_INDEX_PATH", DATA_DIR / "vector_index")).resolve()
+LOCK_DIR = Path(os.environ.get("LOCK_DIR", DATA_DIR / "locks")).resolve()
+
+MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY")
+
+# Chroma server for multi-worker deployments; unset means a local PersistentClient
+CHROMA_HOST = os.environ.get("CHROMA_HOST")
+CHROMA_PORT = int(os.environ.get("CHROMA_PORT", "8000"))
+
+# Postgres database shared by several hosts; unset means the SQLite file at DB_PATH
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# How long a SQLite connection waits for the write lock before failing
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.environ.get("SQLITE_BUSY_TIMEOUT_SECONDS", "10"))
+
+# How often a worker that isn't the leader tries to take over, e.g. after the leader died
+LEADER_RETRY_SECONDS = float(os.environ.get("LEADER_RETRY_SECONDS", "30"))
+
+# How long shutdown waits for in-flight model calls
+LLM_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("LLM_DRAIN_TIMEOUT_SECONDS", "30"))
@@ -0,0 +1,58 @@
+"""
+Pieces shared by the storage backends.
+
+Every backend hands out connections with the subset of the aiosqlite API
+the app uses: execute (awaited, or entered with `async with` to read the
+cursor), executemany, commit, rollback and close. Connections start a
+transaction with their first statement, and closing one rolls back what
+wasn't committed.
+"""
+
+from typing import Awaitable, Callable, Optional
+
+class Dialect:
+    """
+    SQL that can't be written the same way for every backend.
+    """
+
+    name = "generic"
+
+    # Takes a session ID and, until commit, serializes the transactions
+    # writing that session's change log, so sequence order is commit order.
+    # None where writers are serialized anyway.
+    lock_session_changes: Optional[str] = None
+
+    def week_start(self, epoch_sql: str) -> str:
+        """Expression for the ISO date of the Monday (UTC) of an epoch"""
+        raise NotImplementedError
+
+    def delete_chunk(self, table: str) -> str:
+        """DELETE of at most ? rows of a table with session_id = ?"""
+        raise NotImplementedError
+
+    async def begin_snapshot(self, db):
+        """
+        Commit what db has pending and start a read-only transaction whose
+        reads all see one snapshot of the database.
+        """
+        raise NotImplementedError
+
+class PendingConnection:
+    """
+    A connection being opened, used either as `db = await connect()` or as
+    `async with connect() as db`, like aiosqlite.connect.
+    """
+
+    def __init__(self, open_connection: Callable[[], Awaitable]):
+        self._open_connection = open_connection
+        self._db = None
+
+    def __await__(self):
+        return self._open_connection().__await__()
+
+    async def __aenter__(self):
+        self._db = await self._open_connection()
+        return self._db
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._db.close()
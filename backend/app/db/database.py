@@ -1,80 +1,42 @@
-import aiosqlite
-import os
-from pathlib import Path
-
-DB_PATH = Path("journal_forest.db")
-
-# SQLite schema from requirements
-SCHEMA = """
-CREATE TABLE IF NOT EXISTS sessions (
-    id TEXT PRIMARY KEY,
-    created_at TEXT NOT NULL,
-    updated_at TEXT NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS journal_entries (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_id TEXT NOT NULL,
-    created_at TEXT NOT NULL,
-    prompt_used TEXT,
-    raw_text TEXT NOT NULL,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
-);
-
-CREATE TABLE IF NOT EXISTS entry_analysis (
-    entry_id INTEGER PRIMARY KEY,
-    memory_summary TEXT NOT NULL,
-    patterns_reflection TEXT NOT NULL,
-    follow_up_question TEXT NOT NULL,
-    themes_json TEXT NOT NULL,
-    emotions_json TEXT NOT NULL,
-    unresolved_json TEXT NOT NULL,
-    FOREIGN KEY (entry_id) REFERENCES journal_entries(id) ON DELETE CASCADE
-);
-
-CREATE TABLE IF NOT EXISTS threads (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_id TEXT NOT NULL,
-    thread TEXT NOT NULL,
-    status TEXT NOT NULL,
-    created_at TEXT NOT NULL,
-    updated_at TEXT NOT NULL,
-    last_seen_entry_id INTEGER,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
-);
-
-CREATE TABLE IF NOT EXISTS trees (
-    entry_id INTEGER PRIMARY KEY,
-    session_id TEXT NOT NULL,
-    created_at TEXT NOT NULL,
-    type TEXT NOT NULL,
-    rarity TEXT NOT NULL,
-    display_name TEXT NOT NULL,
-    FOREIGN KEY (entry_id) REFERENCES journal_entries(id) ON DELETE CASCADE,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
-);
-
-CREATE TABLE IF NOT EXISTS streak_days (
-    session_id TEXT NOT NULL,
-    day TEXT NOT NULL,
-    PRIMARY KEY (session_id, day),
-    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
-);
+"""
+Database access for routes, services and scripts.
 
-CREATE TABLE IF NOT EXISTS prompts (
-    session_id TEXT NOT NULL,
-    created_at TEXT NOT NULL,
-    source TEXT NOT NULL,
-    prompts_json TEXT NOT NULL,
-    PRIMARY KEY (session_id, source),
-    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
-);
+With DATABASE_URL set, connections come from a Postgres pool shared by
+any number of hosts; otherwise from the SQLite file at DB_PATH. Either
+way they expose the aiosqlite API, and SQL that differs between the two
+comes from `dialect`.
 """
 
-async def get_db():
-    """Get database connection"""
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
+from starlette.requests import Request
+from app.config import DATABASE_URL, DB_PATH
+from app.db.base import PendingConnection
+from app.db.sqlite import SQLiteBackend
+
+if DATABASE_URL:
+    from app.db.postgres import PostgresBackend
+    backend = PostgresBackend(DATABASE_URL)
+else:
+    backend = SQLiteBackend(DB_PATH)
+
+dialect = backend.dialect
+
+def connect(foreign_keys: bool = False) -> PendingConnection:
+    """Open a connection, as `async with connect() as db` or `db = await connect()`"""
+    return backend.connect(foreign_keys=foreign_keys)
+
+def request_connection() -> PendingConnection:
+    """A connection set up for request handlers"""
+    return backend.connect(foreign_keys=True, named_rows=True)
+
+async def get_db(request: Request = None):
+    """
+    Get database connection. A connection middleware already opened for the
+    request (in request.state.db) is reused, and closed by that middleware.
+    """
+    db = getattr(request.state, "db", None) if request is not None else None
+    opened = db is None
+    if opened:
+        db = await request_connection()
     try:
         yield db
         await db.commit()
@@ -82,18 +44,17 @@ async def get_db():
         await db.rollback()
         raise
     finally:
-        await db.close()
+        if opened:
+            await db.close()
 
 async def init_db():
     """Initialize database with schema"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.executescript(SCHEMA)
-        await db.commit()
-        print(f"Database initialized at {DB_PATH.absolute()}")
+    await backend.init()
 
 async def reset_db():
     """Reset database by deleting and recreating"""
-    if DB_PATH.exists():
-        DB_PATH.unlink()
-    await init_db()
+    await backend.reset()
 
+async def close_db():
+    """Release pooled connections"""
+    await backend.close()
@@ -0,0 +1,303 @@
+"""
+Postgres storage backend, for running several hosts against one database.
+
+Connections are borrowed from an asyncpg pool and wrapped to behave like
+aiosqlite connections, so the app's SQL runs on both backends: `?`
+placeholders are numbered, a transaction starts with the first
+statement, and asyncpg's per-connection statement cache keeps repeated
+queries prepared. Requires the asyncpg package.
+"""
+
+import asyncio
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable
+from app.db import sqlite
+from app.db.base import Dialect, PendingConnection
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+POSTGRES_POOL_MIN_SIZE = int(os.environ.get("POSTGRES_POOL_MIN_SIZE", "1"))
+POSTGRES_POOL_MAX_SIZE = int(os.environ.get("POSTGRES_POOL_MAX_SIZE", "10"))
+# Prepared statements kept per pooled connection
+POSTGRES_STATEMENT_CACHE_SIZE = int(os.environ.get("POSTGRES_STATEMENT_CACHE_SIZE", "256"))
+
+# Advisory lock keys, shared by every host using the database
+INIT_LOCK_KEY = 7_310_001
+LEADER_LOCK_KEY = 7_310_002
+
+# SQLite types that Postgres spells differently
+TYPES = [
+    (re.compile(r"\bINTEGER PRIMARY KEY AUTOINCREMENT\b"), "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY"),
+    (re.compile(r"\bINTEGER\b"), "BIGINT"),
+    (re.compile(r"\bBLOB\b"), "BYTEA"),
+]
+
+def _postgres_ddl(sql: str) -> str:
+    for pattern, replacement in TYPES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+# Generated from the SQLite schema, its migrations and indexes so the two can't drift
+SCHEMA = _postgres_ddl("\n".join([
+    sqlite.SCHEMA,
+    *(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {declaration};"
+        for table, column, declaration in sqlite.MIGRATIONS
+    ),
+    sqlite.INDEXES,
+]))
+
+# Dropped children first by reset
+TABLES = [
+    "digest_failures", "digests", "import_jobs", "change_log", "garden_layout", "prompts", "streak_days",
+    "trees", "threads", "entry_analysis", "journal_entries", "sessions",
+]
+
+# Quoted strings are matched too, so a ? inside one isn't taken for a placeholder
+PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|\?")
+QUERY = re.compile(r"^\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+RETURNING = re.compile(r"\bRETURNING\b", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def translate(sql: str) -> str:
+    """Number the ? placeholders of a query as $1, $2, ..."""
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group(0) != "?":
+            return match.group(0)
+        count += 1
+        return f"${count}"
+
+    return PLACEHOLDER.sub(number, sql)
+
+def _status_count(status: str) -> int:
+    """Rows affected according to a command status such as "DELETE 500" """
+    last = status.rsplit(" ", 1)[-1]
+    return int(last) if last.isdigit() else -1
+
+class PostgresDialect(Dialect):
+    name = "postgres"
+    lock_session_changes = "SELECT pg_advisory_xact_lock(hashtext(?))"
+
+    def week_start(self, epoch_sql: str) -> str:
+        return f"to_char(date_trunc('week', to_timestamp({epoch_sql}) AT TIME ZONE 'UTC'), 'YYYY-MM-DD')"
+
+    def delete_chunk(self, table: str) -> str:
+        return f"DELETE FROM {table} WHERE ctid = ANY(ARRAY(SELECT ctid FROM {table} WHERE session_id = ? LIMIT ?))"
+
+    async def begin_snapshot(self, db: "PostgresConnection"):
+        # READ COMMITTED takes a new snapshot per statement
+        await db.begin(isolation="repeatable_read", readonly=True)
+
+class PostgresCursor:
+    """
+    Result of one statement. Queries entered with `async with` are only
+    run when read, so iterating one streams it through a server-side cursor.
+    """
+
+    def __init__(self, db: "PostgresConnection", sql: str, params: tuple):
+        self._db = db
+        self._sql = sql
+        self._params = params
+        self._rows = None
+        self._index = 0
+        self.rowcount = -1
+        # Rows fetched per round trip when iterated
+        self.arraysize = 100
+
+    async def _run(self, lazy: bool) -> "PostgresCursor":
+        if lazy and QUERY.match(self._sql):
+            return self
+        connection = await self._db._transaction()
+        if QUERY.match(self._sql) or RETURNING.search(self._sql):
+            self._rows = await connection.fetch(self._sql, *self._params)
+            self.rowcount = len(self._rows)
+        else:
+            self.rowcount = _status_count(await connection.execute(self._sql, *self._params))
+        return self
+
+    def __await__(self):
+        return self._run(lazy=False).__await__()
+
+    async def __aenter__(self):
+        return await self._run(lazy=True)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def _fetched(self) -> list:
+        if self._rows is None:
+            await self._run(lazy=False)
+        return self._rows or []
+
+    async def fetchone(self):
+        rows = await self._fetched()
+        if self._index >= len(rows):
+            return None
+        self._index += 1
+        return rows[self._index - 1]
+
+    async def fetchall(self) -> list:
+        rows = await self._fetched()
+        remaining = rows[self._index:]
+        self._index = len(rows)
+        return remaining
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self._rows is not None:
+            while self._index < len(self._rows):
+                self._index += 1
+                yield self._rows[self._index - 1]
+            return
+        connection = await self._db._transaction()
+        async for row in connection.cursor(self._sql, *self._params, prefetch=max(self.arraysize, 1)):
+            yield row
+
+class PostgresConnection:
+    """
+    A pooled connection with the aiosqlite API; rows are asyncpg Records,
+    readable by index and by column name.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._connection = None
+        self._transaction_handle = None
+
+    async def _transaction(self, **options):
+        """The pooled connection, inside a transaction"""
+        if self._connection is None:
+            self._connection = await self._pool.acquire()
+        if self._transaction_handle is None:
+            self._transaction_handle = self._connection.transaction(**options)
+            await self._transaction_handle.start()
+        return self._connection
+
+    async def begin(self, isolation: str = "read_committed", readonly: bool = False):
+        """Commit the current transaction, if any, and start one with these options"""
+        await self.commit()
+        await self._transaction(isolation=isolation, readonly=readonly)
+
+    def execute(self, sql: str, params: Iterable = ()) -> PostgresCursor:
+        return PostgresCursor(self, translate(sql), tuple(params))
+
+    async def executemany(self, sql: str, rows: Iterable):
+        rows = [tuple(row) for row in rows]
+        if rows:
+            connection = await self._transaction()
+            await connection.executemany(translate(sql), rows)
+
+    async def executescript(self, script: str):
+        connection = await self._transaction()
+        await connection.execute(script)
+
+    async def commit(self):
+        if self._transaction_handle is not None:
+            transaction, self._transaction_handle = self._transaction_handle, None
+            await transaction.commit()
+
+    async def rollback(self):
+        if self._transaction_handle is not None:
+            transaction, self._transaction_handle = self._transaction_handle, None
+            await transaction.rollback()
+
+    async def close(self):
+        """Roll back what wasn't committed and return the connection to the pool"""
+        if self._connection is None:
+            return
+        try:
+            await self.rollback()
+        finally:
+            connection, self._connection = self._connection, None
+            await self._pool.release(connection)
+
+class PostgresBackend:
+    """
+    Pooled connections to the database at url, coordinated across hosts
+    with advisory locks.
+    """
+
+    name = "postgres"
+    dialect = PostgresDialect()
+
+    def __init__(self, url: str):
+        if asyncpg is None:
+            raise RuntimeError("DATABASE_URL is set but the asyncpg package is not installed")
+        self.url = url
+        # Pools belong to the event loop that created them, and scripts may run several loops
+        self._pools: Dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+        self._leader = None
+
+    def describe(self) -> str:
+        """The URL without credentials"""
+        return re.sub(r"//[^@/]*@", "//", self.url)
+
+    async def _pool(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            for closed in [other for other in self._pools if other.is_closed()]:
+                del self._pools[closed]
+            # Stored before awaiting, so concurrent first connections share one pool
+            pool = self._pools[loop] = asyncio.ensure_future(asyncpg.create_pool(
+                self.url,
+                min_size=POSTGRES_POOL_MIN_SIZE,
+                max_size=POSTGRES_POOL_MAX_SIZE,
+                statement_cache_size=POSTGRES_STATEMENT_CACHE_SIZE,
+            ))
+        return await pool
+
+    def connect(self, foreign_keys: bool = False, named_rows: bool = False) -> PendingConnection:
+        """Borrow a pooled connection; Postgres always enforces foreign keys"""
+        async def open_connection():
+            return PostgresConnection(await self._pool())
+        return PendingConnection(open_connection)
+
+    async def init(self):
+        """Create the schema, one host at a time"""
+        async with self.connect() as db:
+            # Released when the transaction commits
+            await db.execute("SELECT pg_advisory_xact_lock(?)", (INIT_LOCK_KEY,))
+            await db.executescript(SCHEMA)
+            await db.commit()
+        print(f"Database initialized at {self.describe()}")
+
+    async def reset(self):
+        """Drop every table and recreate the schema"""
+        async with self.connect() as db:
+            await db.executescript(f"DROP TABLE IF EXISTS {', '.join(TABLES)} CASCADE")
+            await db.commit()
+        await self.init()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.pop(loop, None)
+        if pool is not None:
+            await (await pool).close()
+
+    async def acquire_leader(self) -> bool:
+        """
+        Take the leader lock of all hosts without waiting. It is held by a
+        dedicated session, so it is released if this process dies.
+        """
+        connection = await asyncpg.connect(self.url)
+        if await connection.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_KEY):
+            self._leader = connection
+            return True
+        await connection.close()
+        return False
+
+    async def release_leader(self):
+        if self._leader is not None:
+            leader, self._leader = self._leader, None
+            await leader.close()
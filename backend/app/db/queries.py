@@ -0,0 +1,343 @@
+"""
+Named queries shared by routes and services.
+
+Each statement is written once here. Its SQL text never changes, so
+both drivers reuse the statement they prepared the first time (sqlite3's
+per-connection statement cache, asyncpg's per pooled connection); IN
+lists are padded to a few fixed lengths for the same reason. Rows come
+back as slotted objects, and every run is timed into the metrics under
+the query's name.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+from app.services.metrics import metrics
+
+# Runs slower than this are logged with the query's name
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "200"))
+# Most IDs bound in one IN list; longer lists are fetched in batches
+IN_BATCH_SIZE = 256
+
+class Row:
+    """
+    Typed row with one slot per selected column, in select order.
+    """
+
+    __slots__ = ()
+    fields: tuple = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = cls.fields + cls.__slots__
+
+    def __init__(self, *values):
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.fields}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.fields)})"
+
+class ThreadRow(Row):
+    __slots__ = ("id", "thread", "status", "created_at", "updated_at", "last_seen_entry_id")
+
+class TreeRow(Row):
+    __slots__ = ("entry_id", "session_id", "created_at", "type", "rarity", "display_name")
+
+class PlacedTreeRow(TreeRow):
+    """A tree with its garden position, None until it is placed"""
+    __slots__ = ("x", "y")
+
+class Query:
+    """
+    A named statement. Parameters bind positionally; rows are built as
+    the query's row type, or left as driver rows without one.
+    """
+
+    __slots__ = ("name", "sql", "row", "_in_sql")
+
+    def __init__(self, name: str, sql: str, row: Optional[Type[Row]] = None):
+        self.name = name
+        self.sql = sql
+        self.row = row
+        # SQL per padded IN list length, for queries with an {ids} list
+        self._in_sql: Dict[int, str] = {}
+
+    @contextmanager
+    def _timed(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.incr(f"db_{self.name}_calls")
+            metrics.incr(f"db_{self.name}_seconds", elapsed)
+            if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+                print(f"Slow query {self.name}: {elapsed * 1000:.0f}ms")
+
+    def _build(self, rows) -> List:
+        if self.row is None:
+            return list(rows)
+        return [self.row(*row) for row in rows]
+
+    async def all(self, db, *params) -> List:
+        with self._timed():
+            async with db.execute(self.sql, params) as cursor:
+                return self._build(await cursor.fetchall())
+
+    async def one(self, db, *params):
+        """The first row, or None"""
+        with self._timed():
+            async with db.execute(self.sql, params) as cursor:
+                row = await cursor.fetchone()
+        if row is None:
+            return None
+        return self.row(*row) if self.row else row
+
+    async def scalar(self, db, *params, default=None):
+        """The first column of the first row, or default"""
+        with self._timed():
+            async with db.execute(self.sql, params) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row is not None and row[0] is not None else default
+
+    async def run(self, db, *params) -> int:
+        """Execute a write and return the number of rows it changed"""
+        with self._timed():
+            cursor = await db.execute(self.sql, params)
+            return cursor.rowcount
+
+    async def run_many(self, db, rows: Iterable[Sequence]):
+        """Execute a write once per parameter row"""
+        with self._timed():
+            await db.executemany(self.sql, rows)
+
+    async def all_in(self, db, ids: Sequence, *params) -> List:
+        """
+        Rows for a list of IDs bound into the query's {ids} list, after
+        params, batch by batch. Batches are padded to a power of two by
+        repeating their last ID, so any number of IDs reuses a handful of
+        statements.
+        """
+        ids = list(dict.fromkeys(ids))
+        results = []
+        for start in range(0, len(ids), IN_BATCH_SIZE):
+            batch = ids[start:start + IN_BATCH_SIZE]
+            size = 1 << (len(batch) - 1).bit_length()
+            sql = self._in_sql.get(size)
+            if sql is None:
+                sql = self._in_sql[size] = self.sql.format(ids=",".join("?" * size))
+            padded = batch + batch[-1:] * (size - len(batch))
+            with self._timed():
+                async with db.execute(sql, [*params, *padded]) as cursor:
+                    results.extend(self._build(await cursor.fetchall()))
+        return results
+
+THREAD_COLUMNS = "id, thread, status, created_at, updated_at, last_seen_entry_id"
+
+ACTIVE_THREADS = Query(
+    "active_threads",
+    f"""
+    SELECT {THREAD_COLUMNS}
+    FROM threads
+    WHERE session_id = ? AND status = 'active'
+    ORDER BY updated_at DESC
+    LIMIT ?
+    """,
+    ThreadRow,
+)
+
+SESSION_THREADS = Query(
+    "session_threads",
+    f"SELECT {THREAD_COLUMNS} FROM threads WHERE session_id = ? ORDER BY id",
+    ThreadRow,
+)
+
+SESSION_THREADS_BY_ID = Query(
+    "session_threads_by_id",
+    f"SELECT {THREAD_COLUMNS} FROM threads WHERE session_id = ? AND id IN ({{ids}}) ORDER BY id",
+    ThreadRow,
+)
+
+# Open threads new unresolved items are matched against, most recent first
+OPEN_THREAD_VECTORS = Query(
+    "open_thread_vectors",
+    """
+    SELECT id, thread, embedding
+    FROM threads
+    WHERE session_id = ? AND status IN ('active', 'snoozed')
+    ORDER BY updated_at DESC
+    LIMIT ?
+    """,
+)
+
+# streak_days has one row per (session, day), so rows are days
+STREAK_DAYS = Query(
+    "streak_days",
+    "SELECT COUNT(*) FROM streak_days WHERE session_id = ?",
+)
+
+ADD_STREAK_DAY = Query(
+    "add_streak_day",
+    "INSERT INTO streak_days (session_id, day) VALUES (?, ?) ON CONFLICT DO NOTHING",
+)
+
+ENTRY_COUNT = Query(
+    "entry_count",
+    "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?",
+)
+
+PROMPT_SET = Query(
+    "prompt_set",
+    "SELECT prompts_json FROM prompts WHERE session_id = ? AND source = ?",
+)
+
+SAVE_PROMPT_SET = Query(
+    "save_prompt_set",
+    """
+    INSERT INTO prompts (session_id, created_at, source, prompts_json)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (session_id, source) DO UPDATE SET
+        created_at = excluded.created_at,
+        prompts_json = excluded.prompts_json
+    """,
+)
+
+SESSION_TREES = Query(
+    "session_trees",
+    """
+    SELECT entry_id, session_id, created_at, type, rarity, display_name
+    FROM trees
+    WHERE session_id = ?
+    ORDER BY created_at DESC
+    """,
+    TreeRow,
+)
+
+PLACED_TREES_SELECT = """
+    SELECT t.entry_id, t.session_id, t.created_at, t.type, t.rarity, t.display_name, gl.x, gl.y
+    FROM trees t
+    LEFT JOIN garden_layout gl ON gl.entry_id = t.entry_id
+"""
+
+SESSION_PLACED_TREES = Query(
+    "session_placed_trees",
+    f"{PLACED_TREES_SELECT} WHERE t.session_id = ? ORDER BY t.entry_id",
+    PlacedTreeRow,
+)
+
+SESSION_PLACED_TREES_BY_ID = Query(
+    "session_placed_trees_by_id",
+    f"{PLACED_TREES_SELECT} WHERE t.session_id = ? AND t.entry_id IN ({{ids}}) ORDER BY t.entry_id",
+    PlacedTreeRow,
+)
+
+LIVE_SESSION = Query(
+    "live_session",
+    "SELECT id FROM sessions WHERE id = ? AND deleted_at IS NULL",
+)
+
+# Sessions being deleted, until their purge removes them
+TOMBSTONED_SESSIONS = Query(
+    "tombstoned_sessions",
+    "SELECT id FROM sessions WHERE deleted_at IS NOT NULL",
+)
+
+# None for a missing or deleted session, else its latest change (NULL without any)
+LIVE_SESSION_SEQ = Query(
+    "live_session_seq",
+    """
+    SELECT (SELECT MAX(seq) FROM change_log WHERE session_id = ?)
+    FROM sessions
+    WHERE id = ? AND deleted_at IS NULL
+    """,
+)
+
+CHANGE_SEQ = Query(
+    "change_seq",
+    "SELECT MAX(seq) FROM change_log WHERE session_id = ?",
+)
+
+ADD_CHANGE = Query(
+    "add_change",
+    "INSERT INTO change_log (session_id, kind, ref, op, created_at) VALUES (?, ?, ?, ?, ?)",
+)
+
+CHANGES_SINCE = Query(
+    "changes_since",
+    """
+    SELECT seq, kind, ref, op
+    FROM change_log
+    WHERE session_id = ? AND seq > ?
+    ORDER BY seq
+    LIMIT ?
+    """,
+)
+
+KINDS_CHANGES_SINCE = Query(
+    "kinds_changes_since",
+    """
+    SELECT seq, kind, ref
+    FROM change_log
+    WHERE session_id = ? AND seq > ? AND kind IN (?, ?)
+    ORDER BY seq
+    """,
+)
+
+SYNC_ENTRIES_SELECT = """
+    SELECT je.id, je.created_at, je.prompt_used, ea.memory_summary,
+           ea.patterns_reflection, ea.follow_up_question, ea.themes_json, ea.emotions_json
+    FROM journal_entries je
+    LEFT JOIN entry_analysis ea ON ea.entry_id = je.id
+"""
+
+SESSION_SYNC_ENTRIES = Query(
+    "session_sync_entries",
+    f"{SYNC_ENTRIES_SELECT} WHERE je.session_id = ? ORDER BY je.id",
+)
+
+SESSION_SYNC_ENTRIES_BY_ID = Query(
+    "session_sync_entries_by_id",
+    f"{SYNC_ENTRIES_SELECT} WHERE je.session_id = ? AND je.id IN ({{ids}}) ORDER BY je.id",
+)
+
+IMPORTED_ENTRY_IDS = Query(
+    "imported_entry_ids",
+    "SELECT id FROM journal_entries WHERE session_id = ? AND import_job_id IN ({ids}) ORDER BY id",
+)
+
+SESSION_PROMPT_SETS = Query(
+    "session_prompt_sets",
+    "SELECT source, prompts_json FROM prompts WHERE session_id = ?",
+)
+
+SESSION_PROMPT_SETS_BY_SOURCE = Query(
+    "session_prompt_sets_by_source",
+    "SELECT source, prompts_json FROM prompts WHERE session_id = ? AND source IN ({ids})",
+)
+
+MEMORIES_SELECT = """
+    SELECT je.id, je.created_at, ea.memory_summary, ea.themes_json
+    FROM journal_entries je
+    JOIN entry_analysis ea ON ea.entry_id = je.id
+"""
+
+# Newest first, so the limit keeps the most recent
+RECENT_MEMORIES = Query(
+    "recent_memories",
+    f"{MEMORIES_SELECT} WHERE je.session_id = ? ORDER BY je.id DESC LIMIT ?",
+)
+
+MEMORIES_BY_ID = Query(
+    "memories_by_id",
+    f"{MEMORIES_SELECT} WHERE je.session_id = ? AND je.id IN ({{ids}}) ORDER BY je.id",
+)
+
+THREAD_ENTRY_LINKS = Query(
+    "thread_entry_links",
+    "SELECT id, last_seen_entry_id FROM threads WHERE session_id = ? AND last_seen_entry_id IS NOT NULL",
+)
@@ -0,0 +1,308 @@
+"""
+SQLite storage backend: a single database file shared by the worker
+processes of one host, with one writer at a time.
+"""
+
+import aiosqlite
+import os
+from pathlib import Path
+from app.config import SQLITE_BUSY_TIMEOUT_SECONDS
+from app.db.base import Dialect, PendingConnection
+from app.services.process_lock import process_lock
+from app.services import timestamps
+
+# Prepared statements kept per connection
+SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+
+# SQLite schema from requirements
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    deleted_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS journal_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    prompt_used TEXT,
+    raw_text TEXT NOT NULL,
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS entry_analysis (
+    entry_id INTEGER PRIMARY KEY,
+    memory_summary TEXT NOT NULL,
+    patterns_reflection TEXT NOT NULL,
+    follow_up_question TEXT NOT NULL,
+    themes_json TEXT NOT NULL,
+    emotions_json TEXT NOT NULL,
+    unresolved_json TEXT NOT NULL,
+    FOREIGN KEY (entry_id) REFERENCES journal_entries(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS threads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    thread TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    last_seen_entry_id INTEGER,
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS trees (
+    entry_id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    type TEXT NOT NULL,
+    rarity TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    FOREIGN KEY (entry_id) REFERENCES journal_entries(id) ON DELETE CASCADE,
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS streak_days (
+    session_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (session_id, day),
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS prompts (
+    session_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    prompts_json TEXT NOT NULL,
+    PRIMARY KEY (session_id, source),
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS garden_layout (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id INTEGER NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    grove INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    FOREIGN KEY (entry_id) REFERENCES journal_entries(id) ON DELETE CASCADE,
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    op TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS digests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    level TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    themes_json TEXT NOT NULL,
+    emotions_json TEXT NOT NULL,
+    entry_count INTEGER NOT NULL,
+    embedding BLOB,
+    created_at TEXT NOT NULL,
+    UNIQUE (session_id, level, period_start),
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS digest_failures (
+    session_id TEXT NOT NULL,
+    level TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    entry_count INTEGER NOT NULL,
+    failed_at TEXT NOT NULL,
+    PRIMARY KEY (session_id, level, period_start),
+    FOREIGN KEY (session_id) REFERENCES sessions(id)
+);
+"""
+
+# Indexes are created after migrations so they can cover migrated columns
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_journal_entries_session ON journal_entries(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_threads_session_status ON threads(session_id, status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_threads_status_updated ON threads(status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_trees_session ON trees(session_id);
+CREATE INDEX IF NOT EXISTS idx_journal_entries_import ON journal_entries(import_job_id);
+CREATE INDEX IF NOT EXISTS idx_change_log_session ON change_log(session_id, seq);
+CREATE INDEX IF NOT EXISTS idx_garden_layout_session ON garden_layout(session_id, grove, slot);
+CREATE INDEX IF NOT EXISTS idx_journal_entries_session_time ON journal_entries(session_id, created_at_epoch);
+CREATE INDEX IF NOT EXISTS idx_sessions_deleted ON sessions(deleted_at) WHERE deleted_at IS NOT NULL;
+"""
+
+# Columns added after the initial schema, applied to existing databases on startup
+MIGRATIONS = [
+    ("sessions", "deleted_at", "TEXT"),
+    ("threads", "embedding", "BLOB"),
+    ("journal_entries", "import_job_id", "TEXT"),
+    ("journal_entries", "created_at_epoch", "INTEGER"),
+]
+
+async def _apply_migrations(db: aiosqlite.Connection):
+    """Add columns missing from databases created with an older schema"""
+    for table, column, declaration in MIGRATIONS:
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            columns = [row[1] for row in await cursor.fetchall()]
+        if column not in columns:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+async def _backfill_entry_epochs(db: aiosqlite.Connection):
+    """
+    Give entries written before created_at_epoch existed their epoch, and
+    rewrite their naive (server local) timestamps as timezone-aware text.
+    """
+    async with db.execute(
+        "SELECT id, created_at FROM journal_entries WHERE created_at_epoch IS NULL"
+    ) as cursor:
+        rows = await cursor.fetchall()
+    if not rows:
+        return
+    updates = []
+    for entry_id, created_at in rows:
+        parsed = timestamps.parse(created_at)
+        updates.append((parsed.isoformat(), int(parsed.timestamp()), entry_id))
+    await db.executemany(
+        "UPDATE journal_entries SET created_at = ?, created_at_epoch = ? WHERE id = ?",
+        updates
+    )
+    print(f"Migrated timestamps of {len(updates)} entries")
+
+# Timestamps compared or sorted as text, which only works when all are UTC
+UTC_TIMESTAMP_COLUMNS = [
+    ("sessions", ("created_at", "updated_at", "deleted_at")),
+    ("threads", ("created_at", "updated_at")),
+    ("trees", ("created_at",)),
+    ("prompts", ("created_at",)),
+    ("import_jobs", ("created_at", "updated_at")),
+    ("change_log", ("created_at",)),
+    ("digests", ("created_at",)),
+]
+
+# PRAGMA user_version once the columns above were normalized
+UTC_TIMESTAMPS_VERSION = 1
+
+async def _normalize_timestamps(db: aiosqlite.Connection):
+    """
+    Rewrite naive (server local) and offset timestamps written by older
+    versions as UTC text, once per database.
+    """
+    async with db.execute("PRAGMA user_version") as cursor:
+        if (await cursor.fetchone())[0] >= UTC_TIMESTAMPS_VERSION:
+            return
+
+    migrated = 0
+    for table, columns in UTC_TIMESTAMP_COLUMNS:
+        not_utc = " OR ".join(f"{column} NOT LIKE '%+00:00'" for column in columns)
+        async with db.execute(f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE {not_utc}") as cursor:
+            rows = await cursor.fetchall()
+        updates = [
+            (*(timestamps.to_utc_iso(value) if value else value for value in row[1:]), row[0])
+            for row in rows
+        ]
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        await db.executemany(f"UPDATE {table} SET {assignments} WHERE rowid = ?", updates)
+        migrated += len(updates)
+
+    await db.execute(f"PRAGMA user_version = {UTC_TIMESTAMPS_VERSION}")
+    if migrated:
+        print(f"Migrated timestamps of {migrated} rows to UTC")
+
+class SQLiteDialect(Dialect):
+    name = "sqlite"
+
+    def week_start(self, epoch_sql: str) -> str:
+        return f"date({epoch_sql}, 'unixepoch', 'weekday 0', '-6 days')"
+
+    def delete_chunk(self, table: str) -> str:
+        return f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE session_id = ? LIMIT ?)"
+
+    async def begin_snapshot(self, db: aiosqlite.Connection):
+        if db.in_transaction:
+            await db.commit()
+        # In WAL mode the snapshot is taken by the first read and kept until the transaction ends
+        await db.execute("BEGIN")
+
+class SQLiteBackend:
+    """
+    Connections to the database file at path, coordinated across worker
+    processes with file locks.
+    """
+
+    name = "sqlite"
+    dialect = SQLiteDialect()
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def describe(self) -> str:
+        return str(self.path)
+
+    def connect(self, foreign_keys: bool = False, named_rows: bool = False) -> PendingConnection:
+        """Open a connection that waits up to the busy timeout for the write lock"""
+        async def open_connection():
+            db = await aiosqlite.connect(
+                self.path,
+                timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+                cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+            )
+            if named_rows:
+                db.row_factory = aiosqlite.Row
+            if foreign_keys:
+                await db.execute("PRAGMA foreign_keys = ON")
+            return db
+        return PendingConnection(open_connection)
+
+    async def init(self):
+        """Initialize database with schema"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Workers start concurrently; only one creates and migrates the schema at a time
+        with process_lock("init"):
+            async with self.connect() as db:
+                # WAL lets readers in other workers run alongside the single writer
+                await db.execute("PRAGMA journal_mode = WAL")
+                await db.executescript(SCHEMA)
+                await _apply_migrations(db)
+                await _backfill_entry_epochs(db)
+                await _normalize_timestamps(db)
+                await db.executescript(INDEXES)
+                await db.commit()
+                print(f"Database initialized at {self.path}")
+
+    async def reset(self):
+        """Reset database by deleting and recreating"""
+        for path in (self.path, Path(f"{self.path}-wal"), Path(f"{self.path}-shm")):
+            path.unlink(missing_ok=True)
+        await self.init()
+
+    async def close(self):
+        pass
+
+    async def acquire_leader(self) -> bool:
+        """Take the leader lock of this host without waiting"""
+        return process_lock("leader").acquire(blocking=False)
+
+    async def release_leader(self):
+        process_lock("leader").release()
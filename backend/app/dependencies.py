@@ -0,0 +1,55 @@
+from fastapi import HTTPException, Depends, Query
+from app.db.database import get_db
+from app.db import queries
+from app.services.session_registry import session_registry
+from app.services import timestamps
+from typing import Optional, Tuple
+import aiosqlite
+
+async def ensure_session(db: aiosqlite.Connection, session_id: str, write: bool = False):
+    """
+    Raise 404 unless the session exists and is not being deleted.
+
+    Writes always check the database, since a tombstone written through
+    another worker may not have been evicted from this one's cache yet.
+    """
+    await session_registry.evict_tombstoned(db)
+    if not write and session_registry.contains(session_id):
+        return
+
+    if await queries.LIVE_SESSION.scalar(db, session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    session_registry.add(session_id)
+
+async def valid_session(
+    session_id: str = Query(..., description="Session ID"),
+    db: aiosqlite.Connection = Depends(get_db)
+) -> str:
+    """Dependency for routes taking session_id as a query parameter"""
+    await ensure_session(db, session_id)
+    return session_id
+
+async def writable_session(
+    session_id: str = Query(..., description="Session ID"),
+    db: aiosqlite.Connection = Depends(get_db)
+) -> str:
+    """Dependency for routes writing to the session given as a query parameter"""
+    await ensure_session(db, session_id, write=True)
+    return session_id
+
+def time_window(
+    start: Optional[str] = Query(None, alias="from", description="Start of the window, ISO date or datetime"),
+    end: Optional[str] = Query(None, alias="to", description="End of the window; a date includes that whole day"),
+    week: Optional[str] = Query(None, description="ISO week such as 2026-W42, instead of from and to"),
+    tz: Optional[str] = Query(None, description="IANA time zone of dates and weeks, UTC by default"),
+) -> Tuple[int, int]:
+    """
+    Dependency for routes over a calendar window, the last 7 days by
+    default. Dates and weeks are read in tz, or in UTC without it, never
+    in server local time.
+    """
+    try:
+        return timestamps.window(start, end, week, tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,14 +1,36 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import session, onboarding, prompts, entries, garden, threads, insights, memories
-from app.db.database import init_db
+from app.routes import session, onboarding, prompts, entries, garden, threads, insights, memories, home, imports, export, sync, events
+from app.db.database import init_db, close_db, backend
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.conditional import ConditionalMiddleware
+from app.services.deletion_service import resume_pending_purges
+from app.services.metrics import metrics
+from app.services.thread_service import run_stale_thread_job
+from app.services.digest_service import run_digest_job
+from app.services.import_service import resume_pending_imports
+from app.services.reconciler import run_reconcile_job
+from app.services.llm_client import mistral_llm, get_mistral_client
+from app.services.chroma_service import chroma_service
+from app.config import LEADER_RETRY_SECONDS, LLM_DRAIN_TIMEOUT_SECONDS
+from app.services.json_codec import DefaultJSONResponse
 
 app = FastAPI(
     title="Journal a Forest API",
     description="AI-powered journaling companion backend",
     version="0.1.0",
+    default_response_class=DefaultJSONResponse,
 )
 
+# Innermost first: ETags are set before compression tags them with the coding
+app.add_middleware(ConditionalMiddleware, version=app.version)
+app.add_middleware(CompressionMiddleware)
+
+# Rate limiting, added before CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware for frontend dev server
 app.add_middleware(
     CORSMiddleware,
@@ -18,11 +40,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Periodic jobs only the leader runs
+LEADER_JOBS = (run_stale_thread_job, run_digest_job, run_reconcile_job)
+
+async def start_leader_jobs():
+    """Resume interrupted work and start the periodic jobs, once this worker leads"""
+    app.state.is_leader = True
+    await resume_pending_purges()
+    await resume_pending_imports()
+    app.state.leader_jobs = [asyncio.create_task(job()) for job in LEADER_JOBS]
+
+async def run_leader_election():
+    """
+    Retry the leader lock every LEADER_RETRY_SECONDS, so a worker takes
+    over the background jobs when the leader dies.
+    """
+    while True:
+        await asyncio.sleep(LEADER_RETRY_SECONDS)
+        try:
+            if await backend.acquire_leader():
+                break
+        except Exception as e:
+            print(f"Leader election failed: {e}")
+    print("Took over as leader")
+    await start_leader_jobs()
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     await init_db()
 
+    # Clients are built here, not at import, so workers and scripts import fast
+    await asyncio.to_thread(chroma_service.init)
+    get_mistral_client()
+
+    # With several workers (or hosts, on Postgres), only the leader runs background jobs;
+    # the others keep trying to take over
+    app.state.is_leader = False
+    app.state.leader_jobs = []
+    app.state.leader_election = None
+    if await backend.acquire_leader():
+        await start_leader_jobs()
+    else:
+        app.state.leader_election = asyncio.create_task(run_leader_election())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if app.state.leader_election is not None:
+        app.state.leader_election.cancel()
+    for job in app.state.leader_jobs:
+        job.cancel()
+    if app.state.is_leader:
+        await backend.release_leader()
+
+    # Requests have finished by now; wait for model calls of background work
+    drained = await asyncio.to_thread(mistral_llm.drain, LLM_DRAIN_TIMEOUT_SECONDS)
+    if not drained:
+        print(f"Shutting down with {mistral_llm.in_flight} model calls still running")
+    await close_db()
+
 # Include routers
 app.include_router(session.router, prefix="/api", tags=["session"])
 app.include_router(onboarding.router, prefix="/api", tags=["onboarding"])
@@ -32,6 +108,11 @@ app.include_router(garden.router, prefix="/api", tags=["garden"])
 app.include_router(threads.router, prefix="/api/threads", tags=["threads"])
 app.include_router(insights.router, prefix="/api/insights", tags=["insights"])
 app.include_router(memories.router, prefix="/api", tags=["memories"])
+app.include_router(home.router, prefix="/api", tags=["home"])
+app.include_router(imports.router, prefix="/api/import", tags=["import"])
+app.include_router(export.router, prefix="/api", tags=["export"])
+app.include_router(sync.router, prefix="/api", tags=["sync"])
+app.include_router(events.router, prefix="/api", tags=["events"])
 
 @app.get("/")
 async def root():
@@ -41,3 +122,6 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,162 @@
+"""
+Response compression.
+
+Bodies of at least COMPRESS_MIN_BYTES are compressed with brotli when the
+client accepts it and the brotli package is installed, and with gzip
+otherwise. Streamed responses such as the export are compressed chunk by
+chunk and flushed after each one, so they keep streaming.
+"""
+
+import os
+import zlib
+from typing import List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from app.services.metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+class GzipEncoder:
+    coding = "gzip"
+
+    def __init__(self):
+        # wbits=31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class BrotliEncoder:
+    coding = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+def _accepted_codings(accept_encoding: str) -> List[str]:
+    """Codings of an Accept-Encoding header, leaving out those refused with q=0"""
+    codings = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            codings.append(coding.strip().lower())
+    return codings
+
+def negotiate(accept_encoding: str) -> Optional[type]:
+    """Encoder to use for an Accept-Encoding header, or None for identity"""
+    codings = _accepted_codings(accept_encoding)
+    if brotli is not None and "br" in codings:
+        return BrotliEncoder
+    if "gzip" in codings:
+        return GzipEncoder
+    return None
+
+def etag_with_coding(etag: str, coding: str) -> str:
+    """A compressed body is a different representation, so its strong ETag differs"""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{coding}"'
+    return etag
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing compressible responses above a size threshold.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoder_class = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoder_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or start_message["status"] < 200
+                    or start_message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = encoder_class()
+                headers["content-encoding"] = encoder.coding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["etag"] = etag_with_coding(headers["etag"], encoder.coding)
+                if "content-length" in headers:
+                    del headers["content-length"]
+                metrics.incr(f"responses_compressed_{encoder.coding}")
+
+                if not more_body:
+                    compressed = encoder.compress(body, flush=False) + encoder.finish()
+                    headers["content-length"] = str(len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(start_message)
+
+            if more_body:
+                await send({"type": "http.response.body", "body": encoder.compress(body, flush=True), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.compress(body, flush=False) + encoder.finish()})
+
+        await self.app(scope, receive, send_compressed)
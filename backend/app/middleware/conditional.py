@@ -0,0 +1,153 @@
+"""
+Conditional GETs with ETags.
+
+Session data routes get a strong ETag built from the session's latest
+change_log sequence, read before the handler runs, so bodies are never
+hashed and a matching If-None-Match is answered with 304 without running
+the handler. The sequence is read on the request's own connection, which
+the handler then reuses through get_db. Routes whose default date window follows the clock also
+change ETag every ETAG_TIME_BUCKET_SECONDS. Routes that set their own ETag (the tree catalog) are
+matched against it once they respond.
+"""
+
+import hashlib
+import time
+from typing import List, Optional
+from urllib.parse import parse_qs
+from starlette.datastructures import Headers, MutableHeaders
+from app.db import queries
+from app.db.database import request_connection
+from app.services.metrics import metrics
+
+# GET routes whose response depends only on the session's change-logged rows
+SESSION_ROUTES = {
+    "/api/garden",
+    "/api/garden/layout",
+    "/api/prompts/today",
+    "/api/home",
+    "/api/insights/trends",
+    "/api/num_entries",
+    "/api/sync",
+}
+
+# Session routes defaulting to a window of the last days, so their data
+# also changes with the date
+TIME_WINDOW_ROUTES = {
+    "/api/insights/trends",
+    "/api/home",
+}
+
+# Every UTC offset is a multiple of 15 minutes, so a new day in any time
+# zone starts a new bucket
+ETAG_TIME_BUCKET_SECONDS = 900
+
+# Clients may keep session data but must revalidate it on every use
+SESSION_CACHE_CONTROL = "private, no-cache"
+
+# Codings the compression middleware appends to ETags
+ETAG_CODINGS = ("gzip", "br")
+
+def _parse_if_none_match(value: str) -> List[str]:
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+def _request_tags(scope) -> List[str]:
+    return _parse_if_none_match(Headers(scope=scope).get("if-none-match", ""))
+
+def _without_coding(etag: str) -> str:
+    for coding in ETAG_CODINGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def _matching_tag(request_tags: List[str], etag: str) -> Optional[str]:
+    """The request's tag matching etag under any content coding"""
+    for tag in request_tags:
+        if tag == "*" or _without_coding(tag) == etag:
+            return tag
+    return None
+
+async def _session_seq(db, session_id: str) -> Optional[int]:
+    """Latest change sequence of a live session, None if there is no such session"""
+    row = await queries.LIVE_SESSION_SEQ.one(db, session_id, session_id)
+    if row is None:
+        return None
+    return row[0] or 0
+
+def session_etag(version: str, path: str, query_string: bytes, seq: int, bucket: int = 0) -> str:
+    """Strong ETag of a session route; the query picks the session and the view"""
+    digest = hashlib.blake2b(f"{version}\0{path}\0{bucket}\0".encode() + query_string, digest_size=8).hexdigest()
+    return f'"{seq}-{digest}"'
+
+class ConditionalMiddleware:
+    """
+    ASGI middleware adding ETags to session routes and answering If-None-Match.
+    """
+
+    def __init__(self, app, version: str):
+        self.app = app
+        self.version = version
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if scope["path"] not in SESSION_ROUTES or "session_id" not in query:
+            await self._respond(scope, receive, send, None)
+            return
+
+        # Opened here and handed to the handler through get_db
+        db = await request_connection()
+        scope.setdefault("state", {})["db"] = db
+        try:
+            etag = None
+            seq = await _session_seq(db, query["session_id"][0])
+            if seq is not None:
+                bucket = int(time.time() // ETAG_TIME_BUCKET_SECONDS) if scope["path"] in TIME_WINDOW_ROUTES else 0
+                etag = session_etag(self.version, scope["path"], scope.get("query_string", b""), seq, bucket)
+                matched = _matching_tag(_request_tags(scope), etag)
+                if matched:
+                    await self._not_modified(send, matched, SESSION_CACHE_CONTROL)
+                    return
+            await self._respond(scope, receive, send, etag)
+        finally:
+            await db.close()
+
+    async def _respond(self, scope, receive, send, etag: Optional[str]):
+        """Run the app, tagging session responses with etag and matching handler ETags"""
+        request_tags = _request_tags(scope)
+        not_modified = False
+
+        async def send_with_etag(message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if etag and message["status"] == 200:
+                    headers["etag"] = etag
+                    headers["cache-control"] = SESSION_CACHE_CONTROL
+                elif "etag" in headers and message["status"] == 200:
+                    matched = _matching_tag(request_tags, headers["etag"])
+                    if matched:
+                        not_modified = True
+                        await self._not_modified(send, matched, headers.get("cache-control"), body=False)
+                        return
+                await send(message)
+            elif not_modified:
+                # The handler's body is dropped; close the 304 once it is done
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    await send({"type": "http.response.body", "body": b""})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+    async def _not_modified(self, send, etag: str, cache_control: Optional[str], body: bool = True):
+        metrics.incr("responses_not_modified")
+        headers = [(b"etag", etag.encode()), (b"vary", b"Accept-Encoding")]
+        if cache_control:
+            headers.append((b"cache-control", cache_control.encode()))
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        if body:
+            await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,231 @@
+"""
+Token-bucket rate limiting with separate budgets for LLM-backed endpoints.
+
+Every request draws from a per-session and a global bucket. Requests to
+endpoints that call the model also draw from stricter LLM buckets and
+hold one of a small number of per-session LLM slots while they run.
+When a bucket is empty, the request waits up to RATE_LIMIT_MAX_WAIT_SECONDS
+for a token before being rejected with 429.
+
+Buckets live in each worker process, so with N workers a session can get
+up to N times these budgets.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from app.services.metrics import metrics
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+# (tokens per second, burst capacity)
+SESSION_LIMIT = (_env_float("RATE_LIMIT_SESSION_RPS", "5"), _env_float("RATE_LIMIT_SESSION_BURST", "20"))
+GLOBAL_LIMIT = (_env_float("RATE_LIMIT_GLOBAL_RPS", "100"), _env_float("RATE_LIMIT_GLOBAL_BURST", "200"))
+# Enough for onboarding, a few entries and weekly insights in quick succession
+LLM_SESSION_LIMIT = (_env_float("RATE_LIMIT_LLM_SESSION_RPM", "20") / 60, _env_float("RATE_LIMIT_LLM_SESSION_BURST", "10"))
+LLM_GLOBAL_LIMIT = (_env_float("RATE_LIMIT_LLM_GLOBAL_RPM", "120") / 60, _env_float("RATE_LIMIT_LLM_GLOBAL_BURST", "20"))
+LLM_SESSION_CONCURRENCY = int(os.environ.get("RATE_LIMIT_LLM_SESSION_CONCURRENCY", "2"))
+MAX_WAIT_SECONDS = _env_float("RATE_LIMIT_MAX_WAIT_SECONDS", "2")
+
+BODY = "body"
+QUERY = "query"
+
+# Endpoints that trigger paid model calls, with where their handler reads the session ID
+LLM_ROUTES = {
+    ("POST", "/api/entries"): BODY,
+    ("POST", "/api/onboarding"): BODY,
+    ("GET", "/api/insights/weekly"): QUERY,
+    ("POST", "/api/import"): QUERY,
+}
+
+EXEMPT_PATHS = {"/", "/health", "/metrics"}
+
+# Max number of per-session buckets kept in memory
+MAX_TRACKED_KEYS = 10000
+
+class TokenBucket:
+    """
+    Classic token bucket; reservations may take the balance negative so
+    queued requests are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class BucketGroup:
+    """
+    Buckets keyed by session, with LRU eviction of idle keys.
+    """
+
+    def __init__(self, limit: Tuple[float, float]):
+        self.limit = limit
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def get(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*self.limit)
+            self._buckets[key] = bucket
+            if len(self._buckets) > MAX_TRACKED_KEYS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing request and LLM budgets.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.session_buckets = BucketGroup(SESSION_LIMIT)
+        self.global_bucket = TokenBucket(*GLOBAL_LIMIT)
+        self.llm_session_buckets = BucketGroup(LLM_SESSION_LIMIT)
+        self.llm_global_bucket = TokenBucket(*LLM_GLOBAL_LIMIT)
+        self.llm_slots: Dict[str, asyncio.Semaphore] = {}
+        self.llm_slot_users: Dict[str, int] = {}
+        self.llm_in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        session_source = LLM_ROUTES.get((scope["method"], scope["path"].rstrip("/")))
+        is_llm = session_source is not None
+        receive, key = await self._client_key(scope, receive, session_source)
+
+        buckets = [self.global_bucket, self.session_buckets.get(key)]
+        if is_llm:
+            buckets += [self.llm_global_bucket, self.llm_session_buckets.get(key)]
+
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if wait > MAX_WAIT_SECONDS:
+            await self._reject(send, "llm" if is_llm else "request", wait)
+            return
+        for bucket in buckets:
+            bucket.take()
+        if wait > 0:
+            metrics.incr("rate_limit_queued")
+            await asyncio.sleep(wait)
+
+        if not is_llm:
+            metrics.incr("rate_limit_allowed")
+            await self.app(scope, receive, send)
+            return
+
+        slots = self.llm_slots.setdefault(key, asyncio.Semaphore(LLM_SESSION_CONCURRENCY))
+        self.llm_slot_users[key] = self.llm_slot_users.get(key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=MAX_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                await self._reject(send, "llm_concurrency", MAX_WAIT_SECONDS)
+                return
+
+            metrics.incr("rate_limit_allowed")
+            self.llm_in_flight += 1
+            metrics.set_gauge("llm_requests_in_flight", self.llm_in_flight)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.llm_in_flight -= 1
+                metrics.set_gauge("llm_requests_in_flight", self.llm_in_flight)
+                slots.release()
+        finally:
+            # Drop the semaphore once nobody holds or waits for it
+            self.llm_slot_users[key] -= 1
+            if self.llm_slot_users[key] == 0:
+                del self.llm_slot_users[key]
+                del self.llm_slots[key]
+
+    async def _client_key(self, scope, receive, session_source: Optional[str]):
+        """
+        Identify the caller by session ID, falling back to client address.
+
+        LLM routes only use the session ID their handler acts on, so its
+        budget can't be dodged by sending a different one elsewhere; their
+        JSON bodies are read to find it, then replayed to the application.
+        """
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if "session_id" in query and session_source != BODY:
+            return receive, query["session_id"][0]
+
+        headers = dict(scope.get("headers") or [])
+        if b"x-session-id" in headers and session_source is None:
+            return receive, headers[b"x-session-id"].decode()
+
+        if session_source == BODY and headers.get(b"content-type", b"").startswith(b"application/json"):
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+            replayed = False
+
+            async def replay():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                return await receive()
+
+            session_id = _session_from_body(body)
+            if session_id:
+                return replay, session_id
+            return replay, _client_address(scope)
+
+        return receive, _client_address(scope)
+
+    async def _reject(self, send, scope_name: str, retry_after: float):
+        metrics.incr("rate_limit_rejected")
+        metrics.incr(f"rate_limit_rejected_{scope_name}")
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+def _session_from_body(body: bytes) -> Optional[str]:
+    try:
+        payload = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    session_id = payload.get("session_id") if isinstance(payload, dict) else None
+    return session_id if isinstance(session_id, str) else None
+
+def _client_address(scope) -> str:
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
@@ -1,42 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends
 from app.schemas.entries import EntryRequest, EntryResponse, NumEntries
-from app.services.llm_service import analyze_entry, generate_prompts
-from app.services.chroma_service import ChromaService
+from app.services.llm_service import analyze_entry, generate_prompts, LLMParseError
+from app.services.llm_client import LLMUnavailableError
+from app.services.fallbacks import default_prompts
 from app.services.tree_service import generate_tree
+from app.services.thread_service import embed_items, upsert_threads, load_active_threads
+from app.services.garden_layout import place_new_trees
+from app.services.change_log import record_change, load_trees, ENTRY, PROMPTS
+from app.services.event_broker import event_broker, ANALYSIS, TREE, PROMPTS as PROMPTS_EVENT
 from app.services.chroma_service import chroma_service
+from app.services.retrieval import memory_index, Memory
+from app.services.digest_service import long_range_context
 from app.db.database import get_db
+from app.db import queries
+from app.dependencies import valid_session, ensure_session
+from app.services import json_codec
+from app.services import timestamps
 import aiosqlite
-import json
-from datetime import datetime, date
+import asyncio
+from datetime import date
 
 router = APIRouter()
-chroma_db = ChromaService()
 
 @router.get("/num_entries")
 async def get_num_entries(
-    session_id: str = Query(..., description="Session ID"),
+    session_id: str = Depends(valid_session),
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get the number of journal entries in the database"""
-    
-     # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
+    return await load_num_entries(db, session_id)
 
-    async with db.execute(
-        """
-        SELECT COUNT(*) from journal_entries
-        WHERE session_id = ?
-        """,
-        (session_id,)
-    ) as cursor:
-        num_entries = (await cursor.fetchone())[0]
+async def load_num_entries(db: aiosqlite.Connection, session_id: str) -> NumEntries:
+    """Count the journal entries of a session"""
 
-    return NumEntries(num_entries=num_entries)
+    return NumEntries(num_entries=await queries.ENTRY_COUNT.scalar(db, session_id, default=0))
 
 @router.post("/entries", response_model=EntryResponse)
 async def create_entry(
@@ -44,34 +41,33 @@ async def create_entry(
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Create a journal entry and return analysis, prompts, and tree"""
-    
+
     # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (request.session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-    
-    now = datetime.now().isoformat()
+    await ensure_session(db, request.session_id, write=True)
+
+    now = timestamps.now_iso()
     
     # Insert journal entry
-    result = await db.execute(
+    async with db.execute(
         """
-        INSERT INTO journal_entries (session_id, created_at, prompt_used, raw_text)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO journal_entries (session_id, created_at, created_at_epoch, prompt_used, raw_text)
+        VALUES (?, ?, ?, ?, ?)
+        RETURNING id
         """,
-        (request.session_id, now, request.prompt_id, request.text)
-    )
+        (request.session_id, now, timestamps.to_epoch(now), request.prompt_id, request.text)
+    ) as cursor:
+        row = await cursor.fetchone()
     await db.commit()
     
-    entry_id = result.lastrowid
+    entry_id = row[0] if row else None
     
     if not entry_id:
         raise HTTPException(status_code=500, detail="Failed to create entry")
     
-    # Analyze entry (mock for now)
-    analysis = analyze_entry(request.text, request.prompt_id)
+    # Analyze entry (falls back to a heuristic analysis if the model is down)
+    analysis = await asyncio.to_thread(analyze_entry, request.text, request.prompt_id)
+    # Embed unresolved items before the writes below open a transaction
+    item_vectors = await embed_items(analysis["unresolved"])
     
     # Store analysis
     await db.execute(
@@ -87,11 +83,12 @@ async def create_entry(
             analysis["memory_summary"],
             analysis["patterns_reflection"],
             analysis["follow_up_question"],
-            json.dumps(analysis["themes"]),
-            json.dumps(analysis["emotions"]),
-            json.dumps(analysis["unresolved"]),
+            json_codec.dumps(analysis["themes"]),
+            json_codec.dumps(analysis["emotions"]),
+            json_codec.dumps(analysis["unresolved"]),
         )
     )
+    await record_change(db, request.session_id, ENTRY, entry_id)
     
     # Generate tree
     tree_data = generate_tree(
@@ -116,24 +113,16 @@ async def create_entry(
             tree_data["display_name"],
         )
     )
+    await place_new_trees(db, request.session_id)
     
-    # Update streak
-    today = date.today().isoformat()
-    await db.execute(
-        """
-        INSERT OR IGNORE INTO streak_days (session_id, day)
-        VALUES (?, ?)
-        """,
-        (request.session_id, today)
-    )
+    # Track unresolved items as threads
+    touched_threads = await upsert_threads(db, request.session_id, analysis["unresolved"], entry_id, item_vectors)
+
+    # Update streak, on the entry's UTC day like imported entries' own days
+    await queries.ADD_STREAK_DAY.run(db, request.session_id, now[:10])
     
     # Get current streak
-    async with db.execute(
-        "SELECT COUNT(DISTINCT day) FROM streak_days WHERE session_id = ?",
-        (request.session_id,)
-    ) as cursor:
-        streak_row = await cursor.fetchone()
-        streak_updated = streak_row[0] if streak_row else 0
+    streak_updated = await queries.STREAK_DAYS.scalar(db, request.session_id, default=0)
     
     # Update session updated_at
     await db.execute(
@@ -142,9 +131,21 @@ async def create_entry(
     )
     
     await db.commit()
+
+    await event_broker.publish(request.session_id, ANALYSIS, {
+        "entry_id": entry_id,
+        "memory_summary": analysis["memory_summary"],
+        "patterns_reflection": analysis["patterns_reflection"],
+        "follow_up_question": analysis["follow_up_question"],
+        "themes": analysis["themes"],
+        "emotions": analysis["emotions"],
+    })
+    # Includes the tree's garden position
+    await event_broker.publish(request.session_id, TREE, (await load_trees(db, request.session_id, [entry_id]))[0])
     
     # Store in Chroma 
-    chroma_service.store_entry(
+    embedding = await asyncio.to_thread(
+        chroma_service.store_entry,
         entry_id,
         request.session_id,
         analysis["memory_summary"],
@@ -160,59 +161,61 @@ async def create_entry(
     )
     
     # Get session history (for prompt generation)
-    async with db.execute(
-        """
-        SELECT memory_summary, entry_id
-        FROM entry_analysis ea
-        JOIN journal_entries je ON ea.entry_id = je.id
-        WHERE session_id = ?
-        ORDER BY created_at DESC
-        LIMIT 3
-        """,
-        (request.session_id,)
-    ) as cursor:
-        recent_entries = await cursor.fetchall()
-
-    async with db.execute(
-        """
-        SELECT id, thread, status, created_at, updated_at, last_seen_entry_id
-        FROM threads
-        WHERE session_id = ? AND status = 'active'
-        ORDER BY updated_at DESC
-        LIMIT 3
-        """,
-        (request.session_id,)
-    ) as cursor:
-        thread_rows = await cursor.fetchall()
-    
-    active_threads = [
-        {
-            "id": row[0],
-            "thread": row[1],
-            "status": row[2],
-            "created_at": row[3],
-            "updated_at": row[4],
-            "last_seen_entry_id": row[5],
-        }
-        for row in thread_rows
-    ]
+    active_threads = await load_active_threads(db, request.session_id)
 
-    summary = recent_entries[0][0]
-    recent_summaries = [res[0] for res in recent_entries]
-    recent_entry_ids = [res[1] for res in recent_entries]
-
-    similarity_search_results = chroma_db.search_similar(query=summary, session_id=request.session_id, exclude_entry_ids=recent_entry_ids, limit=5)
+    # Latest memories plus older ones scored by similarity, recency, themes and threads
+    memories = await memory_index.retrieve(
+        db,
+        request.session_id,
+        Memory(
+            entry_id=entry_id,
+            summary=analysis["memory_summary"],
+            day=date.fromisoformat(now[:10]).toordinal(),
+            themes=analysis["themes"],
+            embedding=embedding,
+            thread_ids=tuple(thread["id"] for thread in touched_threads),
+        ),
+        active_threads,
+    )
 
     session_history = {
-        "recent_memories": recent_summaries,
-        "relevant_memories": similarity_search_results,
+        "recent_memories": memories["recent_memories"],
+        "relevant_memories": memories["relevant_memories"],
+        # Weekly and monthly digests closest to this entry, a fixed number of them
+        "long_range_memories": await long_range_context(db, request.session_id, embedding),
         "active_threads": active_threads
     }
 
+    response_fields = {
+        "entry_id": entry_id,
+        "memory_summary": analysis["memory_summary"],
+        "patterns_reflection": analysis["patterns_reflection"],
+        "follow_up_question": analysis["follow_up_question"],
+        "themes": analysis["themes"],
+        "emotions": analysis["emotions"],
+        "tree": {
+            "entry_id": entry_id,
+            "session_id": request.session_id,
+            "created_at": now,
+            "type": tree_data["type"],
+            "rarity": tree_data["rarity"],
+            "display_name": tree_data["display_name"],
+        },
+        "streak_updated": streak_updated,
+    }
+
     # Generate new prompts 
 
     text = f'{analysis["memory_summary"]}\n{analysis["follow_up_question"]}\nThemes: {analysis["themes"]}\nEmotions: {analysis["emotions"]}'
-    new_prompts_data = generate_prompts(text, session_history)
+    try:
+        new_prompts_data = await asyncio.to_thread(generate_prompts, text, session_history)
+    except (LLMUnavailableError, LLMParseError) as e:
+        # Keep the previous prompt set rather than failing the saved entry
+        print(f"Keeping previous prompts: {e}")
+        previous_prompts = await load_previous_prompts(db, request.session_id)
+        await event_broker.publish(request.session_id, PROMPTS_EVENT, {"source": "previous", "prompts": previous_prompts})
+        return EntryResponse(**response_fields, new_prompts=previous_prompts)
+
     new_prompts = [
         {
             "id": p["id"],
@@ -222,62 +225,22 @@ async def create_entry(
         for p in new_prompts_data[:3]  # Return 1-3 prompts
     ]
 
-    async with db.execute(
-        """
-        SELECT COUNT(*) FROM prompts
-        WHERE session_id = ? AND source = ?
-        """,
-        (request.session_id, "generated")
-    ) as cursor:
-        num_generated_prompts = (await cursor.fetchone())[0]
+    await queries.SAVE_PROMPT_SET.run(db, request.session_id, now, "generated", json_codec.dumps(new_prompts))
+    await record_change(db, request.session_id, PROMPTS, "generated")
+    # Commit before telling clients, who may read the prompts back
+    await db.commit()
+    await event_broker.publish(request.session_id, PROMPTS_EVENT, {"source": "generated", "prompts": new_prompts})
 
-    if num_generated_prompts == 0:
-        await db.execute(
-            """
-            INSERT INTO prompts (
-                session_id, created_at, source, prompts_json
-            )
-            VALUES (?, ?, ?, ?)
-            """,
-            (
-                request.session_id,
-                now,
-                "generated",
-                json.dumps(new_prompts)
-            )
-        )
-    else:
-         await db.execute(
-            """
-            UPDATE prompts
-            SET prompts_json = ?, created_at = ?
-            WHERE session_id = ? AND source = ?
-            """,
-            (
-                json.dumps(new_prompts),
-                now,
-                request.session_id,
-                "generated"
-            )
-        )
+    return EntryResponse(**response_fields, new_prompts=new_prompts)
 
-    
-    return EntryResponse(
-        entry_id=entry_id,
-        memory_summary=analysis["memory_summary"],
-        patterns_reflection=analysis["patterns_reflection"],
-        follow_up_question=analysis["follow_up_question"],
-        themes=analysis["themes"],
-        emotions=analysis["emotions"],
-        new_prompts=new_prompts,
-        tree={
-            "entry_id": entry_id,
-            "session_id": request.session_id,
-            "created_at": now,
-            "type": tree_data["type"],
-            "rarity": tree_data["rarity"],
-            "display_name": tree_data["display_name"],
-        },
-        streak_updated=streak_updated,
-    )
+async def load_previous_prompts(db: aiosqlite.Connection, session_id: str) -> list:
+    """The session's last generated prompts, else its starter prompts, else defaults"""
+
+    for source in ("generated", "onboarding"):
+        prompts_json = await queries.PROMPT_SET.scalar(db, session_id, source)
+        prompts = json_codec.loads(prompts_json) if prompts_json else None
+        if prompts:
+            return prompts[:3]
+
+    return [p.model_dump() for p in default_prompts()]
 
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from app.services.event_broker import event_broker
+from app.services.change_log import current_seq
+from app.db.database import connect
+from app.dependencies import ensure_session
+import asyncio
+
+router = APIRouter()
+
+# Close code for sockets opened with an unknown session
+SESSION_NOT_FOUND = 4404
+
+@router.websocket("/ws")
+async def session_events(websocket: WebSocket, session_id: str):
+    """
+    Push analysis, tree, prompts, weekly and import events of a session.
+
+    The first message is a "hello" carrying the current sync cursor, so a
+    reconnecting client can fetch what it missed from /api/sync.
+    """
+    async with connect() as db:
+        try:
+            await ensure_session(db, session_id)
+        except HTTPException:
+            await websocket.close(code=SESSION_NOT_FOUND)
+            return
+        cursor = await current_seq(db, session_id)
+
+    await websocket.accept()
+    async with event_broker.subscribe(session_id) as queue:
+        await websocket.send_json({"type": "hello", "data": {"cursor": cursor}})
+        # Clients only send pings; reading them is how a closed socket is noticed
+        receiver = asyncio.create_task(_drain_client(websocket))
+        try:
+            while True:
+                next_event = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({next_event, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    next_event.cancel()
+                    break
+                await websocket.send_json(next_event.result())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+
+async def _drain_client(websocket: WebSocket):
+    """Read client messages until the socket closes, answering pings"""
+    try:
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
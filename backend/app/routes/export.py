@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from app.services.export_service import export_session
+from app.dependencies import valid_session
+
+router = APIRouter()
+
+@router.get("/export")
+async def export_journal(session_id: str = Depends(valid_session)):
+    """Download a session's full journal as NDJSON"""
+
+    # The export reads on its own connection, since the request's
+    # connection is closed before the body is streamed
+    return StreamingResponse(
+        export_session(session_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="journal-export.ndjson"'},
+    )
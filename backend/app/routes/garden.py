@@ -1,59 +1,48 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.schemas.garden import GardenResponse
+from fastapi import APIRouter, Depends, Query
+from app.schemas.garden import GardenResponse, GardenLayoutResponse, GardenCatalogResponse
+from app.services.garden_layout import load_layout, catalog, CATALOG_ETAG, CATALOG_MAX_AGE_SECONDS
 from app.db.database import get_db
+from app.db import queries
+from app.dependencies import valid_session
+from app.services.json_codec import DefaultJSONResponse
+from typing import Dict
 import aiosqlite
 
 router = APIRouter()
 
 @router.get("/garden", response_model=GardenResponse)
 async def get_garden(
-    session_id: str = Query(..., description="Session ID"),
+    session_id: str = Depends(valid_session),
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get streak and all trees for a session"""
-    
-    # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get streak
-    async with db.execute(
-        "SELECT COUNT(DISTINCT day) FROM streak_days WHERE session_id = ?",
-        (session_id,)
-    ) as cursor:
-        streak_row = await cursor.fetchone()
-        streak_days = streak_row[0] if streak_row else 0
-    
-    # Get all trees
-    async with db.execute(
-        """
-        SELECT entry_id, session_id, created_at, type, rarity, display_name
-        FROM trees
-        WHERE session_id = ?
-        ORDER BY created_at DESC
-        """,
-        (session_id,)
-    ) as cursor:
-        tree_rows = await cursor.fetchall()
-    
-    trees = [
-        {
-            "entry_id": row[0],
-            "session_id": row[1],
-            "created_at": row[2],
-            "type": row[3],
-            "rarity": row[4],
-            "display_name": row[5],
-        }
-        for row in tree_rows
-    ]
-    
-    return GardenResponse(
-        streak_days=streak_days,
-        trees=trees,
-    )
+    return DefaultJSONResponse(await load_garden(db, session_id))
+
+@router.get("/garden/layout", response_model=GardenLayoutResponse)
+async def get_garden_layout(
+    since: int = Query(0, ge=0),
+    session_id: str = Depends(valid_session),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """Get tree positions, only those placed after version `since`"""
+
+    return DefaultJSONResponse(await load_layout(db, session_id, since))
+
+@router.get("/garden/catalog", response_model=GardenCatalogResponse)
+async def get_garden_catalog():
+    """Get the tree types, rarities and names the layout indexes into"""
+
+    return DefaultJSONResponse(catalog(), headers={
+        "ETag": CATALOG_ETAG,
+        "Cache-Control": f"public, max-age={CATALOG_MAX_AGE_SECONDS}",
+    })
+
+async def load_garden(db: aiosqlite.Connection, session_id: str) -> Dict:
+    """Load the streak and all trees of a session"""
+
+    # Rows are already in GardenResponse's shape, so they are not validated again
+    return {
+        "streak_days": await queries.STREAK_DAYS.scalar(db, session_id, default=0),
+        "trees": [row.as_dict() for row in await queries.SESSION_TREES.all(db, session_id)],
+    }
 
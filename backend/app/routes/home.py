@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.schemas.home import HomeResponse
+from app.routes.entries import load_num_entries
+from app.routes.prompts import load_today_prompts
+from app.routes.garden import load_garden
+from app.routes.insights import load_trends
+from app.db.database import get_db, dialect
+from app.dependencies import valid_session, time_window
+from app.services.json_codec import DefaultJSONResponse
+import aiosqlite
+from typing import Tuple
+
+router = APIRouter()
+
+HOME_FIELDS = ["num_entries", "prompts", "garden", "trends"]
+
+@router.get("/home", response_model=HomeResponse, response_model_exclude_none=True)
+async def get_home(
+    session_id: str = Depends(valid_session),
+    fields: str = Query(",".join(HOME_FIELDS), description="Comma-separated sections to include"),
+    window: Tuple[int, int] = Depends(time_window),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """
+    Get everything the home screen needs in one request. Trends take the
+    same window parameters as /api/insights/trends.
+    """
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(selected) - set(HOME_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # Read every section from one snapshot
+    await dialect.begin_snapshot(db)
+
+    # Sections are built in HomeResponse's shape; unselected ones are left out
+    response = {}
+    if "num_entries" in selected:
+        response["num_entries"] = (await load_num_entries(db, session_id)).num_entries
+    if "prompts" in selected:
+        response["prompts"] = await load_today_prompts(db, session_id)
+    if "garden" in selected:
+        response["garden"] = await load_garden(db, session_id)
+    if "trends" in selected:
+        response["trends"] = (await load_trends(db, session_id, window)).model_dump()
+
+    return DefaultJSONResponse(response)
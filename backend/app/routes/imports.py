@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from app.schemas.imports import ImportJob
+from app.services.import_service import create_import, get_job, schedule_import, PARSERS
+from app.db.database import get_db
+from app.dependencies import valid_session, writable_session
+import aiosqlite
+import io
+
+router = APIRouter()
+
+@router.post("", response_model=ImportJob, status_code=202)
+async def import_journal(
+    file: UploadFile = File(..., description="JSONL or Markdown export"),
+    format: str = Query("jsonl", description="Export format: jsonl or markdown"),
+    session_id: str = Depends(writable_session),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """Import historical entries and analyze them in the background"""
+
+    if format not in PARSERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+
+    lines = io.TextIOWrapper(file.file, encoding="utf-8")
+    try:
+        job = await create_import(db, session_id, lines, format)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    schedule_import(job["id"])
+    return job
+
+async def session_job(db: aiosqlite.Connection, job_id: str, session_id: str) -> dict:
+    """Load an import of the session, 404 for other sessions' imports"""
+    job = await get_job(db, job_id)
+    if not job or job["session_id"] != session_id:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+@router.get("/{job_id}", response_model=ImportJob)
+async def get_import(
+    job_id: str,
+    session_id: str = Depends(valid_session),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """Get progress of an import"""
+    return await session_job(db, job_id, session_id)
+
+@router.post("/{job_id}/resume", response_model=ImportJob, status_code=202)
+async def resume_import(
+    job_id: str,
+    session_id: str = Depends(writable_session),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """Retry entries of an import that have not been analyzed yet"""
+    job = await session_job(db, job_id, session_id)
+    if job["status"] in ("parsing", "failed", "running"):
+        raise HTTPException(status_code=409, detail=f"Import is {job['status']}")
+
+    # A concurrent resume may still claim the job first; the loser's task exits
+    schedule_import(job_id)
+    return job
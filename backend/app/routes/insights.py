@@ -1,105 +1,51 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, Depends
 from app.schemas.insights import TrendsResponse, WeeklyInsightsResponse
 from app.services.llm_service import generate_weekly_insights
+from app.services.event_broker import event_broker, WEEKLY
+from app.services.digest_service import long_range_context
 from app.db.database import get_db
+from app.db import queries
+from app.dependencies import valid_session, time_window
+from app.services import json_codec
+from app.services import timestamps
+from typing import Optional, Tuple
 import aiosqlite
+import asyncio
 import json
 
 router = APIRouter()
 
+# Entries of a window passed to the model, latest first
+WEEKLY_INSIGHTS_MAX_ENTRIES = 50
+
 @router.get("/trends", response_model=TrendsResponse)
 async def get_trends(
-    session_id: str = Query(..., description="Session ID"),
+    session_id: str = Depends(valid_session),
+    window: Tuple[int, int] = Depends(time_window),
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get theme and emotion trends for a session"""
-    
-    # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get all entry analyses
-    async with db.execute(
-        """
-        SELECT themes_json, emotions_json
-        FROM entry_analysis ea
-        JOIN journal_entries je ON ea.entry_id = je.id
-        WHERE je.session_id = ?
-        ORDER BY je.created_at DESC
-        LIMIT 7
-        """,
-        (session_id,)
-    ) as cursor:
-        analyses = await cursor.fetchall()
-    
-    # Aggregate themes and emotions
-    theme_counts: dict = {}
-    emotion_counts: dict = {}
-    
-    for row in analyses:
-        try:
-            themes = json.loads(row[0]) if row[0] else []
-            emotions = json.loads(row[1]) if row[1] else []
-            
-            for theme in themes:
-                theme_counts[theme] = theme_counts.get(theme, 0) + 1
-            
-            for emotion in emotions:
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        except json.JSONDecodeError:
-            continue
-    
-    # Get entry count and streak
-    async with db.execute(
-        "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?",
-        (session_id,)
-    ) as cursor:
-        entry_count = (await cursor.fetchone())[0]
-    
-    async with db.execute(
-        "SELECT COUNT(DISTINCT day) FROM streak_days WHERE session_id = ?",
-        (session_id,)
-    ) as cursor:
-        streak_row = await cursor.fetchone()
-        streak_days = streak_row[0] if streak_row else 0
-    
-    return TrendsResponse(
-        theme_counts=theme_counts,
-        emotion_counts=emotion_counts,
-        entry_count=entry_count,
-        streak_days=streak_days,
-    )
+    return await load_trends(db, session_id, window)
 
 @router.get("/weekly", response_model=WeeklyInsightsResponse)
 async def get_weekly_insights(
-    session_id: str = Query(..., description="Session ID"),
+    session_id: str = Depends(valid_session),
+    window: Tuple[int, int] = Depends(time_window),
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get weekly reflection and pattern insights"""
-    
-    # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get entries from last week
+
+    # Get entries of the window (the last 7 days by default)
     async with db.execute(
         """
         SELECT ea.patterns_reflection, ea.themes_json, ea.emotions_json
         FROM entry_analysis ea
         JOIN journal_entries je ON ea.entry_id = je.id
-        WHERE je.session_id = ?
-        ORDER BY je.created_at DESC
-        LIMIT 7
+        WHERE je.session_id = ? AND je.created_at_epoch >= ? AND je.created_at_epoch < ?
+        ORDER BY je.created_at_epoch DESC
+        LIMIT ?
         """,
-        (session_id,)
+        (session_id, window[0], window[1], WEEKLY_INSIGHTS_MAX_ENTRIES)
     ) as cursor:
         entries = await cursor.fetchall()
     
@@ -108,8 +54,8 @@ async def get_weekly_insights(
     for row in entries:
         try:
             print("===> Row:", row)
-            themes = json.loads(row[1]) if row[1] else []
-            emotions = json.loads(row[2]) if row[2] else []
+            themes = json_codec.loads_or(row[1], [])
+            emotions = json_codec.loads_or(row[2], [])
             entry_data.append({
                 "patterns_reflection": row[0],
                 "themes": themes,
@@ -119,10 +65,14 @@ async def get_weekly_insights(
             print(f"Error occured: {e}")
             continue
 
-    # Generate weekly insights (mock for now)
-    insights = generate_weekly_insights(session_id, json.loads(json.dumps(entry_data)))
+    # Digests of the latest earlier weeks and months, to notice what changed
+    earlier_context = await long_range_context(db, session_id)
+
+    # Generate weekly insights (falls back to counted themes if the model is down)
+    insights = await asyncio.to_thread(generate_weekly_insights, session_id, json.loads(json.dumps(entry_data)), earlier_context)
     
     print("==> Insights:", insights)
+    await event_broker.publish(session_id, WEEKLY, insights.model_dump())
 
     return insights
     # return WeeklyInsightsResponse(
@@ -131,3 +81,43 @@ async def get_weekly_insights(
     #     emotions_summary=insights["emotions_summary"],
     # )
 
+async def load_trends(db: aiosqlite.Connection, session_id: str, window: Optional[Tuple[int, int]] = None) -> TrendsResponse:
+    """Aggregate themes and emotions of a window (the last 7 days by default) with entry count and streak"""
+
+    start, end = window or timestamps.window()
+
+    # Get the window's entry analyses through the (session_id, created_at_epoch) index
+    async with db.execute(
+        """
+        SELECT themes_json, emotions_json
+        FROM entry_analysis ea
+        JOIN journal_entries je ON ea.entry_id = je.id
+        WHERE je.session_id = ? AND je.created_at_epoch >= ? AND je.created_at_epoch < ?
+        """,
+        (session_id, start, end)
+    ) as cursor:
+        analyses = await cursor.fetchall()
+    
+    # Aggregate themes and emotions
+    theme_counts: dict = {}
+    emotion_counts: dict = {}
+    
+    for row in analyses:
+        try:
+            themes = json_codec.loads_or(row[0], [])
+            emotions = json_codec.loads_or(row[1], [])
+            
+            for theme in themes:
+                theme_counts[theme] = theme_counts.get(theme, 0) + 1
+            
+            for emotion in emotions:
+                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+        except json.JSONDecodeError:
+            continue
+    
+    return TrendsResponse(
+        theme_counts=theme_counts,
+        emotion_counts=emotion_counts,
+        entry_count=await queries.ENTRY_COUNT.scalar(db, session_id, default=0),
+        streak_days=await queries.STREAK_DAYS.scalar(db, session_id, default=0),
+    )
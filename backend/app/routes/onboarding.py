@@ -3,9 +3,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from app.schemas.onboarding import OnboardingRequest, OnboardingResponse
 from app.services.llm_service import analyze_brain_dump
 from app.services.tree_service import generate_tree
+from app.services.thread_service import embed_items, upsert_threads
+from app.services.change_log import record_change, PROMPTS
+from app.services.event_broker import event_broker, PROMPTS as PROMPTS_EVENT
 from app.db.database import get_db
-import json
-from datetime import datetime
+from app.db import queries
+from app.dependencies import ensure_session
+from app.services import json_codec
+from app.services import timestamps
+import asyncio
 
 router = APIRouter()
 
@@ -17,19 +23,13 @@ async def submit_onboarding(
     """Process onboarding brain dump and return starter prompts"""
     
     # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (request.session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
+    await ensure_session(db, request.session_id, write=True)
     
-    # Analyze brain dump (mock for now)
-    analysis = analyze_brain_dump(request.brain_dump)
+    # Analyze brain dump (falls back to default starter prompts if the model is down)
+    analysis = await asyncio.to_thread(analyze_brain_dump, request.brain_dump)
     
     # Create initial tree (stored in database)
     tree_data = analysis["initial_tree"]
-    now = datetime.now().isoformat()
     
     # Note: initial_tree has entry_id=0, store it separately or handle specially
     # For now, we'll create it when first entry is created
@@ -44,49 +44,23 @@ async def submit_onboarding(
         for p in analysis["starter_prompts"]
     ]
 
-    now = datetime.now().isoformat()
+    thread_items = [t.thread for t in analysis["threads"]]
+    # Embed before the writes below open a transaction
+    item_vectors = await embed_items(thread_items)
+    now = timestamps.now_iso()
 
-    async with db.execute(
-        """
-        SELECT COUNT(*) FROM prompts
-        WHERE session_id = ? AND source = ?
-        """,
-        (request.session_id, "onboarding")
-    ) as cursor:
-        num_onboarding_prompts = (await cursor.fetchone())[0]
-
-    if num_onboarding_prompts == 0:
-        await db.execute(
-            """
-            INSERT INTO prompts (
-                session_id, created_at, source, prompts_json
-            )
-            VALUES (?, ?, ?, ?)
-            """,
-            (
-                request.session_id,
-                now,
-                "onboarding",
-                json.dumps(starter_prompts)
-            )
-        )
-    else:
-        await db.execute(
-            """
-            UPDATE prompts
-            SET prompts_json = ?, created_at = ?
-            WHERE session_id = ? AND source = ?
-            """,
-            (
-                json.dumps(starter_prompts),
-                now,
-                request.session_id,
-                "onboarding"
-            )
-        )
+    await queries.SAVE_PROMPT_SET.run(db, request.session_id, now, "onboarding", json_codec.dumps(starter_prompts))
+    await record_change(db, request.session_id, PROMPTS, "onboarding")
     
-    # Convert threads to response format (empty for now)
-    active_threads = []  # Could extract from brain_dump analysis
+    # Persist threads found in the brain dump
+    active_threads = await upsert_threads(
+        db,
+        request.session_id,
+        thread_items,
+        item_vectors=item_vectors,
+    )
+    await db.commit()
+    await event_broker.publish(request.session_id, PROMPTS_EVENT, {"source": "onboarding", "prompts": starter_prompts})
     
     return OnboardingResponse(
         starter_prompts=starter_prompts,
@@ -1,106 +1,43 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, Depends
 from app.schemas.prompts import TodayPromptsResponse
 from app.services.llm_service import generate_prompts
-from app.services.chroma_service import ChromaService
 from app.db.database import get_db
+from app.db import queries
+from app.services.thread_service import load_active_threads
+from app.services.fallbacks import default_prompts
+from app.dependencies import valid_session
+from app.services import json_codec
+from app.services.json_codec import DefaultJSONResponse
 import aiosqlite
-import json
-from typing import Optional
+from typing import Dict, Optional
 
 router = APIRouter()
-chroma_db = ChromaService()
 
 @router.get("/today", response_model=TodayPromptsResponse)
 async def get_today_prompts(
-    session_id: str = Query(..., description="Session ID"),
+    session_id: str = Depends(valid_session),
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get today's prompts and active threads for a session"""
-    
-    # Verify session exists
-    async with db.execute(
-        "SELECT id FROM sessions WHERE id = ?", (session_id,)
-    ) as cursor:
-        session = await cursor.fetchone()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-    
-    async with db.execute(
-        """
-        SELECT COUNT(id) FROM journal_entries
-        WHERE session_id = ?
-        """,
-        (session_id,)
-    ) as cursor:
-        num_entries = (await cursor.fetchone())[0]
+    return DefaultJSONResponse(await load_today_prompts(db, session_id))
 
-    async with db.execute(
-        """
-        SELECT COUNT(*) FROM prompts
-        WHERE session_id = ? AND source = ?
-        """,
-        (session_id, "generated")
-    ) as cursor:
-        num_generated_prompts = (await cursor.fetchone())[0]
+async def load_today_prompts(db: aiosqlite.Connection, session_id: str) -> Dict:
+    """Load the current prompt set and active threads of a session, shaped like TodayPromptsResponse"""
 
-    if num_entries == 0 or num_generated_prompts == 0:
-        #use starter prompts
-        async with db.execute(
-        """
-        SELECT prompts_json FROM prompts
-        WHERE source = ? AND session_id = ?
-        """, 
-        ("onboarding", session_id)
-        ) as cursor:
-            prompts = (await cursor.fetchone())[0]
-            prompts_json = json.loads(prompts)
+    num_entries = await queries.ENTRY_COUNT.scalar(db, session_id, default=0)
+    generated = await queries.PROMPT_SET.scalar(db, session_id, "generated") if num_entries else None
 
-        return TodayPromptsResponse(
-        prompts=prompts_json,
-        active_threads=[],
-        )   
+    if generated is None:
+        #use starter prompts, or generic ones for sessions that skipped onboarding
+        prompts = json_codec.loads_or(await queries.PROMPT_SET.scalar(db, session_id, "onboarding"), None)
 
-    
-
-    # Get active threads
-    async with db.execute(
-        """
-        SELECT id, thread, status, created_at, updated_at, last_seen_entry_id
-        FROM threads
-        WHERE session_id = ? AND status = 'active'
-        ORDER BY updated_at DESC
-        LIMIT 3
-        """,
-        (session_id,)
-    ) as cursor:
-        thread_rows = await cursor.fetchall()
-    
-    active_threads = [
-        {
-            "id": row[0],
-            "thread": row[1],
-            "status": row[2],
-            "created_at": row[3],
-            "updated_at": row[4],
-            "last_seen_entry_id": row[5],
+        return {
+            "prompts": prompts or [p.model_dump() for p in default_prompts()],
+            "active_threads": [],
         }
-        for row in thread_rows
-    ]
 
-   # Get prompts
-    async with db.execute(
-    """
-    SELECT prompts_json FROM prompts
-    WHERE source = ? AND session_id = ?
-    """, 
-    ("generated", session_id)
-    ) as cursor:
-        prompts = (await cursor.fetchone())[0]
-        prompts_json = json.loads(prompts)
-    
-    
-    return TodayPromptsResponse(
-        prompts=prompts_json,
-        active_threads=active_threads,
-    )
+    return {
+        "prompts": json_codec.loads(generated),
+        "active_threads": await load_active_threads(db, session_id),
+    }
 
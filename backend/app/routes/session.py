@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends
 import uuid
-from datetime import datetime
 from app.schemas.session import SessionResponse
 from app.db.database import get_db
+from app.services.session_registry import session_registry
+from app.services import timestamps
 import aiosqlite
 
 router = APIRouter()
@@ -11,13 +12,14 @@ router = APIRouter()
 async def create_session(db: aiosqlite.Connection = Depends(get_db)):
     """Create a new session and return session_id"""
     session_id = str(uuid.uuid4())
-    now = datetime.now().isoformat()
+    now = timestamps.now_iso()
     
     await db.execute(
         "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
         (session_id, now, now)
     )
     await db.commit()
+    session_registry.add(session_id)
     
     return SessionResponse(session_id=session_id)
 
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Query
+from app.schemas.sync import SyncResponse
+from app.services.change_log import load_sync
+from app.db.database import get_db
+from app.dependencies import valid_session
+from app.services.json_codec import DefaultJSONResponse
+import aiosqlite
+
+router = APIRouter()
+
+@router.get("/sync", response_model=SyncResponse)
+async def get_sync(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    session_id: str = Depends(valid_session),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """Get entries, trees, threads and prompts changed after cursor `since`"""
+
+    return DefaultJSONResponse(await load_sync(db, session_id, since, limit))
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.schemas.threads import ThreadUpdateRequest
 from app.db.database import get_db
+from app.services.change_log import record_change, THREAD
+from app.services import timestamps
 import aiosqlite
-from datetime import datetime
 
 router = APIRouter()
 
@@ -16,14 +17,19 @@ async def update_thread(
     
     # Verify thread exists
     async with db.execute(
-        "SELECT id, session_id FROM threads WHERE id = ?", (thread_id,)
+        """
+        SELECT t.id, t.session_id FROM threads t
+        JOIN sessions s ON s.id = t.session_id
+        WHERE t.id = ? AND s.deleted_at IS NULL
+        """,
+        (thread_id,)
     ) as cursor:
         thread = await cursor.fetchone()
         if not thread:
             raise HTTPException(status_code=404, detail="Thread not found")
     
     # Update thread status
-    now = datetime.utcnow().isoformat()
+    now = timestamps.now_iso()
     await db.execute(
         """
         UPDATE threads 
@@ -32,6 +38,7 @@ async def update_thread(
         """,
         (request.status, now, thread_id)
     )
+    await record_change(db, thread[1], THREAD, thread_id)
     await db.commit()
     
     return {"message": "Thread updated successfully", "thread_id": thread_id}
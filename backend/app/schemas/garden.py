@@ -6,3 +6,26 @@ class GardenResponse(BaseModel):
     streak_days: int
     trees: List[Tree]
 
+
+class GardenLayoutResponse(BaseModel):
+    """
+    Columnar tree positions. entry_ids and days (since 1970-01-01) are
+    delta-encoded; types, rarities and names index into the catalog.
+    """
+    version: int
+    total: int
+    count: int
+    entry_ids: List[int]
+    x: List[int]
+    y: List[int]
+    types: List[int]
+    rarities: List[int]
+    names: List[int]
+    days: List[int]
+
+class GardenCatalogResponse(BaseModel):
+    types: List[str]
+    rarities: List[str]
+    names: List[List[str]]
+    tree_spacing: int
+    grove_spacing: int
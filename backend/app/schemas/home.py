@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+from app.schemas.garden import GardenResponse
+from app.schemas.insights import TrendsResponse
+from app.schemas.prompts import TodayPromptsResponse
+
+class HomeResponse(BaseModel):
+    num_entries: Optional[int] = None
+    prompts: Optional[TodayPromptsResponse] = None
+    garden: Optional[GardenResponse] = None
+    trends: Optional[TrendsResponse] = None
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Literal
+
+class ImportJob(BaseModel):
+    id: str
+    session_id: str
+    status: Literal["parsing", "pending", "running", "completed", "partial", "interrupted", "failed"]
+    total: int
+    processed: int
+    failed: int
+    created_at: str
+    updated_at: str
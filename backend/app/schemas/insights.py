@@ -12,3 +12,7 @@ class WeeklyInsightsResponse(BaseModel):
     themes: List[str]
     emotions_summary: Dict[str, int]
 
+
+class PeriodDigest(BaseModel):
+    summary: str
+    themes: List[str]
@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.schemas.threads import Thread
+from app.schemas.trees import Tree
+
+class SyncEntry(BaseModel):
+    entry_id: int
+    created_at: str
+    prompt_used: Optional[str] = None
+    memory_summary: Optional[str] = None
+    patterns_reflection: Optional[str] = None
+    follow_up_question: Optional[str] = None
+    themes: List[str]
+    emotions: List[str]
+
+class SyncTree(Tree):
+    x: Optional[int] = None
+    y: Optional[int] = None
+
+class SyncDeletion(BaseModel):
+    kind: str
+    ref: str
+
+class SyncResponse(BaseModel):
+    """
+    Rows changed after the client's cursor; full is set when the whole
+    session was returned and the client should replace its copy.
+    """
+    cursor: int
+    has_more: bool
+    full: bool
+    entries: List[SyncEntry]
+    trees: List[SyncTree]
+    threads: List[Thread]
+    prompts: Dict[str, List[Dict]]
+    deleted: List[SyncDeletion]
@@ -0,0 +1,141 @@
+"""
+Change feed for client sync.
+
+Every mutation of an entry, tree, thread or prompt set appends a row to
+change_log in the same transaction. Sequence numbers only grow, so a
+client that remembers the last one it saw can ask for just the rows that
+changed since, whatever the size of the journal.
+"""
+
+from typing import Dict, Iterable, List, Optional
+import aiosqlite
+from app.db.database import dialect
+from app.db import queries
+from app.services import json_codec
+from app.services import timestamps
+
+# Kinds of rows tracked by the feed
+ENTRY = "entry"
+TREE = "tree"
+THREAD = "thread"
+PROMPTS = "prompts"
+# Entries of an import job were added or rolled back; ref is the job ID
+IMPORT = "import"
+
+async def record_change(db: aiosqlite.Connection, session_id: str, kind: str, ref, op: str = "upsert"):
+    """
+    Note that a row changed; the caller commits with its own transaction.
+    """
+    await record_changes(db, session_id, kind, [ref], op)
+
+async def record_changes(db: aiosqlite.Connection, session_id: str, kind: str, refs: Iterable, op: str = "upsert"):
+    if dialect.lock_session_changes:
+        await db.execute(dialect.lock_session_changes, (session_id,))
+    now = timestamps.now_iso()
+    await queries.ADD_CHANGE.run_many(db, [(session_id, kind, str(ref), op, now) for ref in refs])
+
+async def current_seq(db: aiosqlite.Connection, session_id: str) -> int:
+    return await queries.CHANGE_SEQ.scalar(db, session_id, default=0)
+
+async def changes_since(db: aiosqlite.Connection, session_id: str, since: int, limit: int) -> tuple:
+    """
+    Latest change per row after `since`, reading at most `limit` log rows.
+
+    Returns ({kind: {ref: op}}, cursor, has_more).
+    """
+    rows = await queries.CHANGES_SINCE.all(db, session_id, since, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changed: Dict[str, Dict[str, str]] = {}
+    for _, kind, ref, op in rows:
+        # Later rows overwrite earlier ones, leaving the latest op per row
+        changed.setdefault(kind, {})[ref] = op
+    cursor_seq = rows[-1][0] if rows else since
+    return changed, cursor_seq, has_more
+
+async def load_entries(db: aiosqlite.Connection, session_id: str, entry_ids: Optional[List[int]] = None) -> List[Dict]:
+    if entry_ids is None:
+        rows = await queries.SESSION_SYNC_ENTRIES.all(db, session_id)
+    else:
+        rows = await queries.SESSION_SYNC_ENTRIES_BY_ID.all_in(db, sorted(entry_ids), session_id)
+    return [
+        {
+            "entry_id": row[0],
+            "created_at": row[1],
+            "prompt_used": row[2],
+            "memory_summary": row[3],
+            "patterns_reflection": row[4],
+            "follow_up_question": row[5],
+            "themes": json_codec.loads_or(row[6], []),
+            "emotions": json_codec.loads_or(row[7], []),
+        }
+        for row in rows
+    ]
+
+async def load_trees(db: aiosqlite.Connection, session_id: str, entry_ids: Optional[List[int]] = None) -> List[Dict]:
+    if entry_ids is None:
+        rows = await queries.SESSION_PLACED_TREES.all(db, session_id)
+    else:
+        rows = await queries.SESSION_PLACED_TREES_BY_ID.all_in(db, sorted(entry_ids), session_id)
+    return [row.as_dict() for row in rows]
+
+async def load_threads(db: aiosqlite.Connection, session_id: str, thread_ids: Optional[List[int]] = None) -> List[Dict]:
+    if thread_ids is None:
+        rows = await queries.SESSION_THREADS.all(db, session_id)
+    else:
+        rows = await queries.SESSION_THREADS_BY_ID.all_in(db, sorted(thread_ids), session_id)
+    return [row.as_dict() for row in rows]
+
+async def load_prompt_sets(db: aiosqlite.Connection, session_id: str, sources: Optional[List[str]] = None) -> Dict[str, List]:
+    if sources is None:
+        rows = await queries.SESSION_PROMPT_SETS.all(db, session_id)
+    else:
+        rows = await queries.SESSION_PROMPT_SETS_BY_SOURCE.all_in(db, sources, session_id)
+    return {row[0]: json_codec.loads(row[1]) for row in rows}
+
+async def _imported_entry_ids(db: aiosqlite.Connection, session_id: str, job_ids: List[str]) -> List[int]:
+    return [row[0] for row in await queries.IMPORTED_ENTRY_IDS.all_in(db, job_ids, session_id)]
+
+async def load_sync(db: aiosqlite.Connection, session_id: str, since: int, limit: int) -> Dict:
+    """
+    Rows changed after `since`; since=0 returns the session's full state.
+    """
+    if since == 0:
+        # Rows written before the change log existed have no log entries
+        cursor_seq = await current_seq(db, session_id)
+        return {
+            "cursor": cursor_seq,
+            "has_more": False,
+            "full": True,
+            "entries": await load_entries(db, session_id),
+            "trees": await load_trees(db, session_id),
+            "threads": await load_threads(db, session_id),
+            "prompts": await load_prompt_sets(db, session_id),
+            "deleted": [],
+        }
+
+    changed, cursor_seq, has_more = await changes_since(db, session_id, since, limit)
+
+    def refs(kind: str, op: str = "upsert", cast=int) -> List:
+        return [cast(ref) for ref, ref_op in changed.get(kind, {}).items() if ref_op == op]
+
+    entry_ids, tree_ids, thread_ids, sources = refs(ENTRY), refs(TREE), refs(THREAD), refs(PROMPTS, cast=str)
+    import_ids = refs(IMPORT, cast=str)
+    if import_ids:
+        entry_ids = sorted(set(entry_ids) | set(await _imported_entry_ids(db, session_id, import_ids)))
+    deleted = [
+        {"kind": kind, "ref": ref}
+        for kind, ops in changed.items()
+        for ref, op in ops.items()
+        if op == "delete"
+    ]
+    return {
+        "cursor": cursor_seq,
+        "has_more": has_more,
+        "full": False,
+        "entries": await load_entries(db, session_id, entry_ids) if entry_ids else [],
+        "trees": await load_trees(db, session_id, tree_ids) if tree_ids else [],
+        "threads": await load_threads(db, session_id, thread_ids) if thread_ids else [],
+        "prompts": await load_prompt_sets(db, session_id, sources) if sources else {},
+        "deleted": deleted,
+    }
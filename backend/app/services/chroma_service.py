@@ -3,128 +3,502 @@ Chroma Vector Database Service for semantic search and retrieval.
 """
 
 import os
+import hashlib
+from collections import OrderedDict
 from dotenv import load_dotenv
-from pathlib import Path
-from typing import List, Dict, Optional
-import chromadb
+from typing import Iterable, List, Dict, Optional, Set, Tuple
 import json
-from chromadb.config import Settings
-from mistralai import Mistral
+from app.services.exact_index import ExactSearchIndex
+from app.services.metrics import metrics
+from app.services.llm_client import mistral_llm, get_mistral_client
+from app.services.process_lock import process_lock
+from app.config import CHROMA_DB_PATH, CHROMA_HOST, CHROMA_PORT
 
 load_dotenv()
-MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY")
-CHROMA_DB_PATH = Path("chroma_db")
+
+# Partitioning strategy for the vector index:
+# - "session": one collection per session, queries never touch other users' vectors
+# - "shard": a fixed number of collections keyed by session hash, filtered by session_id
+CHROMA_PARTITION_MODE = os.environ.get("CHROMA_PARTITION_MODE", "session")
+CHROMA_NUM_SHARDS = int(os.environ.get("CHROMA_NUM_SHARDS", "16"))
+
+# Single global collection used before partitioning was introduced
+LEGACY_COLLECTION_NAME = "journal_entries"
+
+# Max number of collection handles kept open
+PARTITION_CACHE_SIZE = 256
+
+# Vector backend used for similarity search:
+# - "chroma": HNSW search in Chroma only
+# - "exact": in-process brute-force search for small sessions, Chroma above the threshold
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+EXACT_SEARCH_MAX_ENTRIES = int(os.environ.get("EXACT_SEARCH_MAX_ENTRIES", "2000"))
 
 class ChromaService:
     """
     Service for managing Chroma vector database.
-    
+
     1. Initialize persistent Chroma client
-    2. Create collection for journal entries
-    3. Generate embeddings (using OpenAI or sentence-transformers)
+    2. Route each session to its own partition (collection)
+    3. Generate embeddings (using Mistral)
     4. Store entry text with metadata (session_id, entry_id, timestamp)
-    5. Query for similar entries
+    5. Query for similar entries within the session's partition
     6. Retrieve context for LLM prompts
     """
-    
+
     def __init__(self):
         self.initialized = False
-        self.client = chromadb.PersistentClient(
-            path=str(CHROMA_DB_PATH),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection = self.client.get_or_create_collection(
-            name="journal_entries",
-            metadata={"hnsw:space": "cosine"}
-        )
-        self.mistral_client = Mistral(api_key=MISTRAL_API_KEY)
+        self.partition_mode = CHROMA_PARTITION_MODE
+        self.num_shards = CHROMA_NUM_SHARDS
+        self._partitions: "OrderedDict[str, object]" = OrderedDict()
+        self.client = None
+        self.exact_index = None
+        # Serializes writes to the Chroma directory and exact index across workers
+        self._write_lock = process_lock("chroma")
+
+    def init(self):
+        """
+        Open the Chroma client; called from the startup hook (and by scripts).
+
+        chromadb is imported here rather than at module level so importing
+        the app stays fast.
+        """
+        if self.initialized:
+            return
+
+        import chromadb
+        from chromadb.config import Settings
+
+        if CHROMA_HOST:
+            # A Chroma server is the safe way to share vectors between worker processes
+            self.client = chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=CHROMA_PORT,
+                settings=Settings(anonymized_telemetry=False)
+            )
+        else:
+            self.client = chromadb.PersistentClient(
+                path=str(CHROMA_DB_PATH),
+                settings=Settings(anonymized_telemetry=False)
+            )
+        self.exact_index = ExactSearchIndex() if VECTOR_BACKEND == "exact" else None
         self.initialized = True
-    
-    def store_entry(self, entry_id: int, session_id: str, text: str, metadata: Dict = None):
+        self.migrate_legacy_collection()
+
+    def partition_name(self, session_id: str) -> str:
+        """
+        Name of the collection holding a session's vectors.
+
+        Session IDs are hashed so names always satisfy Chroma's naming rules.
+        """
+        digest = hashlib.sha1(session_id.encode()).hexdigest()
+        if self.partition_mode == "shard":
+            shard = int(digest, 16) % self.num_shards
+            return f"journal_shard_{shard:03d}"
+        return f"journal_session_{digest[:32]}"
+
+    def _get_partition(self, session_id: str, create: bool = True):
+        """
+        Get the collection for a session, using a bounded cache of handles.
+
+        Returns None if the partition does not exist and create is False.
+        """
+        name = self.partition_name(session_id)
+        collection = self._partitions.get(name)
+        if collection is not None:
+            self._partitions.move_to_end(name)
+            return collection
+
+        if create:
+            collection = self.client.get_or_create_collection(
+                name=name,
+                metadata={"hnsw:space": "cosine"}
+            )
+        else:
+            try:
+                collection = self.client.get_collection(name=name)
+            except Exception:
+                return None
+
+        self._partitions[name] = collection
+        if len(self._partitions) > PARTITION_CACHE_SIZE:
+            self._partitions.popitem(last=False)
+        return collection
+
+    def _where(self, session_id: str, exclude_entry_ids: List = None) -> Optional[Dict]:
+        """
+        Build the metadata filter for a query.
+
+        Per-session partitions need no session filter, only the exclusion list.
+        """
+        clauses = []
+        if self.partition_mode == "shard":
+            clauses.append({"session_id": session_id})
+        if exclude_entry_ids:
+            clauses.append({"entry_id": {"$nin": list(exclude_entry_ids)}})
+
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+
+    def _vector_id(self, session_id: str, entry_id: int) -> str:
+        return f"{session_id}_{entry_id}"
+
+    def _prepare_metadata(self, session_id: str, metadata: Dict = None) -> Dict:
+        """
+        Chroma metadata only allows primitives, so lists and dicts are serialized.
+        """
+        metadata = dict(metadata or {})
+        metadata["session_id"] = session_id
+
+        for k, v in metadata.items():
+            if type(v) == list or type(v) == dict:
+                metadata[k] = json.dumps(v)
+        return metadata
+
+    def store_entry(self, entry_id: int, session_id: str, text: str, metadata: Dict = None) -> Optional[List[float]]:
         """
         Store entry text as embedding in Chroma.
-        
+
         The texts will be short summaries of journal entries, so chunking is not needed.
+        Returns the embedding, or None if the entry could not be stored.
         """
         if not self.initialized:
-            return
+            return None
 
         try:
-            metadata["session_id"] = session_id
-
-            for k, v in metadata.items():
-                if type(v) == list or type(v) == dict:
-                    metadata[k] = json.dumps(v)
+            metadata = self._prepare_metadata(session_id, metadata)
 
             embedding = self._generate_embedding(text)
-            self.collection.add(
-                ids=[f"{session_id}_{entry_id}"],
-                embeddings=[embedding],
-                documents=text,
-                metadatas=metadata
-            )
+            if embedding is None:
+                raise ValueError("no embedding generated")
+
+            with self._write_lock:
+                self._get_partition(session_id).add(
+                    ids=[self._vector_id(session_id, entry_id)],
+                    embeddings=[embedding],
+                    documents=text,
+                    metadatas=metadata
+                )
+                if self.exact_index is not None:
+                    self.exact_index.add(session_id, entry_id, text, embedding)
+            metrics.incr("vector_store_success")
+            return embedding
         except Exception as e:
+            metrics.incr("vector_store_failures")
             print(f"Could not store entry in ChromaDB: {e}")
+            return None
 
-    
-    def search_similar(self, query: str, session_id: str, exclude_entry_ids: List[str] = [], limit: int = 5) -> List[Dict]:
+    def store_entries(self, session_id: str, entries: List[Dict]) -> int:
         """
-        Search for similar entries using semantic similarity.
+        Embed and store many entries with a single embeddings request.
+
+        Each entry is a dict with entry_id, text and metadata.
+        Returns the number of entries stored.
         """
-        if not self.initialized:
-            return []
-        
+        if not self.initialized or not entries:
+            return 0
+
         try:
-            query_embedding = self._generate_embedding(query)
-            if not exclude_entry_ids:
-                results = self.collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=limit,
-                    where={"session_id" : session_id}
-                )
-            else:
-                results = self.collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=limit,
-                    where={
-                        "$and" : [
-                            {"session_id": session_id},
-                            {"entry_id": {"$nin": exclude_entry_ids}}
-                        ]
-                    }
-                   
+            embeddings = self._generate_embeddings([e["text"] for e in entries])
+            if embeddings is None:
+                raise ValueError("no embeddings generated")
+
+            with self._write_lock:
+                self._get_partition(session_id).upsert(
+                    ids=[self._vector_id(session_id, e["entry_id"]) for e in entries],
+                    embeddings=embeddings,
+                    documents=[e["text"] for e in entries],
+                    metadatas=[self._prepare_metadata(session_id, e.get("metadata")) for e in entries]
                 )
-            return results["documents"][0] if results["documents"] else []
+                if self.exact_index is not None:
+                    for entry, embedding in zip(entries, embeddings):
+                        self.exact_index.add(session_id, entry["entry_id"], entry["text"], embedding)
+            metrics.incr("vector_store_success", len(entries))
+            return len(entries)
+        except Exception as e:
+            metrics.incr("vector_store_failures", len(entries))
+            print(f"Could not store entries in ChromaDB: {e}")
+            return 0
+
+    def list_entry_ids(self, session_id: str) -> Set[int]:
+        """
+        IDs of all entries of a session that have a vector.
+        """
+        collection = self._get_partition(session_id, create=False)
+        if collection is None:
+            return set()
+
+        kwargs = {"where": {"session_id": session_id}} if self.partition_mode == "shard" else {}
+        results = collection.get(include=[], **kwargs)
+        prefix = f"{session_id}_"
+        return {
+            int(vector_id[len(prefix):])
+            for vector_id in results["ids"]
+            if vector_id.startswith(prefix)
+        }
+
+    def delete_entries(self, session_id: str, entry_ids: List[int]):
+        """
+        Delete individual entries of a session from Chroma.
+        """
+        if not self.initialized or not entry_ids:
+            return
+
+        with self._write_lock:
+            collection = self._get_partition(session_id, create=False)
+            if collection is not None:
+                collection.delete(ids=[self._vector_id(session_id, entry_id) for entry_id in entry_ids])
+            if self.exact_index is not None:
+                self.exact_index.remove(session_id, entry_ids)
+
+    def orphan_partitions(self, session_ids: Iterable[str]) -> List[str]:
+        """
+        Per-session partitions that belong to none of the given sessions.
+
+        Names are hashes of session IDs, so they are matched by name rather
+        than by the vectors inside (empty partitions are found too).
+        """
+        if self.partition_mode == "shard":
+            return []
+
+        known = {self.partition_name(session_id) for session_id in session_ids}
+        names = []
+        for collection in self.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if name.startswith("journal_session_") and name not in known:
+                names.append(name)
+        return sorted(names)
+
+    def drop_partition(self, name: str):
+        with self._write_lock:
+            self._partitions.pop(name, None)
+            self.client.delete_collection(name=name)
+
+    def exact_entry_ids(self, session_id: str) -> Optional[Set[int]]:
+        """
+        IDs of a session's entries in the exact index, or None without one.
+        """
+        if self.exact_index is None:
+            return None
+        return self.exact_index.entry_ids(session_id)
+
+    def orphan_exact_dirs(self, session_ids: Iterable[str]) -> List[str]:
+        """
+        Exact index directories that belong to none of the given sessions.
+        """
+        if self.exact_index is None:
+            return []
+        return self.exact_index.orphan_dirs(session_ids)
+
+    def drop_exact_dir(self, name: str):
+        with self._write_lock:
+            self.exact_index.delete_dir(name)
+
+    def copy_to_exact_index(self, session_id: str, entry_ids: List[int]) -> int:
+        """
+        Add entries already in Chroma to the exact index, without re-embedding.
+
+        Returns the number of entries copied.
+        """
+        if self.exact_index is None or not entry_ids:
+            return 0
+        collection = self._get_partition(session_id, create=False)
+        if collection is None:
+            return 0
+
+        results = collection.get(
+            ids=[self._vector_id(session_id, entry_id) for entry_id in entry_ids],
+            include=["embeddings", "documents"]
+        )
+        prefix = f"{session_id}_"
+        with self._write_lock:
+            for vector_id, embedding, document in zip(results["ids"], results["embeddings"], results["documents"]):
+                self.exact_index.add(session_id, int(vector_id[len(prefix):]), document, embedding)
+        return len(results["ids"])
+
+    def search_similar(
+        self,
+        session_id: str,
+        query_embedding: List[float],
+        exclude_entry_ids: List[int] = None,
+        limit: int = 5,
+    ) -> List[Tuple[int, float]]:
+        """
+        (entry_id, cosine similarity) of a session's entries closest to an embedding, best first.
+
+        Only the session's partition is searched, so cost scales with one journal.
+        Small sessions are answered by the exact in-process index when enabled.
+        """
+        if not self.initialized or query_embedding is None:
+            return []
+
+        try:
+            if self.exact_index is not None:
+                num_vectors = self.exact_index.count(session_id)
+                if 0 < num_vectors <= EXACT_SEARCH_MAX_ENTRIES:
+                    return self.exact_index.search(
+                        session_id, query_embedding, exclude_entry_ids, limit
+                    )
+
+            collection = self._get_partition(session_id, create=False)
+            if collection is None:
+                return []
+
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=limit,
+                where=self._where(session_id, exclude_entry_ids),
+                include=["distances"]
+            )
+            if not results["ids"]:
+                return []
+            prefix = f"{session_id}_"
+            # Partitions use cosine distance, which is 1 - similarity
+            return [
+                (int(vector_id[len(prefix):]), 1.0 - distance)
+                for vector_id, distance in zip(results["ids"][0], results["distances"][0])
+                if vector_id.startswith(prefix)
+            ]
         except Exception as e:
             print(f"Failed to perform similarity search: {e}")
-    
+            return []
+
+    def get_embeddings(self, session_id: str, entry_ids: List[int]) -> Dict[int, List[float]]:
+        """
+        Stored embeddings of a session's entries, from the exact index when it
+        has them and from the session's partition otherwise.
+        """
+        if not self.initialized or not entry_ids:
+            return {}
+
+        try:
+            found: Dict[int, List[float]] = {}
+            if self.exact_index is not None:
+                found.update(self.exact_index.vectors(session_id, entry_ids))
+            missing = [entry_id for entry_id in entry_ids if entry_id not in found]
+            collection = self._get_partition(session_id, create=False) if missing else None
+            if collection is not None:
+                results = collection.get(
+                    ids=[self._vector_id(session_id, entry_id) for entry_id in missing],
+                    include=["embeddings"]
+                )
+                prefix = f"{session_id}_"
+                for vector_id, embedding in zip(results["ids"], results["embeddings"]):
+                    if vector_id.startswith(prefix):
+                        found[int(vector_id[len(prefix):])] = embedding
+            return found
+        except Exception as e:
+            print(f"Failed to load embeddings: {e}")
+            return {}
+
     def delete_session_entries(self, session_id: str):
         """
         Delete all entries for a session from Chroma.
+
+        With per-session partitions this drops the whole collection.
         """
         if not self.initialized:
             return
-        
+
         try:
-            results = self.collection.get(where={"session_id" : session_id})
-            if results and results["ids"]:
-                self.collection.delete(ids=results["ids"])
+            with self._write_lock:
+                if self.exact_index is not None:
+                    self.exact_index.delete_session(session_id)
+
+                name = self.partition_name(session_id)
+                if self.partition_mode == "shard":
+                    collection = self._get_partition(session_id, create=False)
+                    if collection is not None:
+                        collection.delete(where={"session_id": session_id})
+                    return
+
+                if self._get_partition(session_id, create=False) is None:
+                    return
+                self._partitions.pop(name, None)
+                self.client.delete_collection(name=name)
         except Exception as e:
             print(f"Failed to delete session entries: {e}")
-    
+
+    def migrate_legacy_collection(self, batch_size: int = 500):
+        """
+        Move vectors from the old global collection into session partitions.
+
+        Runs once; the legacy collection is dropped after all vectors are copied.
+        """
+        try:
+            legacy = self.client.get_collection(name=LEGACY_COLLECTION_NAME)
+        except Exception:
+            return
+
+        try:
+            with self._write_lock:
+                total = legacy.count()
+                for offset in range(0, total, batch_size):
+                    batch = legacy.get(
+                        limit=batch_size,
+                        offset=offset,
+                        include=["embeddings", "documents", "metadatas"]
+                    )
+
+                    grouped: Dict[str, Dict[str, list]] = {}
+                    for i, vector_id in enumerate(batch["ids"]):
+                        metadata = batch["metadatas"][i] or {}
+                        session_id = metadata.get("session_id")
+                        if not session_id:
+                            continue
+                        group = grouped.setdefault(
+                            session_id,
+                            {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+                        )
+                        group["ids"].append(vector_id)
+                        group["embeddings"].append(batch["embeddings"][i])
+                        group["documents"].append(batch["documents"][i])
+                        group["metadatas"].append(metadata)
+
+                    for session_id, group in grouped.items():
+                        self._get_partition(session_id).upsert(**group)
+
+                self.client.delete_collection(name=LEGACY_COLLECTION_NAME)
+                print(f"Migrated {total} vectors from '{LEGACY_COLLECTION_NAME}' into partitions")
+        except Exception as e:
+            print(f"Failed to migrate legacy collection: {e}")
+
+    def embed_texts(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed texts for callers outside the vector index (e.g. thread matching).
+        """
+        if not self.initialized or not texts:
+            return None
+        return self._generate_embeddings(texts)
+
     def _generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding vector for text.
         """
         try:
-            response = self.mistral_client.embeddings.create(
+            response = mistral_llm.call(lambda: get_mistral_client().embeddings.create(
                 model="mistral-embed",
                 inputs=text
-            )
+            ), retries=1)
             return response.data[0].embedding
         except Exception as e:
             print(f"Failed to generate embedding: {e}")
 
+    def _generate_embeddings(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Generate embedding vectors for many texts in one request.
+        """
+        try:
+            response = mistral_llm.call(lambda: get_mistral_client().embeddings.create(
+                model="mistral-embed",
+                inputs=texts
+            ), retries=1)
+            return [item.embedding for item in response.data]
+        except Exception as e:
+            print(f"Failed to generate embeddings: {e}")
+
 # Global instance
 chroma_service = ChromaService()
-
@@ -0,0 +1,141 @@
+"""
+Background deletion of sessions.
+
+Deleting a session first marks it as tombstoned (sessions.deleted_at),
+which every read path treats as "not found". The rows and vectors are
+then purged in small chunks so no single transaction holds the write
+lock for long. The session row goes last, once every worker has had time
+to evict it from its session cache; a write that slipped in before a
+worker noticed the tombstone is caught by the final delete's foreign key
+and purged on the next pass.
+"""
+
+import asyncio
+from typing import Set
+import aiosqlite
+from app.db.database import connect, dialect
+from app.db import queries
+from app.services.chroma_service import chroma_service
+from app.services.session_registry import session_registry, SESSION_TOMBSTONE_POLL_SECONDS
+from app.services.retrieval import memory_index
+from app.services import timestamps
+
+PURGE_CHUNK_SIZE = 500
+# Passes over a session's data before giving up on rows written concurrently
+PURGE_ATTEMPTS = 3
+
+# Tables keyed by session_id, purged after entries
+SESSION_TABLES = ["threads", "prompts", "streak_days", "import_jobs", "change_log", "digests", "digest_failures"]
+
+# Keep references so running purges aren't garbage collected
+_running_purges: Set[asyncio.Task] = set()
+
+async def tombstone_session(db: aiosqlite.Connection, session_id: str) -> int:
+    """
+    Mark a session as deleted and return how many entries it had.
+    """
+    session_registry.discard(session_id)
+    memory_index.forget(session_id)
+
+    now = timestamps.now_iso()
+    await db.execute(
+        "UPDATE sessions SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL",
+        (now, session_id)
+    )
+
+    async with db.execute(
+        "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?",
+        (session_id,)
+    ) as cursor:
+        num_entries = (await cursor.fetchone())[0]
+
+    await db.commit()
+    return num_entries
+
+async def _purge_entries(db: aiosqlite.Connection, session_id: str):
+    """
+    Delete entries with their analyses, trees and layout, one chunk per transaction.
+    """
+    while True:
+        async with db.execute(
+            "SELECT id FROM journal_entries WHERE session_id = ? ORDER BY id LIMIT ?",
+            (session_id, PURGE_CHUNK_SIZE)
+        ) as cursor:
+            entry_ids = [row[0] for row in await cursor.fetchall()]
+        if not entry_ids:
+            return
+
+        placeholders = ",".join("?" * len(entry_ids))
+        await db.execute(f"DELETE FROM entry_analysis WHERE entry_id IN ({placeholders})", entry_ids)
+        await db.execute(f"DELETE FROM garden_layout WHERE entry_id IN ({placeholders})", entry_ids)
+        await db.execute(f"DELETE FROM trees WHERE entry_id IN ({placeholders})", entry_ids)
+        await db.execute(f"DELETE FROM journal_entries WHERE id IN ({placeholders})", entry_ids)
+        await db.commit()
+
+        # Let other requests take the write lock between chunks
+        await asyncio.sleep(0)
+
+async def _purge_table(db: aiosqlite.Connection, table: str, session_id: str):
+    """
+    Delete a session's rows from a table, one chunk per transaction.
+    """
+    while True:
+        cursor = await db.execute(dialect.delete_chunk(table), (session_id, PURGE_CHUNK_SIZE))
+        await db.commit()
+        if cursor.rowcount < PURGE_CHUNK_SIZE:
+            return
+        await asyncio.sleep(0)
+
+async def _purge_data(db: aiosqlite.Connection, session_id: str):
+    await _purge_entries(db, session_id)
+    for table in SESSION_TABLES:
+        await _purge_table(db, table, session_id)
+    await asyncio.to_thread(chroma_service.delete_session_entries, session_id)
+
+async def purge_session(session_id: str):
+    """
+    Remove all data of a tombstoned session, then the session itself.
+
+    Safe to re-run: every step only deletes what is left.
+    """
+    try:
+        async with connect(foreign_keys=True) as db:
+            await _purge_data(db, session_id)
+            # Keep the tombstone visible for two polls of every worker
+            await asyncio.sleep(2 * SESSION_TOMBSTONE_POLL_SECONDS)
+
+            for attempt in range(PURGE_ATTEMPTS):
+                try:
+                    await db.execute(
+                        "DELETE FROM sessions WHERE id = ? AND deleted_at IS NOT NULL",
+                        (session_id,)
+                    )
+                    await db.commit()
+                    return
+                except Exception:
+                    # Rows were written after their table was purged
+                    await db.rollback()
+                    if attempt == PURGE_ATTEMPTS - 1:
+                        raise
+                await _purge_data(db, session_id)
+    except Exception as e:
+        print(f"Failed to purge session {session_id}: {e}")
+
+def schedule_purge(session_id: str) -> asyncio.Task:
+    """
+    Start purging a session in the background.
+    """
+    task = asyncio.create_task(purge_session(session_id))
+    _running_purges.add(task)
+    task.add_done_callback(_running_purges.discard)
+    return task
+
+async def resume_pending_purges():
+    """
+    Restart purges interrupted by a shutdown.
+    """
+    async with connect() as db:
+        session_ids = [row[0] for row in await queries.TOMBSTONED_SESSIONS.all(db)]
+
+    for session_id in session_ids:
+        schedule_purge(session_id)
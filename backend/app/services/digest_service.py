@@ -0,0 +1,338 @@
+"""
+Hierarchical digests of long journals.
+
+Each closed week of a session is compacted into a weekly digest from its
+entries' memory summaries, and each closed month into a monthly digest
+from its weekly digests. A periodic batch job summarizes pending periods
+and embeds the digests, so prompt generation and weekly insights get
+long-range context from a few digests instead of a growing number of
+entries.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from datetime import date, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import aiosqlite
+import numpy as np
+from app.db.database import connect, dialect
+from app.services.chroma_service import chroma_service
+from app.services.llm_client import LLMUnavailableError
+from app.services.llm_service import summarize_period
+from app.services.metrics import metrics
+from app.services import json_codec
+from app.services import timestamps
+
+DIGEST_JOB_INTERVAL_SECONDS = int(os.environ.get("DIGEST_JOB_INTERVAL_SECONDS", "3600"))
+# Periods summarized per job run; the rest wait for the next run
+DIGEST_BATCH_SIZE = int(os.environ.get("DIGEST_BATCH_SIZE", "20"))
+# Entries passed to the model for one week; busier weeks are sampled evenly
+DIGEST_MAX_ITEMS = int(os.environ.get("DIGEST_MAX_ITEMS", "40"))
+# Hours before a period whose digest failed is tried again, unless it gains entries
+DIGEST_RETRY_HOURS = int(os.environ.get("DIGEST_RETRY_HOURS", "24"))
+# Digests passed to an LLM call as long-range context
+DIGEST_CONTEXT_LIMIT = int(os.environ.get("DIGEST_CONTEXT_LIMIT", "3"))
+
+WEEK = "week"
+MONTH = "month"
+
+# Monday of an entry's week (UTC, so every host agrees) and first day of a digest's month
+WEEK_START_SQL = dialect.week_start("je.created_at_epoch")
+MONTH_START_SQL = "substr({}, 1, 7) || '-01'"
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def _label(level: str, period_start: str) -> str:
+    start = date.fromisoformat(period_start)
+    if level == WEEK:
+        return f"Week of {start.isoformat()}"
+    return start.strftime("%B %Y")
+
+def _sample(items: List[Dict], limit: int) -> List[Dict]:
+    """At most limit items spread evenly over the list"""
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+def _retry_cutoff() -> str:
+    """Failures recorded before this are retried"""
+    return (timestamps.now() - timedelta(hours=DIGEST_RETRY_HOURS)).isoformat()
+
+async def _pending_weeks(db: aiosqlite.Connection, before: int, limit: int) -> List[Tuple[str, str]]:
+    """
+    Closed weeks with no digest, or with entries added since their digest,
+    skipping weeks that recently failed with the same entries
+    """
+    async with db.execute(
+        f"""
+        SELECT je.session_id, {WEEK_START_SQL} AS week_start
+        FROM journal_entries je
+        JOIN entry_analysis ea ON ea.entry_id = je.id
+        JOIN sessions s ON s.id = je.session_id AND s.deleted_at IS NULL
+        LEFT JOIN digests d ON d.session_id = je.session_id
+            AND d.level = 'week' AND d.period_start = {WEEK_START_SQL}
+        LEFT JOIN digest_failures f ON f.session_id = je.session_id
+            AND f.level = 'week' AND f.period_start = {WEEK_START_SQL} AND f.failed_at >= ?
+        WHERE je.created_at_epoch < ?
+        GROUP BY je.session_id, week_start
+        HAVING COUNT(*) != COALESCE(MAX(d.entry_count), 0)
+            AND COUNT(*) != COALESCE(MAX(f.entry_count), -1)
+        ORDER BY week_start
+        LIMIT ?
+        """,
+        (_retry_cutoff(), before, limit)
+    ) as cursor:
+        return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+async def _pending_months(db: aiosqlite.Connection, before: str, limit: int) -> List[Tuple[str, str]]:
+    """
+    Closed months with no digest, or whose weekly digests changed since,
+    skipping months that recently failed with the same weeks
+    """
+    async with db.execute(
+        f"""
+        SELECT w.session_id, {MONTH_START_SQL.format("w.period_start")} AS month_start
+        FROM digests w
+        JOIN sessions s ON s.id = w.session_id AND s.deleted_at IS NULL
+        LEFT JOIN digests m ON m.session_id = w.session_id
+            AND m.level = 'month' AND m.period_start = {MONTH_START_SQL.format("w.period_start")}
+        LEFT JOIN digest_failures f ON f.session_id = w.session_id
+            AND f.level = 'month' AND f.period_start = {MONTH_START_SQL.format("w.period_start")} AND f.failed_at >= ?
+        WHERE w.level = 'week' AND w.period_start < ?
+        GROUP BY w.session_id, month_start
+        HAVING SUM(w.entry_count) != COALESCE(MAX(m.entry_count), 0)
+            AND SUM(w.entry_count) != COALESCE(MAX(f.entry_count), -1)
+        ORDER BY month_start
+        LIMIT ?
+        """,
+        (_retry_cutoff(), before, limit)
+    ) as cursor:
+        return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+async def _week_sources(db: aiosqlite.Connection, session_id: str, week_start: str) -> Tuple[List[Dict], Dict[str, int], int]:
+    """Entry summaries of a week, its emotion counts and its entry count"""
+    async with db.execute(
+        f"""
+        SELECT ea.memory_summary, ea.themes_json, ea.emotions_json
+        FROM journal_entries je
+        JOIN entry_analysis ea ON ea.entry_id = je.id
+        WHERE je.session_id = ? AND {WEEK_START_SQL} = ?
+        ORDER BY je.created_at_epoch
+        """,
+        (session_id, week_start)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    items = [
+        {
+            "summary": row[0],
+            "themes": json_codec.loads_or(row[1], []),
+            "emotions": json_codec.loads_or(row[2], []),
+        }
+        for row in rows
+    ]
+    emotions = Counter(emotion for item in items for emotion in item["emotions"])
+    return _sample(items, DIGEST_MAX_ITEMS), dict(emotions), len(rows)
+
+async def _month_sources(db: aiosqlite.Connection, session_id: str, month_start: str) -> Tuple[List[Dict], Dict[str, int], int]:
+    """Weekly digests of the weeks starting in a month, their emotion counts and entry count"""
+    async with db.execute(
+        f"""
+        SELECT summary, themes_json, emotions_json, entry_count
+        FROM digests
+        WHERE session_id = ? AND level = 'week' AND {MONTH_START_SQL.format("period_start")} = ?
+        ORDER BY period_start
+        """,
+        (session_id, month_start)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    items = [
+        {
+            "summary": row[0],
+            "themes": json_codec.loads_or(row[1], []),
+            "emotions": json_codec.loads_or(row[2], {}),
+        }
+        for row in rows
+    ]
+    emotions = Counter()
+    for item in items:
+        emotions.update(item["emotions"])
+    return items, dict(emotions), sum(row[3] for row in rows)
+
+async def _write_digest(db: aiosqlite.Connection, session_id: str, level: str, period_start: str, sources):
+    """Summarize one period and store its digest, replacing an outdated one"""
+    items, emotions, entry_count = sources
+    digest = await asyncio.to_thread(summarize_period, level, _label(level, period_start), items)
+    await db.execute(
+        """
+        INSERT INTO digests (
+            session_id, level, period_start, summary, themes_json,
+            emotions_json, entry_count, embedding, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?)
+        ON CONFLICT (session_id, level, period_start) DO UPDATE SET
+            summary = excluded.summary,
+            themes_json = excluded.themes_json,
+            emotions_json = excluded.emotions_json,
+            entry_count = excluded.entry_count,
+            embedding = NULL,
+            created_at = excluded.created_at
+        """,
+        (
+            session_id,
+            level,
+            period_start,
+            digest["summary"],
+            json_codec.dumps(digest["themes"]),
+            json_codec.dumps(emotions),
+            entry_count,
+            timestamps.now_iso(),
+        )
+    )
+    await db.execute(
+        "DELETE FROM digest_failures WHERE session_id = ? AND level = ? AND period_start = ?",
+        (session_id, level, period_start)
+    )
+    # Committed per digest so the write lock isn't held across model calls
+    await db.commit()
+
+async def _record_failure(db: aiosqlite.Connection, session_id: str, level: str, period_start: str, entry_count: int):
+    """Skip a period until it changes or DIGEST_RETRY_HOURS pass"""
+    await db.rollback()
+    await db.execute(
+        """
+        INSERT INTO digest_failures (session_id, level, period_start, entry_count, failed_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (session_id, level, period_start) DO UPDATE SET
+            entry_count = excluded.entry_count,
+            failed_at = excluded.failed_at
+        """,
+        (session_id, level, period_start, entry_count, timestamps.now_iso())
+    )
+    await db.commit()
+    metrics.incr("digest_failures")
+
+async def _summarize(db: aiosqlite.Connection, session_id: str, level: str, period_start: str) -> bool:
+    """
+    Write one period's digest, returning whether it was written. Failures
+    other than an unavailable model are recorded so the period doesn't
+    block the periods after it.
+    """
+    load_sources = _week_sources if level == WEEK else _month_sources
+    entry_count = 0
+    try:
+        sources = await load_sources(db, session_id, period_start)
+        entry_count = sources[2]
+        await _write_digest(db, session_id, level, period_start, sources)
+        return True
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        print(f"Failed to digest {level} {period_start} of session {session_id}: {e}")
+        await _record_failure(db, session_id, level, period_start, entry_count)
+        return False
+
+async def embed_pending(db: aiosqlite.Connection, limit: int = DIGEST_BATCH_SIZE) -> int:
+    """Embed digests stored without an embedding, in one request"""
+    async with db.execute(
+        "SELECT id, summary FROM digests WHERE embedding IS NULL ORDER BY id LIMIT ?",
+        (limit,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+    if not rows:
+        return 0
+
+    embeddings = await asyncio.to_thread(chroma_service.embed_texts, [row[1] for row in rows])
+    if not embeddings:
+        return 0
+    await db.executemany(
+        "UPDATE digests SET embedding = ? WHERE id = ?",
+        [
+            (np.asarray(embedding, dtype=np.float32).tobytes(), row[0])
+            for row, embedding in zip(rows, embeddings)
+        ]
+    )
+    await db.commit()
+    return len(rows)
+
+async def summarize_pending(db: aiosqlite.Connection, today: Optional[date] = None, limit: int = DIGEST_BATCH_SIZE) -> int:
+    """
+    Write up to limit pending digests, weeks before months, and embed them.
+
+    Weeks are closed once the current week has started, and months once
+    every week starting in them is closed. A period that fails is skipped
+    and the batch goes on, unless the model is unavailable. Returns how
+    many were written.
+    """
+    week_start = _week_start(today or timestamps.now().date())
+    month_start = week_start.replace(day=1)
+    attempted = written = 0
+    try:
+        for session_id, period_start in await _pending_weeks(db, timestamps.midnight(week_start, timezone.utc), limit):
+            attempted += 1
+            written += await _summarize(db, session_id, WEEK, period_start)
+        # A month summarized before all its weeks were is rewritten once they are
+        for session_id, period_start in await _pending_months(db, month_start.isoformat(), limit - attempted):
+            written += await _summarize(db, session_id, MONTH, period_start)
+    except LLMUnavailableError as e:
+        print(f"Digest batch stopped, model unavailable: {e}")
+
+    await embed_pending(db)
+    return written
+
+async def long_range_context(
+    db: aiosqlite.Connection,
+    session_id: str,
+    embedding: Optional[List[float]] = None,
+    limit: int = DIGEST_CONTEXT_LIMIT,
+) -> List[str]:
+    """
+    Up to limit digests of a session as "period: summary" lines, oldest first.
+
+    Months stand in for their weeks once they are summarized. With an
+    embedding the closest digests are picked, otherwise the latest ones.
+    """
+    async with db.execute(
+        """
+        SELECT level, period_start, summary, embedding
+        FROM digests
+        WHERE session_id = ?
+        ORDER BY period_start
+        """,
+        (session_id,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    months = {row[1] for row in rows if row[0] == MONTH}
+    rows = [row for row in rows if row[0] == MONTH or f"{row[1][:7]}-01" not in months]
+    if len(rows) > limit:
+        query = np.asarray(embedding, dtype=np.float32) if embedding is not None else None
+        if query is not None and np.linalg.norm(query) > 0:
+            scores = np.full(len(rows), -1.0, dtype=np.float32)
+            for i, row in enumerate(rows):
+                vector = np.frombuffer(row[3], dtype=np.float32) if row[3] else None
+                if vector is not None and len(vector) == len(query) and np.linalg.norm(vector) > 0:
+                    scores[i] = vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query))
+            top = sorted(np.argsort(-scores, kind="stable")[:limit])
+            rows = [rows[i] for i in top]
+        else:
+            rows = rows[-limit:]
+    return [f"{_label(row[0], row[1])}: {row[2]}" for row in rows]
+
+async def run_digest_job():
+    """
+    Periodically summarize closed weeks and months for all sessions.
+    """
+    while True:
+        try:
+            async with connect() as db:
+                written = await summarize_pending(db)
+            if written:
+                print(f"Wrote {written} journal digests")
+        except Exception as e:
+            print(f"Digest job failed: {e}")
+        await asyncio.sleep(DIGEST_JOB_INTERVAL_SECONDS)
@@ -0,0 +1,97 @@
+"""
+Publish/subscribe of session events for the WebSocket channel.
+
+Writers publish an event when a piece of work finishes (an entry's
+analysis, its tree, new prompts, weekly insights, import progress) and
+every socket subscribed to that session receives it, so clients don't
+poll. Delivery goes through a backend chosen by EVENT_BACKEND; the local
+backend reaches sockets connected to this process only, and clients
+catch up on anything else through /api/sync.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Set
+from app.services.metrics import metrics
+
+EVENT_BACKEND = os.environ.get("EVENT_BACKEND", "local")
+# Events buffered per socket before the oldest are dropped
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "100"))
+
+# Event types
+ANALYSIS = "analysis"
+TREE = "tree"
+PROMPTS = "prompts"
+WEEKLY = "weekly"
+IMPORT = "import"
+
+class LocalBackend:
+    """
+    Delivers events to subscribers in this process through bounded queues.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, session_id: str, event: Dict):
+        for queue in list(self._subscribers.get(session_id, ())):
+            if queue.full():
+                # A slow client loses its oldest event instead of holding up the writer
+                queue.get_nowait()
+                metrics.incr("events_dropped")
+            queue.put_nowait(event)
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(session_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[session_id]
+
+    def subscriber_count(self, session_id: str) -> int:
+        return len(self._subscribers.get(session_id, ()))
+
+BACKENDS = {
+    "local": LocalBackend,
+}
+
+class EventBroker:
+    """
+    Front for the configured backend; publishing never fails the caller.
+    """
+
+    def __init__(self, backend_name: str = EVENT_BACKEND):
+        if backend_name not in BACKENDS:
+            raise ValueError(f"Unknown EVENT_BACKEND {backend_name!r}, expected one of {sorted(BACKENDS)}")
+        self.backend = BACKENDS[backend_name]()
+
+    async def publish(self, session_id: str, event_type: str, data: Dict):
+        try:
+            await self.backend.publish(session_id, {"type": event_type, "data": data})
+            metrics.incr("events_published")
+        except Exception as e:
+            print(f"Failed to publish {event_type} event: {e}")
+
+    @asynccontextmanager
+    async def subscribe(self, session_id: str) -> AsyncIterator[asyncio.Queue]:
+        queue = self.backend.subscribe(session_id)
+        metrics.incr("event_subscribers")
+        try:
+            yield queue
+        finally:
+            self.backend.unsubscribe(session_id, queue)
+            metrics.incr("event_subscribers", -1)
+
+    def subscriber_count(self, session_id: str) -> int:
+        return self.backend.subscriber_count(session_id)
+
+# Global instance
+event_broker = EventBroker()
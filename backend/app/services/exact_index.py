@@ -0,0 +1,392 @@
+"""
+Exact (brute-force) vector search over small per-session journals.
+
+Most sessions hold tens to a few hundred entries, where a single
+vectorized dot product over a contiguous matrix is faster than an
+HNSW query. Each session's vectors live in an append-only file that
+is memory-mapped on read, described by a small header file.
+"""
+
+import os
+import json
+import hashlib
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.services.quantization import QuantizedCodes, get_quantizer
+from app.services.process_lock import process_lock
+from app.config import EXACT_INDEX_PATH
+EXACT_INDEX_DTYPE = os.environ.get("EXACT_INDEX_DTYPE", "float32")  # "float32" | "float16"
+
+# In-memory quantization of embeddings: "none" | "int8" | "binary".
+# Quantized codes are scanned first, then the top candidates are re-ranked
+# against the full-precision vectors on disk.
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "none")
+RERANK_FACTOR = int(os.environ.get("EMBEDDING_RERANK_FACTOR", "4"))
+
+# Max number of sessions kept mapped in memory
+SESSION_CACHE_SIZE = 128
+
+class SessionMatrix:
+    """
+    Memory-mapped embeddings for one session.
+    """
+
+    def __init__(
+        self,
+        entry_ids: np.ndarray,
+        documents: List[str],
+        vectors: np.ndarray,
+        codes: Optional[QuantizedCodes] = None,
+        stamp: tuple = (),
+    ):
+        self.entry_ids = entry_ids
+        self.documents = documents
+        self.vectors = vectors
+        self.codes = codes
+        # (inode, mtime) of index.json when mapped, to notice writes by other workers
+        self.stamp = stamp
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+class ExactSearchIndex:
+    """
+    Per-session exact cosine search.
+
+    Layout per session directory:
+    - index.json: dim, dtype, committed row count and meta.jsonl length
+    - vectors.bin: row-major unit-normalized embeddings, appended one row per entry
+    - meta.jsonl: one {"entry_id", "document"} line per row, in the same order
+    - codes.bin / scales.bin: quantized rows, when quantization is enabled
+
+    Rows are appended to the data files first and committed by atomically
+    replacing index.json, so bytes past the committed lengths (from a
+    crashed write) are ignored and overwritten by the next append.
+    Rewrites go through temporary files, so existing maps are never
+    truncated. Writes and re-maps hold the same cross-process lock as
+    Chroma writes.
+    """
+
+    def __init__(
+        self,
+        root: Path = EXACT_INDEX_PATH,
+        dtype: str = EXACT_INDEX_DTYPE,
+        quantization: str = EMBEDDING_QUANTIZATION,
+    ):
+        self.root = Path(root)
+        self.dtype = np.dtype(dtype)
+        self.quantizer = get_quantizer(quantization)
+        self._sessions: "OrderedDict[str, SessionMatrix]" = OrderedDict()
+        self._lock = process_lock("chroma")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _session_dir(self, session_id: str) -> Path:
+        return self.root / hashlib.sha1(session_id.encode()).hexdigest()[:32]
+
+    def _read_header(self, session_dir: Path) -> Optional[Dict]:
+        try:
+            with open(session_dir / "index.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self, session_dir: Path, header: Dict):
+        _replace(session_dir / "index.json", json.dumps(header).encode())
+
+    def _stamp(self, session_dir: Path) -> Optional[tuple]:
+        # index.json is replaced on every commit, so a new inode means new rows
+        try:
+            stat = (session_dir / "index.json").stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _load(self, session_id: str) -> Optional[SessionMatrix]:
+        """
+        Map a session's vectors into memory, using the LRU of active sessions.
+        """
+        session_dir = self._session_dir(session_id)
+        stamp = self._stamp(session_dir)
+        matrix = self._sessions.get(session_id)
+        if matrix is not None and matrix.stamp == stamp:
+            self._sessions.move_to_end(session_id)
+            return matrix
+
+        with self._lock:
+            matrix = self._map(session_dir)
+        if matrix is None:
+            self._sessions.pop(session_id, None)
+            return None
+
+        self._sessions[session_id] = matrix
+        if len(self._sessions) > SESSION_CACHE_SIZE:
+            self._sessions.popitem(last=False)
+        return matrix
+
+    def _map(self, session_dir: Path) -> Optional[SessionMatrix]:
+        """
+        Map the committed rows of a session directory, checking file sizes
+        against its header first. Called with the lock held.
+        """
+        header = self._read_header(session_dir)
+        if header is None or header["rows"] == 0:
+            return None
+
+        num_rows, dim = header["rows"], header["dim"]
+        dtype = np.dtype(header["dtype"])
+        vectors_path = session_dir / "vectors.bin"
+        meta_path = session_dir / "meta.jsonl"
+        if (
+            vectors_path.stat().st_size < num_rows * dim * dtype.itemsize
+            or meta_path.stat().st_size < header["meta_bytes"]
+        ):
+            print(f"Exact index {session_dir.name} is shorter than its header, ignoring it")
+            return None
+
+        vectors = np.memmap(vectors_path, dtype=dtype, mode="r", shape=(num_rows, dim))
+        with open(meta_path, "rb") as f:
+            rows = [json.loads(line) for line in f.read(header["meta_bytes"]).splitlines()]
+        if len(rows) != num_rows:
+            print(f"Exact index {session_dir.name} has {len(rows)} documents for {num_rows} vectors, ignoring it")
+            return None
+
+        return SessionMatrix(
+            entry_ids=np.array([row["entry_id"] for row in rows], dtype=np.int64),
+            documents=[row["document"] for row in rows],
+            vectors=vectors,
+            codes=self._load_codes(session_dir, vectors) if self.quantizer else None,
+            stamp=self._stamp(session_dir),
+        )
+
+    def _load_codes(self, session_dir: Path, vectors: np.ndarray) -> QuantizedCodes:
+        """
+        Read quantized rows into memory, rebuilding them if missing or stale.
+        """
+        num_rows, dim = vectors.shape
+        codes_path = session_dir / "codes.bin"
+        scales_path = session_dir / "scales.bin"
+        code_bytes = self.quantizer.code_bytes(dim)
+
+        if codes_path.exists() and codes_path.stat().st_size == num_rows * code_bytes:
+            codes = np.fromfile(codes_path, dtype=self.quantizer.code_dtype).reshape(num_rows, code_bytes)
+            if not self.quantizer.has_scales:
+                return QuantizedCodes(codes)
+            if scales_path.exists() and scales_path.stat().st_size == num_rows * 4:
+                return QuantizedCodes(codes, np.fromfile(scales_path, dtype=np.float32))
+
+        quantized = self.quantizer.encode(vectors)
+        _replace(codes_path, quantized.codes.tobytes())
+        if quantized.scales is not None:
+            _replace(scales_path, quantized.scales.tobytes())
+        return quantized
+
+    def memory_bytes(self, session_id: str) -> int:
+        """
+        Bytes held in memory for a session's search structure.
+        """
+        matrix = self._load(session_id)
+        if matrix is None:
+            return 0
+        if matrix.codes is not None:
+            return matrix.codes.nbytes
+        return matrix.vectors.nbytes
+
+    def count(self, session_id: str) -> int:
+        matrix = self._load(session_id)
+        return len(matrix) if matrix is not None else 0
+
+    def entry_ids(self, session_id: str) -> Set[int]:
+        matrix = self._load(session_id)
+        return set(matrix.entry_ids.tolist()) if matrix is not None else set()
+
+    def vectors(self, session_id: str, entry_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        """Unit-normalized vectors of the given entries that are in the index"""
+        matrix = self._load(session_id)
+        if matrix is None:
+            return {}
+        rows = {int(entry_id): row for row, entry_id in enumerate(matrix.entry_ids.tolist())}
+        return {
+            entry_id: np.asarray(matrix.vectors[rows[entry_id]], dtype=np.float32)
+            for entry_id in entry_ids
+            if entry_id in rows
+        }
+
+    def orphan_dirs(self, session_ids: Iterable[str]) -> List[str]:
+        """
+        Session directories that belong to none of the given sessions.
+        """
+        known = {self._session_dir(session_id).name for session_id in session_ids}
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir() and path.name not in known)
+
+    def delete_dir(self, name: str):
+        with self._lock:
+            shutil.rmtree(self.root / name, ignore_errors=True)
+
+    def add(self, session_id: str, entry_id: int, document: str, embedding: List[float]):
+        """
+        Append one entry's embedding to the session's matrix.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            matrix = self._load(session_id)
+            if matrix is not None and entry_id in matrix.entry_ids:
+                return
+
+            header = self._read_header(session_dir)
+            if header is None or (matrix is None and header["rows"]):
+                # Directories written before headers, or failing their checks, are started over
+                session_dir.mkdir(parents=True, exist_ok=True)
+                header = {"dim": len(vector), "dtype": self.dtype.name, "rows": 0, "meta_bytes": 0}
+            elif header["dim"] != len(vector):
+                raise ValueError(f"Embedding has {len(vector)} dimensions, the index has {header['dim']}")
+
+            num_rows, dim = header["rows"], header["dim"]
+            dtype = np.dtype(header["dtype"])
+            _append(session_dir / "vectors.bin", num_rows * dim * dtype.itemsize, vector.astype(dtype).tobytes())
+            if self.quantizer is not None:
+                self._append_codes(session_dir, num_rows, vector)
+            line = (json.dumps({"entry_id": entry_id, "document": document}) + "\n").encode()
+            _append(session_dir / "meta.jsonl", header["meta_bytes"], line)
+
+            header["rows"] = num_rows + 1
+            header["meta_bytes"] += len(line)
+            self._write_header(session_dir, header)
+
+            # Re-map on next read so the new row is visible
+            self._sessions.pop(session_id, None)
+
+    def _append_codes(self, session_dir: Path, num_rows: int, vector: np.ndarray):
+        codes_path = session_dir / "codes.bin"
+        scales_path = session_dir / "scales.bin"
+        quantized = self.quantizer.encode(vector)
+        code_bytes = num_rows * self.quantizer.code_bytes(len(vector))
+        complete = _size(codes_path) >= code_bytes and (quantized.scales is None or _size(scales_path) >= num_rows * 4)
+        if not complete:
+            # Missing or short codes are rebuilt from the full vectors on next load
+            codes_path.unlink(missing_ok=True)
+            scales_path.unlink(missing_ok=True)
+            return
+        _append(codes_path, code_bytes, quantized.codes.tobytes())
+        if quantized.scales is not None:
+            _append(scales_path, num_rows * 4, quantized.scales.tobytes())
+
+    def search(
+        self,
+        session_id: str,
+        query_embedding: List[float],
+        exclude_entry_ids: List = None,
+        limit: int = 5,
+    ) -> List[Tuple[int, float]]:
+        """
+        (entry_id, cosine similarity) of the most similar entries, best first.
+        """
+        matrix = self._load(session_id)
+        if matrix is None or limit <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        if matrix.codes is not None:
+            scores = self.quantizer.scores(matrix.codes, query)
+        else:
+            scores = matrix.vectors.astype(np.float32, copy=False) @ query
+        if exclude_entry_ids:
+            excluded = np.isin(matrix.entry_ids, np.asarray(exclude_entry_ids, dtype=np.int64))
+            scores = np.where(excluded, -np.inf, scores)
+
+        if matrix.codes is not None:
+            # Re-rank the best quantized candidates with full-precision vectors
+            candidates = np.sort(_top_k(scores, limit * RERANK_FACTOR))
+            exact = np.asarray(matrix.vectors[candidates], dtype=np.float32) @ query
+            best = _top_k(exact, limit)
+            top, top_scores = candidates[best], exact[best]
+        else:
+            top = _top_k(scores, limit)
+            top_scores = scores[top]
+        return [(int(matrix.entry_ids[i]), float(score)) for i, score in zip(top, top_scores)]
+
+    def remove(self, session_id: str, entry_ids: List[int]):
+        """
+        Drop rows for the given entries by rewriting the session's files.
+        """
+        session_dir = self._session_dir(session_id)
+        with self._lock:
+            matrix = self._load(session_id)
+            if matrix is None:
+                return
+
+            keep = ~np.isin(matrix.entry_ids, np.asarray(entry_ids, dtype=np.int64))
+            if keep.all():
+                return
+
+            header = self._read_header(session_dir)
+            vectors = np.array(matrix.vectors[keep])
+            meta = b"".join(
+                (json.dumps({"entry_id": int(entry_id), "document": document}) + "\n").encode()
+                for entry_id, document, kept in zip(matrix.entry_ids, matrix.documents, keep)
+                if kept
+            )
+            self._sessions.pop(session_id, None)
+            del matrix
+
+            _replace(session_dir / "vectors.bin", vectors.tobytes())
+            _replace(session_dir / "meta.jsonl", meta)
+            # Quantized codes are rebuilt from the full vectors on next load
+            for name in ("codes.bin", "scales.bin"):
+                (session_dir / name).unlink(missing_ok=True)
+            header["rows"] = len(vectors)
+            header["meta_bytes"] = len(meta)
+            self._write_header(session_dir, header)
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+def _append(path: Path, committed: int, data: bytes):
+    """
+    Write data right after the committed bytes of a file, dropping any
+    uncommitted tail.
+    """
+    if _size(path) < committed:
+        raise ValueError(f"{path} is shorter than its committed {committed} bytes")
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.truncate(committed)
+        f.seek(committed)
+        f.write(data)
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+def _replace(path: Path, data: bytes):
+    """
+    Atomically replace a file's contents.
+    """
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest finite scores, best first.
+    """
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
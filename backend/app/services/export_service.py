@@ -0,0 +1,100 @@
+"""
+Streaming export of a session's journal as NDJSON.
+
+Rows are read with server-side cursors and written out in small chunks,
+so memory stays constant no matter how long the journal is.
+"""
+
+from typing import AsyncIterator
+import aiosqlite
+from app.db.database import connect
+from app.db.queries import THREAD_COLUMNS, ThreadRow
+from app.services import json_codec
+from app.services import timestamps
+
+EXPORT_FETCH_SIZE = 500
+EXPORT_CHUNK_LINES = 100
+
+def _line(record_type: str, data: dict) -> str:
+    return json_codec.dumps({"type": record_type, **data}) + "\n"
+
+def _loads(value):
+    return json_codec.loads_or(value, None)
+
+async def _stream_query(db: aiosqlite.Connection, sql: str, params: tuple) -> AsyncIterator:
+    async with db.execute(sql, params) as cursor:
+        cursor.arraysize = EXPORT_FETCH_SIZE
+        async for row in cursor:
+            yield row
+
+async def export_session(session_id: str) -> AsyncIterator[bytes]:
+    """
+    Yield the session's entries, analyses, trees, threads, prompts and streak
+    days as NDJSON, one record per line, in chunks of EXPORT_CHUNK_LINES.
+    """
+    async with connect() as db:
+        buffer = [_line("export", {
+            "session_id": session_id,
+            "exported_at": timestamps.now_iso(),
+        })]
+
+        records = [
+            (
+                "entry",
+                """
+                SELECT je.id, je.created_at, je.prompt_used, je.raw_text,
+                       ea.memory_summary, ea.patterns_reflection, ea.follow_up_question,
+                       ea.themes_json, ea.emotions_json, ea.unresolved_json,
+                       t.type, t.rarity, t.display_name
+                FROM journal_entries je
+                LEFT JOIN entry_analysis ea ON ea.entry_id = je.id
+                LEFT JOIN trees t ON t.entry_id = je.id
+                WHERE je.session_id = ?
+                ORDER BY je.id
+                """,
+                lambda row: {
+                    "id": row[0],
+                    "created_at": row[1],
+                    "prompt_used": row[2],
+                    "text": row[3],
+                    "analysis": None if row[4] is None else {
+                        "memory_summary": row[4],
+                        "patterns_reflection": row[5],
+                        "follow_up_question": row[6],
+                        "themes": _loads(row[7]),
+                        "emotions": _loads(row[8]),
+                        "unresolved": _loads(row[9]),
+                    },
+                    "tree": None if row[10] is None else {
+                        "type": row[10],
+                        "rarity": row[11],
+                        "display_name": row[12],
+                    },
+                },
+            ),
+            (
+                "thread",
+                f"SELECT {THREAD_COLUMNS} FROM threads WHERE session_id = ? ORDER BY id",
+                lambda row: ThreadRow(*row).as_dict(),
+            ),
+            (
+                "prompts",
+                "SELECT source, created_at, prompts_json FROM prompts WHERE session_id = ?",
+                lambda row: {"source": row[0], "created_at": row[1], "prompts": _loads(row[2])},
+            ),
+            (
+                "streak_day",
+                "SELECT day FROM streak_days WHERE session_id = ? ORDER BY day",
+                lambda row: {"day": row[0]},
+            ),
+        ]
+
+        for record_type, sql, to_dict in records:
+            async for row in _stream_query(db, sql, (session_id,)):
+                buffer.append(_line(record_type, to_dict(row)))
+                if len(buffer) >= EXPORT_CHUNK_LINES:
+                    yield "".join(buffer).encode()
+                    buffer = []
+
+        if buffer:
+            yield "".join(buffer).encode()
@@ -0,0 +1,95 @@
+"""
+Degraded results used when the model is unavailable.
+
+These are deliberately plain: a keyword pass over the text instead of an
+LLM reading, so an entry can still be saved, planted and shown while the
+provider is down.
+"""
+
+import re
+import uuid
+from collections import Counter
+from typing import Dict, List
+from app.schemas.insights import WeeklyInsightsResponse
+from app.schemas.prompts import Prompt
+
+THEME_KEYWORDS = {
+    "work": ["work", "job", "boss", "meeting", "deadline", "project", "career", "office"],
+    "relationships": ["friend", "partner", "family", "mom", "dad", "sister", "brother", "relationship"],
+    "health": ["sleep", "tired", "exercise", "sick", "health", "body", "run", "walk"],
+    "growth": ["learn", "grow", "progress", "change", "goal", "improve"],
+    "self_doubt": ["doubt", "failure", "not enough", "imposter", "insecure"],
+    "rest": ["rest", "relax", "weekend", "break", "vacation", "calm"],
+    "creativity": ["write", "paint", "music", "create", "idea", "art"],
+}
+
+EMOTION_KEYWORDS = {
+    "anxious": ["anxious", "worried", "nervous", "stress", "overwhelmed"],
+    "sad": ["sad", "down", "lonely", "cry", "miss"],
+    "frustrated": ["frustrated", "annoyed", "angry", "irritated"],
+    "hopeful": ["hope", "hopeful", "excited", "looking forward"],
+    "grateful": ["grateful", "thankful", "appreciate", "lucky"],
+    "content": ["happy", "content", "good", "peaceful", "glad"],
+    "tired": ["tired", "exhausted", "drained"],
+}
+
+DEFAULT_PROMPTS = [
+    ("What feels most present for you right now?", "recent"),
+    ("What's something you keep returning to in your thoughts?", "perspective"),
+    ("How is your body feeling as you sit down to write?", "grounding"),
+]
+
+def _match_keywords(text: str, table: Dict[str, List[str]], limit: int) -> List[str]:
+    lowered = text.lower()
+    scores = {
+        label: sum(lowered.count(word) for word in words)
+        for label, words in table.items()
+    }
+    ranked = [label for label, score in sorted(scores.items(), key=lambda kv: -kv[1]) if score > 0]
+    return ranked[:limit]
+
+def heuristic_analysis(entry_text: str) -> Dict:
+    """
+    Analysis with the EntryAnalysis shape, built without the model.
+    """
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", entry_text.strip()) if s.strip()]
+    summary = " ".join(sentences[:2])[:300] or "A journal entry was written."
+    themes = _match_keywords(entry_text, THEME_KEYWORDS, 4) or ["reflection"]
+    emotions = _match_keywords(entry_text, EMOTION_KEYWORDS, 3)
+
+    return {
+        "memory_summary": summary,
+        "patterns_reflection": f"This entry touches on {', '.join(t.replace('_', ' ') for t in themes)}.",
+        "follow_up_question": "What feels most important to you about what you wrote today?",
+        "themes": themes,
+        "emotions": emotions,
+        "unresolved": [],
+    }
+
+def default_prompts() -> List[Prompt]:
+    """
+    A small generic prompt set for when none could be generated.
+    """
+    return [Prompt(id=str(uuid.uuid4()), text=text, category=category) for text, category in DEFAULT_PROMPTS]
+
+def heuristic_weekly_insights(entries: List[Dict]) -> WeeklyInsightsResponse:
+    """
+    Weekly insights from counting the themes and emotions of stored analyses.
+    """
+    theme_counts = Counter(theme for entry in entries for theme in entry.get("themes", []))
+    emotion_counts = Counter(emotion for entry in entries for emotion in entry.get("emotions", []))
+    themes = [theme for theme, _ in theme_counts.most_common(5)]
+
+    if themes:
+        reflection = (
+            f"Across your last {len(entries)} entries, the themes that came up most were "
+            f"{', '.join(t.replace('_', ' ') for t in themes)}."
+        )
+    else:
+        reflection = "There isn't much to reflect on from this week yet."
+
+    return WeeklyInsightsResponse(
+        patterns_reflection=reflection,
+        themes=themes,
+        emotions_summary=dict(emotion_counts),
+    )
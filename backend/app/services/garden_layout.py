@@ -0,0 +1,192 @@
+"""
+Garden layout: where each tree stands in a session's forest.
+
+Trees are grouped in groves of one type, rarity and planting period.
+Groves sit on a golden-angle spiral around the origin, numbered in the
+order the session first needs them, so later periods grow outwards.
+Inside a grove each new tree takes the next spot on a smaller spiral,
+so older trees are near the grove's center and no tree ever moves when
+another is planted. Positions are computed once, when a tree is added,
+and stored in garden_layout.
+"""
+
+import hashlib
+import math
+import os
+from datetime import date
+from typing import Dict, List, Optional
+import aiosqlite
+from app.services.tree_service import TREE_TYPES, TREE_NAMES, RARITIES
+from app.services.change_log import record_changes, TREE
+from app.services import json_codec
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# The catalog only changes with a deploy, so clients may cache it this long
+CATALOG_MAX_AGE_SECONDS = int(os.environ.get("CATALOG_MAX_AGE_SECONDS", "86400"))
+
+# Layout units: one tree is about 10 units wide
+GROVE_SPACING = 120
+TREE_SPACING = 10
+# Months of planting that share a grove
+GROVE_PERIOD_MONTHS = int(os.environ.get("GROVE_PERIOD_MONTHS", "3"))
+
+def _spiral(index: int, spacing: float) -> tuple:
+    """Point `index` of a Vogel spiral; consecutive points are about `spacing` apart"""
+    radius = spacing * math.sqrt(index)
+    angle = index * GOLDEN_ANGLE
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+def grove_key(tree_type: str, rarity: str, created_at: Optional[str]) -> tuple:
+    """What a grove's trees share: type, rarity and the period they were planted in"""
+    period = None
+    if created_at:
+        period = (int(created_at[:4]) * 12 + int(created_at[5:7]) - 1) // GROVE_PERIOD_MONTHS
+    return tree_type, rarity, period
+
+def tree_position(grove: int, slot: int) -> tuple:
+    """Integer position of the slot-th tree of a grove"""
+    center_x, center_y = _spiral(grove, GROVE_SPACING)
+    offset_x, offset_y = _spiral(slot, TREE_SPACING)
+    return round(center_x + offset_x), round(center_y + offset_y)
+
+async def place_new_trees(db: aiosqlite.Connection, session_id: str) -> int:
+    """
+    Give every tree of a session without a position the next slot in its grove.
+
+    Called on every write path that plants trees (entries, imports and
+    rebuild_trees, which also backfills older sessions), recording them in
+    the change log. A tree placed meanwhile by
+    another request keeps that position. Returns the number of trees placed.
+    """
+    async with db.execute(
+        """
+        SELECT t.entry_id, t.type, t.rarity, t.created_at
+        FROM trees t
+        LEFT JOIN garden_layout gl ON gl.entry_id = t.entry_id
+        WHERE t.session_id = ? AND gl.entry_id IS NULL
+        ORDER BY t.entry_id
+        """,
+        (session_id,)
+    ) as cursor:
+        unplaced = await cursor.fetchall()
+    if not unplaced:
+        return 0
+
+    # Groves are identified by the trees already in them
+    async with db.execute(
+        """
+        SELECT gl.grove, gl.slot, t.type, t.rarity, t.created_at
+        FROM garden_layout gl
+        JOIN trees t ON t.entry_id = gl.entry_id
+        WHERE gl.session_id = ?
+        """,
+        (session_id,)
+    ) as cursor:
+        placed = await cursor.fetchall()
+    groves: Dict[tuple, int] = {}
+    next_slot: Dict[int, int] = {}
+    for grove, slot, tree_type, rarity, created_at in placed:
+        groves.setdefault(grove_key(tree_type, rarity, created_at), grove)
+        next_slot[grove] = max(next_slot.get(grove, 0), slot + 1)
+    next_grove = max(next_slot, default=-1) + 1
+
+    placed_ids = []
+    for entry_id, tree_type, rarity, created_at in unplaced:
+        key = grove_key(tree_type, rarity, created_at)
+        grove = groves.get(key)
+        if grove is None:
+            grove = groves[key] = next_grove
+            next_grove += 1
+        slot = next_slot.get(grove, 0)
+        next_slot[grove] = slot + 1
+        x, y = tree_position(grove, slot)
+        cursor = await db.execute(
+            """
+            INSERT INTO garden_layout (entry_id, session_id, grove, slot, x, y)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (entry_id) DO NOTHING
+            """,
+            (entry_id, session_id, grove, slot, x, y)
+        )
+        if cursor.rowcount:
+            placed_ids.append(entry_id)
+
+    if placed_ids:
+        await record_changes(db, session_id, TREE, placed_ids)
+    return len(placed_ids)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _epoch_day(timestamp: Optional[str]) -> int:
+    """Days since 1970-01-01 of an ISO timestamp"""
+    if not timestamp:
+        return 0
+    return date.fromisoformat(timestamp[:10]).toordinal() - EPOCH_ORDINAL
+
+def _delta_encode(values: List[int]) -> List[int]:
+    return [value - prev for prev, value in zip([0] + values, values)]
+
+async def load_layout(db: aiosqlite.Connection, session_id: str, since: int = 0) -> Dict:
+    """
+    Layout of a session in a compact columnar form.
+
+    Only placements with a version above `since` are returned, so clients
+    can fetch changes. Trees are referenced by catalog indexes and
+    entry_id and day are delta-encoded. Read only: trees are placed when
+    they are planted, so the ETag computed before the read stays valid.
+    """
+    async with db.execute(
+        """
+        SELECT gl.id, gl.entry_id, gl.x, gl.y, t.type, t.rarity, t.display_name, t.created_at
+        FROM garden_layout gl
+        JOIN trees t ON t.entry_id = gl.entry_id
+        WHERE gl.session_id = ? AND gl.id > ?
+        ORDER BY gl.entry_id
+        """,
+        (session_id, since)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    async with db.execute(
+        "SELECT MAX(id), COUNT(*) FROM garden_layout WHERE session_id = ?",
+        (session_id,)
+    ) as cursor:
+        version, total = await cursor.fetchone()
+
+    types, rarities, names, days = [], [], [], []
+    for row in rows:
+        tree_type = row[4]
+        types.append(TREE_TYPES.index(tree_type) if tree_type in TREE_TYPES else -1)
+        rarities.append(RARITIES.index(row[5]) if row[5] in RARITIES else 0)
+        type_names = TREE_NAMES.get(tree_type, [])
+        names.append(type_names.index(row[6]) if row[6] in type_names else -1)
+        days.append(_epoch_day(row[7]))
+
+    return {
+        "version": version or 0,
+        "total": total,
+        "count": len(rows),
+        "entry_ids": _delta_encode([row[1] for row in rows]),
+        "x": [row[2] for row in rows],
+        "y": [row[3] for row in rows],
+        "types": types,
+        "rarities": rarities,
+        "names": names,
+        "days": _delta_encode(days),
+    }
+
+def catalog() -> Dict:
+    """
+    Sprite index the layout refers to: tree types, rarities and names by position.
+    """
+    return {
+        "types": TREE_TYPES,
+        "rarities": RARITIES,
+        "names": [TREE_NAMES.get(tree_type, []) for tree_type in TREE_TYPES],
+        "tree_spacing": TREE_SPACING,
+        "grove_spacing": GROVE_SPACING,
+    }
+
+# Strong ETag of the catalog, fixed for the life of the process
+CATALOG_ETAG = '"catalog-' + hashlib.blake2b(json_codec.dumps(catalog()).encode(), digest_size=8).hexdigest() + '"'
@@ -0,0 +1,384 @@
+"""
+Bulk import of journals exported from other apps.
+
+Imports run in two phases:
+1. Parse the upload as a stream and insert entries in batched
+   transactions, keeping their original timestamps.
+2. Analyze, plant trees and embed the imported entries through a bounded
+   worker pool, recording progress on the import job.
+
+Phase 2 only picks up entries of the job that have no analysis yet, so
+an interrupted import can be resumed at any time. A job is claimed by
+setting it to running, so only one worker pool processes it at once.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+import aiosqlite
+from app.db.database import connect
+from app.db import queries
+from app.services.llm_service import analyze_entry
+from app.services.tree_service import generate_tree
+from app.services.thread_service import embed_items, upsert_threads
+from app.services.garden_layout import place_new_trees
+from app.services.change_log import record_change, record_changes, ENTRY, IMPORT as IMPORT_CHANGE
+from app.services.event_broker import event_broker, IMPORT
+from app.services.chroma_service import chroma_service
+from app.services.llm_client import mistral_llm
+from app.services import json_codec
+from app.services import timestamps
+
+IMPORT_BATCH_SIZE = 200
+IMPORT_CONCURRENCY = int(os.environ.get("IMPORT_CONCURRENCY", "4"))
+EMBED_BATCH_SIZE = 32
+
+# Markdown exports start each entry with a dated heading, e.g. "## 2024-03-05"
+MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(\d{4}-\d{2}-\d{2}(?:[T ][0-9:.+\-Z]*)?)\s*$")
+
+# Keep references so running imports aren't garbage collected
+_running_imports: Set[asyncio.Task] = set()
+
+def _parse_timestamp(value: str) -> str:
+    """Normalize an exported timestamp to timezone-aware ISO format"""
+    return timestamps.parse(value).isoformat()
+
+def parse_jsonl(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse JSON lines with "text" and "created_at" (optional "prompt").
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json_codec.loads(line)
+            text = record["text"].strip()
+            created_at = _parse_timestamp(record["created_at"])
+        except (json.JSONDecodeError, KeyError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid entry on line {line_number}: {e}")
+        if text:
+            yield {"created_at": created_at, "text": text, "prompt": record.get("prompt")}
+
+def parse_markdown(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse Markdown where each entry starts with a dated heading.
+    """
+    created_at: Optional[str] = None
+    body: List[str] = []
+
+    for line in lines:
+        match = MARKDOWN_HEADING.match(line.strip())
+        if match:
+            if created_at and "".join(body).strip():
+                yield {"created_at": created_at, "text": "".join(body).strip(), "prompt": None}
+            created_at = _parse_timestamp(match.group(1))
+            body = []
+        elif created_at:
+            body.append(line)
+
+    if created_at and "".join(body).strip():
+        yield {"created_at": created_at, "text": "".join(body).strip(), "prompt": None}
+
+PARSERS = {
+    "jsonl": parse_jsonl,
+    "markdown": parse_markdown,
+}
+
+def _read_batch(entries: Iterator[Dict]) -> List[Dict]:
+    """The next batch of parsed entries; reads the upload, so it runs in a thread"""
+    return list(itertools.islice(entries, IMPORT_BATCH_SIZE))
+
+async def _update_job(db: aiosqlite.Connection, job_id: str, **fields):
+    fields["updated_at"] = timestamps.now_iso()
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    await db.execute(
+        f"UPDATE import_jobs SET {assignments} WHERE id = ?",
+        (*fields.values(), job_id)
+    )
+    await db.commit()
+
+async def get_job(db: aiosqlite.Connection, job_id: str) -> Optional[Dict]:
+    async with db.execute(
+        """
+        SELECT id, session_id, status, total, processed, failed, created_at, updated_at
+        FROM import_jobs
+        WHERE id = ?
+        """,
+        (job_id,)
+    ) as cursor:
+        row = await cursor.fetchone()
+
+    if not row:
+        return None
+    return {
+        "id": row[0],
+        "session_id": row[1],
+        "status": row[2],
+        "total": row[3],
+        "processed": row[4],
+        "failed": row[5],
+        "created_at": row[6],
+        "updated_at": row[7],
+    }
+
+async def create_import(
+    db: aiosqlite.Connection,
+    session_id: str,
+    lines: Iterable[str],
+    fmt: str,
+) -> Dict:
+    """
+    Stream-parse an export and insert its entries in batched transactions.
+    Each batch is read and parsed in a thread, off the event loop.
+    """
+    if fmt not in PARSERS:
+        raise ValueError(f"Unsupported import format '{fmt}'")
+
+    job_id = str(uuid.uuid4())
+    now = timestamps.now_iso()
+    await db.execute(
+        """
+        INSERT INTO import_jobs (id, session_id, status, total, processed, failed, created_at, updated_at)
+        VALUES (?, ?, 'parsing', 0, 0, 0, ?, ?)
+        """,
+        (job_id, session_id, now, now)
+    )
+    await db.commit()
+
+    total = 0
+    entries = PARSERS[fmt](lines)
+    try:
+        while True:
+            parsed = await asyncio.to_thread(_read_batch, entries)
+            if not parsed:
+                break
+            await _insert_batch(db, [
+                (
+                    session_id, entry["created_at"], timestamps.to_epoch(entry["created_at"]),
+                    entry["prompt"], entry["text"], job_id
+                )
+                for entry in parsed
+            ])
+            total += len(parsed)
+    except ValueError:
+        # Don't leave half an export behind; clients may have synced the batches already
+        async with db.execute(
+            "DELETE FROM journal_entries WHERE import_job_id = ? RETURNING id", (job_id,)
+        ) as cursor:
+            deleted_ids = [row[0] for row in await cursor.fetchall()]
+        if deleted_ids:
+            await record_changes(db, session_id, ENTRY, deleted_ids, op="delete")
+        await record_change(db, session_id, IMPORT_CHANGE, job_id)
+        await _update_job(db, job_id, status="failed", total=0)
+        raise
+
+    await record_change(db, session_id, IMPORT_CHANGE, job_id)
+    await _update_job(db, job_id, status="pending", total=total)
+    return await get_job(db, job_id)
+
+async def _insert_batch(db: aiosqlite.Connection, batch: List[tuple]):
+    await db.executemany(
+        """
+        INSERT INTO journal_entries (session_id, created_at, created_at_epoch, prompt_used, raw_text, import_job_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        batch
+    )
+    await db.commit()
+
+async def _pending_entries(db: aiosqlite.Connection, job_id: str) -> List[tuple]:
+    async with db.execute(
+        """
+        SELECT je.id, je.session_id, je.created_at, je.raw_text
+        FROM journal_entries je
+        LEFT JOIN entry_analysis ea ON ea.entry_id = je.id
+        WHERE je.import_job_id = ? AND ea.entry_id IS NULL
+        ORDER BY je.id
+        """,
+        (job_id,)
+    ) as cursor:
+        return await cursor.fetchall()
+
+async def _store_analysis(db: aiosqlite.Connection, entry: tuple, analysis: Dict, item_vectors: List):
+    """
+    Write analysis, tree, streak day and threads for one imported entry,
+    with its unresolved items already embedded.
+    """
+    entry_id, session_id, created_at, text = entry
+    await db.execute(
+        """
+        INSERT INTO entry_analysis (
+            entry_id, memory_summary, patterns_reflection, follow_up_question,
+            themes_json, emotions_json, unresolved_json
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            entry_id,
+            analysis["memory_summary"],
+            analysis["patterns_reflection"],
+            analysis["follow_up_question"],
+            json_codec.dumps(analysis["themes"]),
+            json_codec.dumps(analysis["emotions"]),
+            json_codec.dumps(analysis["unresolved"]),
+        )
+    )
+    await record_change(db, session_id, ENTRY, entry_id)
+
+    tree_data = generate_tree(text, entry_id, analysis["themes"], analysis["emotions"])
+    await db.execute(
+        """
+        INSERT INTO trees (entry_id, session_id, created_at, type, rarity, display_name)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (entry_id) DO UPDATE SET
+            type = excluded.type, rarity = excluded.rarity, display_name = excluded.display_name
+        """,
+        (
+            entry_id, session_id, timestamps.to_utc_iso(created_at),
+            tree_data["type"], tree_data["rarity"], tree_data["display_name"]
+        )
+    )
+    await place_new_trees(db, session_id)
+
+    # The entry's UTC day, like entries written through the API
+    await queries.ADD_STREAK_DAY.run(db, session_id, timestamps.to_utc_iso(created_at)[:10])
+
+    await upsert_threads(db, session_id, analysis["unresolved"], entry_id, item_vectors)
+    await db.commit()
+
+async def _claim_job(db: aiosqlite.Connection, job_id: str, reclaim: bool) -> bool:
+    """
+    Mark a job as running unless it is already running (or can't run at
+    all). With reclaim, jobs left running by a stopped process are taken over.
+    """
+    blocked = ("parsing", "failed") if reclaim else ("parsing", "failed", "running")
+    cursor = await db.execute(
+        f"""
+        UPDATE import_jobs SET status = 'running', updated_at = ?
+        WHERE id = ? AND status NOT IN ({",".join("?" * len(blocked))})
+        """,
+        (timestamps.now_iso(), job_id, *blocked)
+    )
+    await db.commit()
+    return cursor.rowcount == 1
+
+async def process_import(job_id: str, reclaim: bool = False):
+    """
+    Analyze all unprocessed entries of an import through a bounded worker pool.
+    """
+    async with connect(foreign_keys=True) as db:
+        if not await _claim_job(db, job_id, reclaim):
+            return
+        job = await get_job(db, job_id)
+        pending = await _pending_entries(db, job_id)
+
+        semaphore = asyncio.Semaphore(IMPORT_CONCURRENCY)
+        write_lock = asyncio.Lock()
+        to_embed: List[Dict] = []
+        counts = {"processed": job["total"] - len(pending), "failed": 0}
+
+        async def flush_embeddings():
+            batch = to_embed[:]
+            to_embed.clear()
+            if batch:
+                await asyncio.to_thread(chroma_service.store_entries, job["session_id"], batch)
+                await publish_progress("running")
+
+        async def publish_progress(status: str):
+            # Clients pick up the imported entries and trees through /api/sync
+            await event_broker.publish(job["session_id"], IMPORT, {
+                "job_id": job_id,
+                "status": status,
+                "total": job["total"],
+                "processed": counts["processed"],
+                "failed": counts["failed"],
+            })
+
+        async def worker(entry: tuple):
+            async with semaphore:
+                try:
+                    # No heuristic fallback: failed entries stay unanalyzed so a resume retries them
+                    analysis = await asyncio.to_thread(analyze_entry, entry[3], None, False)
+                    # Embedded before taking the write lock, so workers overlap their model calls
+                    item_vectors = await embed_items(analysis["unresolved"])
+                except Exception as e:
+                    if mistral_llm.closing:
+                        # Shutting down: leave the entry for the resumed import
+                        return
+                    print(f"Failed to analyze imported entry {entry[0]}: {e}")
+                    counts["failed"] += 1
+                    return
+
+            async with write_lock:
+                try:
+                    await _store_analysis(db, entry, analysis, item_vectors)
+                except Exception as e:
+                    # Leave the entry unanalyzed for a resume, keep going with the rest
+                    await db.rollback()
+                    print(f"Failed to store imported entry {entry[0]}: {e}")
+                    counts["failed"] += 1
+                    return
+                counts["processed"] += 1
+                to_embed.append({
+                    "entry_id": entry[0],
+                    "text": analysis["memory_summary"],
+                    "metadata": {
+                        "themes": analysis["themes"],
+                        "emotions": analysis["emotions"],
+                        "unresolved": analysis["unresolved"],
+                        "follow_up_question": analysis["follow_up_question"],
+                        "patterns_reflection": analysis["patterns_reflection"],
+                        "created_at": entry[2],
+                        "entry_id": entry[0],
+                    },
+                })
+                if len(to_embed) >= EMBED_BATCH_SIZE:
+                    await flush_embeddings()
+                await _update_job(db, job_id, processed=counts["processed"], failed=counts["failed"])
+
+        try:
+            # Let every entry finish before the final status is written
+            results = await asyncio.gather(*(worker(entry) for entry in pending), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Import {job_id} worker failed: {result}")
+                    counts["failed"] += 1
+            async with write_lock:
+                await flush_embeddings()
+            if mistral_llm.closing:
+                status = "interrupted"
+            else:
+                status = "completed" if counts["failed"] == 0 else "partial"
+            await _update_job(db, job_id, status=status, processed=counts["processed"], failed=counts["failed"])
+            await publish_progress(status)
+        except Exception as e:
+            print(f"Import {job_id} failed: {e}")
+            await _update_job(db, job_id, status="interrupted")
+            await publish_progress("interrupted")
+
+def schedule_import(job_id: str, reclaim: bool = False) -> asyncio.Task:
+    """
+    Start processing an import in the background.
+    """
+    task = asyncio.create_task(process_import(job_id, reclaim))
+    _running_imports.add(task)
+    task.add_done_callback(_running_imports.discard)
+    return task
+
+async def resume_pending_imports():
+    """
+    Restart imports interrupted by a shutdown.
+    """
+    async with connect() as db:
+        async with db.execute(
+            "SELECT id FROM import_jobs WHERE status IN ('pending', 'running', 'interrupted')"
+        ) as cursor:
+            job_ids = [row[0] for row in await cursor.fetchall()]
+
+    # Nothing is running yet, so jobs marked running were cut off by a shutdown
+    for job_id in job_ids:
+        schedule_import(job_id, reclaim=True)
@@ -0,0 +1,44 @@
+"""
+JSON encoding for responses and stored JSON columns.
+
+Uses orjson when it is installed and the standard library otherwise.
+Both produce compact output without escaping non-ASCII text, so the
+JSON stored under either one is the same.
+"""
+
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(value: Any) -> str:
+    """Encode a value for a TEXT column"""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def loads(value):
+    """Decode a stored column; accepts str or bytes"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def loads_or(value, default):
+    """Decode a nullable column, returning default for NULL or empty values"""
+    return loads(value) if value else default
+
+class DefaultJSONResponse(JSONResponse):
+    """
+    The app's response class. Routes whose data is already in the shape of
+    their response model return it wrapped in this directly, which skips
+    FastAPI's validation of the return value.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,200 @@
+"""
+Resilient wrapper around model provider calls.
+
+- Bounded exponential backoff with full jitter between retries
+- A circuit breaker that fails fast while the provider is down
+- Optional hedging: a second identical request is sent if the first is
+  slow, and whichever finishes first wins
+- A per-attempt timeout so one hung call can't hold a request forever
+
+Callers catch LLMUnavailableError and fall back to a degraded result.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Optional, TypeVar
+from app.services.metrics import metrics
+from app.config import MISTRAL_API_KEY
+
+T = TypeVar("T")
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "4"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+LLM_HEDGE_AFTER_SECONDS = float(os.environ.get("LLM_HEDGE_AFTER_SECONDS", "0"))  # 0 disables hedging
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+class LLMUnavailableError(Exception):
+    """The model call failed after retries, or the circuit is open"""
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures; after a cool-down one trial call is
+    let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                metrics.incr("llm_circuit_opened")
+
+class LLMClient:
+    """
+    Runs provider calls with retries, hedging, timeouts and a circuit breaker.
+    """
+
+    def __init__(self, name: str, max_workers: int = 16):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-llm")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.closing = False
+
+    def _attempt(self, fn: Callable[[], T], timeout: float, hedge_after: float) -> T:
+        """
+        One logical attempt, possibly hedged with a duplicate request.
+        """
+        futures = [self._executor.submit(fn)]
+        deadline = time.monotonic() + timeout
+
+        if hedge_after > 0:
+            done, _ = wait(futures, timeout=min(hedge_after, timeout))
+            if not done:
+                metrics.incr("llm_hedged")
+                futures.append(self._executor.submit(fn))
+
+        last_error: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f"{self.name} call timed out after {timeout}s")
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        retries: int = LLM_MAX_RETRIES,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        hedge_after: float = LLM_HEDGE_AFTER_SECONDS,
+    ) -> T:
+        """
+        Call fn (a zero-argument provider call) resiliently.
+
+        Raises LLMUnavailableError when the circuit is open, all attempts fail,
+        or the client is draining for shutdown.
+        """
+        if self.closing:
+            raise LLMUnavailableError(f"{self.name} client is shutting down")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            for attempt in range(retries + 1):
+                if not self.breaker.allow():
+                    metrics.incr("llm_circuit_rejected")
+                    raise LLMUnavailableError(f"{self.name} circuit is open")
+
+                metrics.incr("llm_calls")
+                start = time.monotonic()
+                try:
+                    result = self._attempt(fn, timeout, hedge_after)
+                    self.breaker.record_success()
+                    metrics.incr("llm_latency_ms_total", int(1000 * (time.monotonic() - start)))
+                    return result
+                except Exception as e:
+                    self.breaker.record_failure()
+                    metrics.incr("llm_failures")
+                    print(f"{self.name} call failed (attempt {attempt + 1}/{retries + 1}): {e}")
+                    last_error = e
+
+                if attempt < retries:
+                    metrics.incr("llm_retries")
+                    backoff = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                    time.sleep(random.uniform(0, backoff))
+
+            raise LLMUnavailableError(f"{self.name} call failed: {last_error}")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Refuse new calls and wait up to timeout for in-flight ones to finish.
+
+        Returns True if nothing was left running.
+        """
+        self.closing = True
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        return self.in_flight == 0
+
+# Global instance
+mistral_llm = LLMClient("mistral")
+
+_mistral_client = None
+_mistral_client_lock = threading.Lock()
+
+def get_mistral_client():
+    """
+    The shared Mistral SDK client, imported and built on first use.
+    """
+    global _mistral_client
+    if _mistral_client is None:
+        with _mistral_client_lock:
+            if _mistral_client is None:
+                from mistralai import Mistral
+                _mistral_client = Mistral(api_key=MISTRAL_API_KEY)
+    return _mistral_client
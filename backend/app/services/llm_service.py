@@ -7,25 +7,50 @@ import re
 import hashlib
 from typing import Dict, List, Any
 from dotenv import load_dotenv
-import os
-from mistralai import Mistral
 from app.schemas.entries import EntryAnalysis
 from app.schemas.prompts import Prompts
 from app.schemas.onboarding import ThreadsAndStarterPrompts
-from app.schemas.insights import WeeklyInsightsResponse
-from app.services.chroma_service import ChromaService
+from app.schemas.insights import WeeklyInsightsResponse, PeriodDigest
+from app.services.llm_client import mistral_llm, get_mistral_client, LLMUnavailableError
+from app.services.fallbacks import heuristic_analysis, default_prompts, heuristic_weekly_insights
+from app.services.metrics import metrics
 
 load_dotenv()
 
-MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY")
 MISTRAL_MODEL_NAME = "ministral-8b-latest"
-mistral_client = Mistral(api_key=MISTRAL_API_KEY)
 
-chroma_service = ChromaService()
+# Completions requested for weekly insights before falling back, when the
+# model answers with JSON that can't be parsed or repaired
+WEEKLY_INSIGHTS_PARSE_ATTEMPTS = 2
 
-def analyze_entry(entry_text: str, prompt_id: str = None) -> Dict:
+# Commas right before a closing brace or bracket, a common model mistake
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+class LLMParseError(ValueError):
+    """The model answered, but not with the requested structure"""
+
+def _parsed(chat_response):
+    """
+    The structured output of a chat.parse response, or LLMParseError if the
+    model's answer didn't parse into the response format.
+    """
+    try:
+        parsed = chat_response.choices[0].message.parsed
+    except (AttributeError, IndexError) as e:
+        parsed = None
+        print(f"Malformed model response: {e}")
+    if parsed is None:
+        metrics.incr("llm_parse_failures")
+        raise LLMParseError("Model response didn't match the requested format")
+    return parsed
+
+def analyze_entry(entry_text: str, prompt_id: str = None, fallback: bool = True) -> Dict:
     """
     Analyze a journal entry and extract insights.
+
+    If the model is unavailable or its answer doesn't parse, a heuristic
+    analysis is returned instead (or the error is raised when fallback is
+    False).
     """
 
     prompt = """
@@ -121,22 +146,28 @@ If a field does not apply (e.g., unresolved threads), return an empty list.
 The output should be calm, grounded, and trustworthy.    
 """
 
-    chat_response = mistral_client.chat.parse(
-        model=MISTRAL_MODEL_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": prompt
-            },
-            {
-                "role": "user",
-                "content": f"Entry text: \n{entry_text}"
-            }
-        ],
-        response_format=EntryAnalysis
-    )
-    formatted_response = chat_response.choices[0].message.parsed
-    return formatted_response.model_dump()
+    try:
+        chat_response = mistral_llm.call(lambda: get_mistral_client().chat.parse(
+            model=MISTRAL_MODEL_NAME,
+            messages=[
+                {
+                    "role": "system",
+                    "content": prompt
+                },
+                {
+                    "role": "user",
+                    "content": f"Entry text: \n{entry_text}"
+                }
+            ],
+            response_format=EntryAnalysis
+        ))
+        return _parsed(chat_response).model_dump()
+    except (LLMUnavailableError, LLMParseError) as e:
+        if not fallback:
+            raise
+        print(f"Using heuristic entry analysis: {e}")
+        metrics.incr("llm_fallbacks")
+        return heuristic_analysis(entry_text)
     
 
 def generate_prompts(entry_text: str, session_history: Dict[Any, Any] = None) -> List[Dict]:
@@ -154,6 +185,10 @@ def generate_prompts(entry_text: str, session_history: Dict[Any, Any] = None) ->
     
     Returns:
         List of prompt dicts with 'id', 'text', 'category'
+
+    Raises LLMUnavailableError if the model is unavailable, or LLMParseError
+    if its answer doesn't parse, so the caller can keep the previous prompt
+    set.
     """
 
     if session_history is not None:
@@ -188,6 +223,7 @@ You may be given some or all of the following:
 
 - **Recent summaries** of the user's journal entries (what has been on their mind lately)
 - **Relevant past summaries** retrieved via semantic similarity (recurring themes or situations)
+- **Long-range memories**: digests of earlier weeks or months (what was on their mind further back)
 - A small list of **active unfinished threads** (open questions or unresolved themes)
 - The user's **most recent entry summary** and **follow-up question**
 
@@ -267,7 +303,7 @@ Each prompt must include:
 The final output should feel **personal, gentle, and reflective**, never directive or invasive.    
 """
 
-    chat_response = mistral_client.chat.parse(
+    chat_response = mistral_llm.call(lambda: get_mistral_client().chat.parse(
         model=MISTRAL_MODEL_NAME,
         messages=[
             {
@@ -280,11 +316,11 @@ The final output should feel **personal, gentle, and reflective**, never directi
             }
         ],
         response_format=Prompts
-    )
+    ))
     print("=====History====")
     print(session_history)
     print("=====Generate prompts responsr===========")
-    response = chat_response.choices[0].message.parsed
+    response = _parsed(chat_response)
     print(response)
     prompts = [p.model_dump() for p in response.prompts]
     return prompts
@@ -443,24 +479,28 @@ The output should feel **welcoming, thoughtful, and gently personalized**.
 
 """
 
-    chat_response = mistral_client.chat.parse(
-        model=MISTRAL_MODEL_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": prompt        
-            },
-            {
-                "role": "user",
-                "content": f"Brain dump:\n{brain_dump}"
-            }
-        ],
-        response_format=ThreadsAndStarterPrompts
-    )
-
-    print(chat_response)
-
-    response = chat_response.choices[0].message.parsed
+    try:
+        chat_response = mistral_llm.call(lambda: get_mistral_client().chat.parse(
+            model=MISTRAL_MODEL_NAME,
+            messages=[
+                {
+                    "role": "system",
+                    "content": prompt        
+                },
+                {
+                    "role": "user",
+                    "content": f"Brain dump:\n{brain_dump}"
+                }
+            ],
+            response_format=ThreadsAndStarterPrompts
+        ))
+        print(chat_response)
+        response = _parsed(chat_response)
+    except (LLMUnavailableError, LLMParseError) as e:
+        # Generic starter prompts; threads are picked up from later entries
+        print(f"Using default starter prompts: {e}")
+        metrics.incr("llm_fallbacks")
+        response = ThreadsAndStarterPrompts(starter_prompts=default_prompts(), active_threads=[])
 
     initial_tree = {
         "entry_id": 0,  # Special ID for initial tree
@@ -504,7 +544,20 @@ def extract_json_from_llm(text: str) -> dict:
     except json.JSONDecodeError as e:
         raise ValueError(f"Failed to parse JSON: {e}\n\nRaw JSON:\n{json_str}")
 
-def generate_weekly_insights(session_id: str, entries: List[Dict]) -> WeeklyInsightsResponse:
+def parse_llm_json(text: str) -> dict:
+    """
+    Extract a JSON object from an LLM response, repairing trailing commas
+    if it doesn't parse as is.
+    """
+    try:
+        return extract_json_from_llm(text)
+    except ValueError:
+        repaired = TRAILING_COMMA.sub(r"\1", text or "")
+        if repaired == text:
+            raise
+        return extract_json_from_llm(repaired)
+
+def generate_weekly_insights(session_id: str, entries: List[Dict], earlier_context: List[str] = None) -> WeeklyInsightsResponse:
     """
     Generate weekly reflection and pattern insights.
     
@@ -517,6 +570,7 @@ def generate_weekly_insights(session_id: str, entries: List[Dict]) -> WeeklyInsi
     Args:
         session_id: User session
         entries: List of entry dicts with analysis
+        earlier_context: Digests of earlier weeks and months, if any
     
     Returns:
         WeeklyInsightsResponse with patterns_reflection, themes, emotions_summary
@@ -554,6 +608,13 @@ Each entry includes:
 
 The entries may be incomplete or uneven (some days missing).
 
+When earlier history is available, you will instead receive an object with:
+- `entries`: the list of entries described above
+- `earlier_context`: short digests of the previous weeks and months
+
+Use `earlier_context` only to notice what is new, returning or fading this week.
+The reflection, themes and emotion counts must still describe this week's entries.
+
 ---
 
 ## Your Task
@@ -627,33 +688,103 @@ Avoid:
 - Therapy-like language ("processing trauma," "attachment," "CBT," etc.)
     """
 
-    json_entries = json.dumps(entries)
+    if earlier_context:
+        json_entries = json.dumps({"entries": entries, "earlier_context": earlier_context})
+    else:
+        json_entries = json.dumps(entries)
     print("==> ENTRIES", json_entries)
 
-    chat_response = mistral_client.chat.complete(
+    def complete() -> str:
+        chat_response = get_mistral_client().chat.complete(
+            model=MISTRAL_MODEL_NAME,
+            messages = [
+                {
+                    "role": "system",
+                    "content": prompt
+                },
+                {
+                    "role": "user",
+                    "content": json_entries
+                }
+            ],
+            #response_format=WeeklyInsightsResponse
+        )
+
+        print("**==> Chat response:", chat_response)
+
+        return chat_response.choices[0].message.content
+
+    # Parsing happens outside the breaker: a malformed answer means the
+    # provider is up, so it is asked again instead of counted as a failure
+    for attempt in range(WEEKLY_INSIGHTS_PARSE_ATTEMPTS):
+        try:
+            raw_content = mistral_llm.call(complete)
+        except LLMUnavailableError as e:
+            print(f"Using heuristic weekly insights: {e}")
+            metrics.incr("llm_fallbacks")
+            return heuristic_weekly_insights(entries)
+
+        try:
+            return WeeklyInsightsResponse(**parse_llm_json(raw_content))
+        except (ValueError, TypeError) as e:
+            metrics.incr("llm_parse_failures")
+            print(f"Unparseable weekly insights (attempt {attempt + 1}/{WEEKLY_INSIGHTS_PARSE_ATTEMPTS}): {e}")
+
+    metrics.incr("llm_fallbacks")
+    return heuristic_weekly_insights(entries)
+
+def summarize_period(level: str, period_label: str, items: List[Dict]) -> Dict:
+    """
+    Compact the summaries of one week (entry summaries) or one month
+    (weekly digests) into a single digest for long-range context.
+
+    There is no heuristic fallback; LLMUnavailableError or LLMParseError is
+    raised and the period is summarized on a later run.
+    """
+
+    prompt = f"""
+# System Prompt: Journal Digest
+
+You are an AI journaling companion compacting a user's journal history into a digest.
+
+You will receive the summaries of every {"entry written during one week" if level == "week" else "weekly digest of one month"} ({period_label}).
+Each item includes a `summary`, its `themes` and its `emotions`.
+
+Your role is **not** to give advice, solutions, or diagnoses.  
+Your role is to **condense what was on the user's mind** so it can be recalled months later.
+
+---
+
+## Your Task
+
+### 1. Summary
+- 2-4 sentences covering the main situations, themes and emotional texture of the period.
+- Mention shifts within the period if the input supports them.
+- Neutral, factual and privacy-safe. No quotes, no advice, no clinical language.
+- Do not invent events not present in the input.
+
+### 2. Themes
+- 3-6 concise theme tags for the period (prefer labels used in the input).
+
+---
+
+## Output Format
+
+Return a structured response that conforms exactly to the expected schema.
+"""
+
+    chat_response = mistral_llm.call(lambda: get_mistral_client().chat.parse(
         model=MISTRAL_MODEL_NAME,
-        messages = [
+        messages=[
             {
                 "role": "system",
                 "content": prompt
             },
             {
                 "role": "user",
-                "content": json_entries
+                "content": json.dumps(items)
             }
         ],
-        #response_format=WeeklyInsightsResponse
-    )
-
-    print("**==> Chat response:", chat_response)
-
-    raw_content = chat_response.choices[0].message.content
-
-    parsed = extract_json_from_llm(raw_content)
-
-    weekly_insights = WeeklyInsightsResponse(**parsed)
-
-    return weekly_insights
-
-    
-
+        response_format=PeriodDigest
+    ))
+    return _parsed(chat_response).model_dump()
@@ -0,0 +1,38 @@
+"""
+In-process counters for observability.
+
+Counters are per worker process and reset on restart. They are exposed
+as JSON on GET /metrics.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """
+    Thread-safe named counters and gauges.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+# Global instance
+metrics = Metrics()
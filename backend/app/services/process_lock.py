@@ -0,0 +1,76 @@
+"""
+Cross-process locks for state shared by worker processes.
+
+Workers coordinate through advisory file locks in LOCK_DIR:
+- "init": one worker at a time creates and migrates the schema
+- "chroma": one writer at a time in a local Chroma directory
+- "leader": held for its lifetime by the worker running background jobs
+
+On platforms without fcntl (Windows), only the in-process lock is taken,
+which is enough for the single-process development server.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict
+from app.config import LOCK_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class ProcessLock:
+    """
+    A file lock that also serializes threads of the current process.
+    """
+
+    def __init__(self, name: str):
+        self.path = Path(LOCK_DIR) / f"{name}.lock"
+        self._thread_lock = threading.RLock()
+        self._file = None
+        self._depth = 0
+
+    def _open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a+")
+        return self._file
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking=blocking):
+            return False
+        if self._depth == 0 and fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._open().fileno(), flags)
+            except BlockingIOError:
+                self._thread_lock.release()
+                return False
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+_locks: Dict[str, ProcessLock] = {}
+_locks_guard = threading.Lock()
+
+def process_lock(name: str) -> ProcessLock:
+    """
+    The shared lock object for a name, so re-entrant use within a process works.
+    """
+    with _locks_guard:
+        if name not in _locks:
+            _locks[name] = ProcessLock(name)
+        return _locks[name]
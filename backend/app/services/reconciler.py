@@ -0,0 +1,163 @@
+"""
+Reconciliation between the database and the vector index.
+
+Vector writes happen after the SQL transaction commits and failures are
+only logged, so the two stores can drift apart. The reconciler diffs
+entry_analysis against the stored vector IDs (Chroma and, when enabled,
+the exact index), re-embeds missing entries in batches and removes
+orphaned vectors. The leader runs it periodically; reconcile.py runs it
+on demand.
+"""
+
+import asyncio
+import os
+from typing import Callable, Dict, List, Optional
+import aiosqlite
+from app.db.database import connect
+from app.services import json_codec
+from app.services.chroma_service import chroma_service
+from app.services.metrics import metrics
+
+EMBED_BATCH_SIZE = 32
+RECONCILE_JOB_INTERVAL_SECONDS = int(os.environ.get("RECONCILE_JOB_INTERVAL_SECONDS", "3600"))
+
+async def _fetch_analyses(db: aiosqlite.Connection, session_id: str) -> Dict[int, Dict]:
+    """
+    Entries of a session that have an analysis, keyed by entry ID.
+    """
+    async with db.execute(
+        """
+        SELECT je.id, je.created_at, ea.memory_summary, ea.patterns_reflection,
+               ea.follow_up_question, ea.themes_json, ea.emotions_json, ea.unresolved_json
+        FROM entry_analysis ea
+        JOIN journal_entries je ON ea.entry_id = je.id
+        WHERE je.session_id = ?
+        """,
+        (session_id,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    return {
+        row[0]: {
+            "entry_id": row[0],
+            "text": row[2],
+            "metadata": {
+                "themes": json_codec.loads(row[5]),
+                "emotions": json_codec.loads(row[6]),
+                "unresolved": json_codec.loads(row[7]),
+                "follow_up_question": row[4],
+                "patterns_reflection": row[3],
+                "created_at": row[1],
+                "entry_id": row[0],
+            },
+        }
+        for row in rows
+    }
+
+async def reconcile_session(db: aiosqlite.Connection, session_id: str, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Bring one session's vectors, in Chroma and the exact index, in line
+    with its stored analyses.
+    """
+    analyses = await _fetch_analyses(db, session_id)
+    vector_ids = await asyncio.to_thread(chroma_service.list_entry_ids, session_id)
+    exact_ids = await asyncio.to_thread(chroma_service.exact_entry_ids, session_id)
+
+    missing: List[int] = sorted(set(analyses) - vector_ids)
+    orphans: List[int] = sorted(vector_ids - set(analyses))
+    report = {"missing": len(missing), "orphans": len(orphans), "reembedded": 0}
+    if exact_ids is not None:
+        report["exact_missing"] = len(set(analyses) - exact_ids)
+        report["exact_orphans"] = len(exact_ids - set(analyses))
+
+    if dry_run:
+        return report
+
+    # Stored in both Chroma and the exact index
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = [analyses[entry_id] for entry_id in missing[start:start + EMBED_BATCH_SIZE]]
+        report["reembedded"] += await asyncio.to_thread(chroma_service.store_entries, session_id, batch)
+
+    if exact_ids is not None:
+        # Entries Chroma already had are copied over without re-embedding
+        exact_missing = sorted(set(analyses) - exact_ids - set(missing))
+        await asyncio.to_thread(chroma_service.copy_to_exact_index, session_id, exact_missing)
+        orphans = sorted(set(orphans) | (exact_ids - set(analyses)))
+
+    if orphans:
+        await asyncio.to_thread(chroma_service.delete_entries, session_id, orphans)
+
+    return report
+
+async def _all_session_ids(db: aiosqlite.Connection) -> List[str]:
+    # Tombstoned sessions are left to their purge
+    async with db.execute("SELECT id FROM sessions") as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+async def _orphans(db: aiosqlite.Connection, find: Callable[[List[str]], List[str]]) -> List[str]:
+    """
+    Partitions that belong to no session. Listing twice, each time after
+    reading the sessions, keeps partitions of sessions created in between.
+    """
+    candidates = await asyncio.to_thread(find, await _all_session_ids(db))
+    if not candidates:
+        return []
+    confirmed = await asyncio.to_thread(find, await _all_session_ids(db))
+    return sorted(set(candidates) & set(confirmed))
+
+async def reconcile_all(db: aiosqlite.Connection, session_id: Optional[str] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Reconcile every session (or just one) and record drift as metrics.
+
+    Also drops Chroma partitions and exact index directories whose session
+    no longer exists.
+    """
+    if session_id:
+        session_ids = [session_id]
+    else:
+        async with db.execute("SELECT id FROM sessions WHERE deleted_at IS NULL") as cursor:
+            session_ids = [row[0] for row in await cursor.fetchall()]
+
+    totals = {
+        "sessions": 0, "missing": 0, "orphans": 0, "reembedded": 0,
+        "exact_missing": 0, "exact_orphans": 0, "orphan_partitions": 0,
+    }
+    for sid in session_ids:
+        report = await reconcile_session(db, sid, dry_run=dry_run)
+        totals["sessions"] += 1
+        for key, value in report.items():
+            totals[key] += value
+
+    if not session_id:
+        orphan_partitions = await _orphans(db, chroma_service.orphan_partitions)
+        orphan_dirs = await _orphans(db, chroma_service.orphan_exact_dirs)
+        totals["orphan_partitions"] = len(orphan_partitions) + len(orphan_dirs)
+        if not dry_run:
+            for name in orphan_partitions:
+                await asyncio.to_thread(chroma_service.drop_partition, name)
+            for name in orphan_dirs:
+                await asyncio.to_thread(chroma_service.drop_exact_dir, name)
+
+    metrics.incr("vector_reconcile_runs")
+    metrics.set_gauge("vector_drift_missing", totals["missing"])
+    metrics.set_gauge("vector_drift_orphans", totals["orphans"])
+    metrics.set_gauge("vector_drift_exact_missing", totals["exact_missing"])
+    metrics.set_gauge("vector_drift_exact_orphans", totals["exact_orphans"])
+    metrics.set_gauge("vector_drift_orphan_partitions", totals["orphan_partitions"])
+    metrics.incr("vector_reconcile_reembedded", totals["reembedded"])
+
+    return totals
+
+async def run_reconcile_job():
+    """
+    Periodically reconcile all sessions, so drift shows on the leader's /metrics.
+    """
+    while True:
+        try:
+            async with connect() as db:
+                totals = await reconcile_all(db)
+            if totals["reembedded"] or totals["orphans"] or totals["orphan_partitions"]:
+                print(f"Reconciled vectors: {totals}")
+        except Exception as e:
+            print(f"Reconcile job failed: {e}")
+        await asyncio.sleep(RECONCILE_JOB_INTERVAL_SECONDS)
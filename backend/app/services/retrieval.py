@@ -0,0 +1,308 @@
+"""
+Memory retrieval for prompt generation.
+
+Each session's memories (summary, day, themes, embedding and linked
+threads) are kept in an in-memory candidate cache. The entry being
+written is added as it is stored, and entries and threads written
+elsewhere (imports, other workers) are picked up from the change log;
+stored embeddings are fetched from the vector backend only when entries
+are loaded into the cache. A retrieval is then one vectorized scoring
+pass, with no vector search:
+
+    score = W_SIMILARITY * cosine (0 outside the closest candidates)
+          + W_RECENCY * 0.5 ** (age_days / RETRIEVAL_HALF_LIFE_DAYS)
+          + W_THEMES * jaccard(themes)
+          + W_THREADS * linked_to_an_active_thread
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+import asyncio
+import aiosqlite
+import numpy as np
+from app.db import queries
+from app.services.chroma_service import chroma_service
+from app.services.change_log import ENTRY, THREAD
+from app.services import json_codec
+
+RETRIEVAL_WEIGHT_SIMILARITY = float(os.environ.get("RETRIEVAL_WEIGHT_SIMILARITY", "0.55"))
+RETRIEVAL_WEIGHT_RECENCY = float(os.environ.get("RETRIEVAL_WEIGHT_RECENCY", "0.2"))
+RETRIEVAL_WEIGHT_THEMES = float(os.environ.get("RETRIEVAL_WEIGHT_THEMES", "0.15"))
+RETRIEVAL_WEIGHT_THREADS = float(os.environ.get("RETRIEVAL_WEIGHT_THREADS", "0.1"))
+RETRIEVAL_HALF_LIFE_DAYS = float(os.environ.get("RETRIEVAL_HALF_LIFE_DAYS", "14"))
+
+# Most recent memories kept per session, and sessions kept in memory
+RETRIEVAL_MAX_CANDIDATES = int(os.environ.get("RETRIEVAL_MAX_CANDIDATES", "1000"))
+RETRIEVAL_CACHE_SESSIONS = int(os.environ.get("RETRIEVAL_CACHE_SESSIONS", "64"))
+# Closest candidates that get the similarity term
+RETRIEVAL_SIMILAR_CANDIDATES = int(os.environ.get("RETRIEVAL_SIMILAR_CANDIDATES", "50"))
+
+# Latest entries passed to the model as-is, ahead of the scored ones
+RECENT_MEMORIES = 3
+RELEVANT_MEMORIES = 5
+
+@dataclass
+class Memory:
+    entry_id: int
+    summary: str
+    day: int
+    themes: List[str]
+    embedding: Optional[List[float]] = None
+    thread_ids: tuple = ()
+
+def _day(timestamp: str) -> int:
+    return date.fromisoformat(timestamp[:10]).toordinal()
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class SessionMemories:
+    """
+    Candidate memories of one session as growable column arrays, oldest first.
+    """
+
+    def __init__(self, seq: int, capacity: int = 64):
+        # Change-log sequence the cache is current with
+        self.seq = seq
+        self.size = 0
+        self.entry_ids = np.zeros(capacity, dtype=np.int64)
+        self.days = np.zeros(capacity, dtype=np.float32)
+        self.theme_vocab: Dict[str, int] = {}
+        self.themes = np.zeros((capacity, 8), dtype=np.float32)
+        self.summaries: List[str] = []
+        # Unit-normalized embeddings, zero rows where unknown; sized on the first one
+        self.embeddings: Optional[np.ndarray] = None
+        # Thread ID -> rows of the entries that touched it
+        self.thread_rows: Dict[int, List[int]] = {}
+        self.rows: Dict[int, int] = {}
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self.rows
+
+    @staticmethod
+    def _grow(array: np.ndarray, rows: int, cols: Optional[int] = None) -> np.ndarray:
+        """Copy of array zero-padded to rows (and cols, for matrices)"""
+        if array.ndim == 1:
+            grown = np.zeros(rows, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+        grown = np.zeros((rows, cols or array.shape[1]), dtype=array.dtype)
+        grown[:array.shape[0], :array.shape[1]] = array
+        return grown
+
+    def _theme_row(self, themes: List[str], add: bool) -> np.ndarray:
+        """Multi-hot row of themes over the vocabulary; unknown themes are added if add"""
+        columns = []
+        for theme in {t.strip().lower() for t in themes if t and t.strip()}:
+            if theme not in self.theme_vocab:
+                if not add:
+                    continue
+                self.theme_vocab[theme] = len(self.theme_vocab)
+            columns.append(self.theme_vocab[theme])
+        if len(self.theme_vocab) > self.themes.shape[1]:
+            self.themes = self._grow(self.themes, self.themes.shape[0], len(self.theme_vocab) * 2)
+        row = np.zeros(self.themes.shape[1], dtype=np.float32)
+        row[columns] = 1.0
+        return row
+
+    def append(self, memory: Memory):
+        if memory.entry_id in self.rows:
+            return
+        if self.size == RETRIEVAL_MAX_CANDIDATES:
+            self._drop_oldest(max(1, RETRIEVAL_MAX_CANDIDATES // 4))
+        if self.size == len(self.entry_ids):
+            capacity = len(self.entry_ids) * 2
+            self.entry_ids = self._grow(self.entry_ids, capacity)
+            self.days = self._grow(self.days, capacity)
+            self.themes = self._grow(self.themes, capacity)
+            if self.embeddings is not None:
+                self.embeddings = self._grow(self.embeddings, capacity)
+
+        row = self.size
+        self.entry_ids[row] = memory.entry_id
+        self.days[row] = memory.day
+        self.themes[row] = self._theme_row(memory.themes, add=True)
+        self.summaries.append(memory.summary)
+        for thread_id in memory.thread_ids:
+            self.thread_rows.setdefault(thread_id, []).append(row)
+        self.rows[memory.entry_id] = row
+        self.size += 1
+        if memory.embedding is not None:
+            self.set_embedding(memory.entry_id, memory.embedding)
+
+    def set_embedding(self, entry_id: int, embedding):
+        row = self.rows.get(entry_id)
+        if row is None:
+            return
+        vector = _unit(embedding)
+        if self.embeddings is None:
+            self.embeddings = np.zeros((len(self.entry_ids), len(vector)), dtype=np.float32)
+        if len(vector) == self.embeddings.shape[1]:
+            self.embeddings[row] = vector
+
+    def link_thread(self, thread_id: int, entry_id: Optional[int]):
+        """Link a thread to the cached entry that last touched it"""
+        row = self.rows.get(entry_id)
+        rows = self.thread_rows.setdefault(thread_id, [])
+        if row is not None and row not in rows:
+            rows.append(row)
+
+    def _drop_oldest(self, count: int):
+        keep = slice(count, self.size)
+        for name in ("entry_ids", "days", "themes", "embeddings"):
+            array = getattr(self, name)
+            if array is None:
+                continue
+            kept = array[keep].copy()
+            array[:len(kept)] = kept
+            array[len(kept):] = 0
+        self.summaries = self.summaries[count:]
+        self.thread_rows = {
+            thread_id: [row - count for row in rows if row >= count]
+            for thread_id, rows in self.thread_rows.items()
+        }
+        self.size -= count
+        self.rows = {int(entry_id): row for row, entry_id in enumerate(self.entry_ids[:self.size])}
+
+    def scores(self, query: Memory, active_threads: List[Dict], exclude_rows: np.ndarray = ()) -> np.ndarray:
+        """Blended score of every candidate for the query memory; exclude_rows get no similarity term"""
+        n = self.size
+        scores = np.zeros(n, dtype=np.float32)
+
+        if self.embeddings is not None and query.embedding is not None:
+            vector = _unit(query.embedding)
+            if len(vector) == self.embeddings.shape[1]:
+                similarity = self.embeddings[:n] @ vector
+                similarity[exclude_rows] = -np.inf
+                # Only the closest candidates count
+                k = min(RETRIEVAL_SIMILAR_CANDIDATES, n)
+                if k:
+                    cutoff = np.partition(similarity, n - k)[n - k]
+                    similarity = np.where((similarity >= cutoff) & np.isfinite(similarity), similarity, 0)
+                    scores += RETRIEVAL_WEIGHT_SIMILARITY * similarity
+
+        age = np.maximum(query.day - self.days[:n], 0)
+        scores += RETRIEVAL_WEIGHT_RECENCY * np.power(0.5, age / RETRIEVAL_HALF_LIFE_DAYS)
+
+        query_themes = self._theme_row(query.themes, add=False)
+        if query_themes.any():
+            overlap = self.themes[:n] @ query_themes
+            union = self.themes[:n].sum(axis=1) + query_themes.sum() - overlap
+            scores += RETRIEVAL_WEIGHT_THEMES * overlap / np.maximum(union, 1)
+
+        if active_threads:
+            linked = np.zeros(n, dtype=np.float32)
+            for thread in active_threads:
+                linked[self.thread_rows.get(thread["id"], [])] = 1.0
+                row = self.rows.get(thread.get("last_seen_entry_id"))
+                if row is not None:
+                    linked[row] = 1.0
+            scores += RETRIEVAL_WEIGHT_THREADS * linked
+        return scores
+
+class MemoryIndex:
+    """
+    LRU of per-session candidate caches.
+    """
+
+    def __init__(self, max_sessions: int = RETRIEVAL_CACHE_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionMemories]" = OrderedDict()
+
+    def forget(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def add(self, session_id: str, memory: Memory):
+        """Append a new entry to a cached session; uncached sessions load it later"""
+        memories = self._sessions.get(session_id)
+        if memories is not None:
+            memories.append(memory)
+
+    async def _sync(self, db: aiosqlite.Connection, session_id: str) -> SessionMemories:
+        """
+        Load a session's candidates, or bring a cached one up to date with the change log.
+        """
+        memories = self._sessions.get(session_id)
+        if memories is None:
+            memories = SessionMemories(await queries.CHANGE_SEQ.scalar(db, session_id, default=0))
+            await self._load(db, session_id, memories, entry_ids=None)
+            # Threads remember the entry that last touched them, so links survive restarts and evictions
+            for thread_id, entry_id in await queries.THREAD_ENTRY_LINKS.all(db, session_id):
+                memories.link_thread(thread_id, entry_id)
+            self._sessions[session_id] = memories
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return memories
+
+        self._sessions.move_to_end(session_id)
+        rows = await queries.KINDS_CHANGES_SINCE.all(db, session_id, memories.seq, ENTRY, THREAD)
+        if rows:
+            memories.seq = rows[-1][0]
+            missing = [int(ref) for _, kind, ref in rows if kind == ENTRY and int(ref) not in memories]
+            if missing:
+                await self._load(db, session_id, memories, entry_ids=missing)
+            thread_ids = sorted({int(ref) for _, kind, ref in rows if kind == THREAD})
+            if thread_ids:
+                for thread in await queries.SESSION_THREADS_BY_ID.all_in(db, thread_ids, session_id):
+                    memories.link_thread(thread.id, thread.last_seen_entry_id)
+        return memories
+
+    async def _load(self, db: aiosqlite.Connection, session_id: str, memories: SessionMemories, entry_ids: Optional[List[int]]):
+        """Append analyzed entries (all recent ones if entry_ids is None) with their stored embeddings"""
+        if entry_ids is None:
+            rows = list(reversed(await queries.RECENT_MEMORIES.all(db, session_id, RETRIEVAL_MAX_CANDIDATES)))
+        else:
+            rows = await queries.MEMORIES_BY_ID.all_in(db, sorted(entry_ids), session_id)
+            rows = rows[-RETRIEVAL_MAX_CANDIDATES:]
+
+        for entry_id, created_at, summary, themes_json in rows:
+            memories.append(Memory(
+                entry_id=entry_id,
+                summary=summary,
+                day=_day(created_at),
+                themes=json_codec.loads_or(themes_json, []),
+            ))
+
+        embeddings = await asyncio.to_thread(
+            chroma_service.get_embeddings, session_id, [row[0] for row in rows]
+        )
+        for entry_id, embedding in embeddings.items():
+            memories.set_embedding(entry_id, embedding)
+
+    async def retrieve(
+        self,
+        db: aiosqlite.Connection,
+        session_id: str,
+        query: Memory,
+        active_threads: List[Dict],
+        recent: int = RECENT_MEMORIES,
+        limit: int = RELEVANT_MEMORIES,
+    ) -> Dict[str, List[str]]:
+        """
+        The latest memories of a session (ending with the query entry) and
+        the best-scoring older ones.
+        """
+        self.add(session_id, query)
+        memories = await self._sync(db, session_id)
+        memories.append(query)
+
+        # Imported entries can arrive out of order, so rows are ranked by entry ID
+        recent_rows = np.argsort(memories.entry_ids[:memories.size], kind="stable")[-recent:]
+        scores = memories.scores(query, active_threads, recent_rows)
+        scores[recent_rows] = -np.inf
+
+        limit = min(limit, int(np.isfinite(scores).sum()))
+        top = np.argpartition(-scores, limit - 1)[:limit] if limit > 0 else np.array([], dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return {
+            "recent_memories": [memories.summaries[row] for row in reversed(recent_rows)],
+            "relevant_memories": [memories.summaries[row] for row in top],
+        }
+
+# Global instance
+memory_index = MemoryIndex()
@@ -0,0 +1,80 @@
+"""
+In-memory registry of known live sessions.
+
+Every request checks that its session exists. Known session IDs are kept
+in a bounded LRU so hot read paths skip that query. Each worker polls the
+sessions table for tombstones every few seconds and evicts them, so a
+session deleted through another worker stops being served within one
+poll interval; the TTL is only a backstop. Write paths always check the
+database instead of the cache.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.db import queries
+from app.services.metrics import metrics
+
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "300"))
+# How often each worker looks for sessions tombstoned by other workers
+SESSION_TOMBSTONE_POLL_SECONDS = float(os.environ.get("SESSION_TOMBSTONE_POLL_SECONDS", "1"))
+
+class SessionRegistry:
+    """
+    Bounded LRU of session IDs known to exist, with hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SESSION_CACHE_SIZE,
+        ttl: float = SESSION_CACHE_TTL_SECONDS,
+        poll_interval: float = SESSION_TOMBSTONE_POLL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, float]" = OrderedDict()
+        self._polled_at = float("-inf")
+
+    async def evict_tombstoned(self, db):
+        """
+        Drop sessions tombstoned since the last poll, at most once per
+        poll interval. Tombstoned rows live until their purge finishes,
+        which waits at least two intervals, so every worker sees them.
+        """
+        started = time.monotonic()
+        if started - self._polled_at < self.poll_interval:
+            return
+        # Claim the poll before awaiting so concurrent requests skip it
+        self._polled_at = started
+        for row in await queries.TOMBSTONED_SESSIONS.all(db):
+            self.discard(row[0])
+
+    def contains(self, session_id: str) -> bool:
+        with self._lock:
+            added_at = self._sessions.get(session_id)
+            if added_at is not None and time.monotonic() - added_at < self.ttl:
+                self._sessions.move_to_end(session_id)
+                metrics.incr("session_cache_hits")
+                return True
+            if added_at is not None:
+                del self._sessions[session_id]
+        metrics.incr("session_cache_misses")
+        return False
+
+    def add(self, session_id: str):
+        with self._lock:
+            self._sessions[session_id] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            if len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+# Global instance
+session_registry = SessionRegistry()
@@ -0,0 +1,187 @@
+"""
+Thread lifecycle: persist threads extracted by the LLM and keep them current.
+
+New unresolved items are matched to the session's open threads by
+embedding similarity, so a recurring topic updates one thread instead
+of creating duplicates, without another LLM call. Threads not seen for
+a while are snoozed by a periodic batch job.
+"""
+
+import asyncio
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional
+import aiosqlite
+import numpy as np
+from app.db.database import connect
+from app.db import queries
+from app.services.chroma_service import chroma_service
+from app.services.change_log import record_changes, THREAD
+from app.services import timestamps
+
+# Cosine similarity above which an item is treated as the same thread
+THREAD_MATCH_THRESHOLD = float(os.environ.get("THREAD_MATCH_THRESHOLD", "0.85"))
+# Most recently updated open threads an item is matched against
+THREAD_MATCH_CANDIDATES = int(os.environ.get("THREAD_MATCH_CANDIDATES", "500"))
+STALE_THREAD_DAYS = int(os.environ.get("STALE_THREAD_DAYS", "14"))
+STALE_THREAD_JOB_INTERVAL_SECONDS = int(os.environ.get("STALE_THREAD_JOB_INTERVAL_SECONDS", "3600"))
+# Active threads shown with today's prompts and passed to prompt generation
+ACTIVE_THREADS_LIMIT = 3
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _clean_items(items: List[str]) -> List[str]:
+    return [item.strip() for item in items if item and item.strip()]
+
+async def embed_items(items: List[str]) -> List[Optional[np.ndarray]]:
+    """
+    Normalized embedding of each unresolved item, None where embeddings are
+    unavailable. Callers holding a lock embed first and pass the result on.
+    """
+    items = _clean_items(items)
+    embeddings = await asyncio.to_thread(chroma_service.embed_texts, items) if items else None
+    if not embeddings:
+        return [None] * len(items)
+    return list(_normalize(np.asarray(embeddings, dtype=np.float32)))
+
+async def upsert_threads(
+    db: aiosqlite.Connection,
+    session_id: str,
+    items: List[str],
+    entry_id: Optional[int] = None,
+    item_vectors: Optional[List[Optional[np.ndarray]]] = None,
+) -> List[Dict]:
+    """
+    Insert new threads or refresh matching ones, returning the touched threads.
+
+    Matching threads get last_seen_entry_id and updated_at bumped, and are
+    reactivated if they were snoozed. Resolved threads are never matched,
+    nor open threads beyond the THREAD_MATCH_CANDIDATES most recent.
+    item_vectors, from embed_items, skips embedding the items here.
+    The caller commits, together with the rest of its write.
+    """
+    items = _clean_items(items)
+    if not items:
+        return []
+
+    existing = await queries.OPEN_THREAD_VECTORS.all(db, session_id, THREAD_MATCH_CANDIDATES)
+
+    if item_vectors is None:
+        item_vectors = await embed_items(items)
+
+    thread_ids = [row[0] for row in existing]
+    thread_texts = [row[1].strip().lower() for row in existing]
+    thread_vectors = [
+        np.frombuffer(row[2], dtype=np.float32) if row[2] else None
+        for row in existing
+    ]
+
+    now = timestamps.now_iso()
+    touched_ids = []
+    for i, item in enumerate(items):
+        vector = item_vectors[i]
+        match_id = None
+
+        if item.lower() in thread_texts:
+            match_id = thread_ids[thread_texts.index(item.lower())]
+        elif vector is not None:
+            candidates = [
+                (j, v) for j, v in enumerate(thread_vectors)
+                if v is not None and len(v) == len(vector)
+            ]
+            if candidates:
+                matrix = _normalize(np.stack([v for _, v in candidates]))
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= THREAD_MATCH_THRESHOLD:
+                    match_id = thread_ids[candidates[best][0]]
+
+        if match_id is not None:
+            await db.execute(
+                """
+                UPDATE threads
+                SET status = 'active', updated_at = ?,
+                    last_seen_entry_id = COALESCE(?, last_seen_entry_id)
+                WHERE id = ?
+                """,
+                (now, entry_id, match_id)
+            )
+            touched_ids.append(match_id)
+            continue
+
+        async with db.execute(
+            """
+            INSERT INTO threads (
+                session_id, thread, status, created_at, updated_at,
+                last_seen_entry_id, embedding
+            )
+            VALUES (?, ?, 'active', ?, ?, ?, ?)
+            RETURNING id
+            """,
+            (
+                session_id,
+                item,
+                now,
+                now,
+                entry_id,
+                vector.tobytes() if vector is not None else None,
+            )
+        ) as cursor:
+            thread_id = (await cursor.fetchone())[0]
+        # Later items in the same batch can match this new thread
+        thread_ids.append(thread_id)
+        thread_texts.append(item.lower())
+        thread_vectors.append(vector)
+        touched_ids.append(thread_id)
+
+    unique_ids = list(dict.fromkeys(touched_ids))
+    await record_changes(db, session_id, THREAD, unique_ids)
+
+    rows = await queries.SESSION_THREADS_BY_ID.all_in(db, unique_ids, session_id)
+    threads = {row.id: row.as_dict() for row in rows}
+    return [threads[thread_id] for thread_id in unique_ids if thread_id in threads]
+
+async def load_active_threads(db: aiosqlite.Connection, session_id: str, limit: int = ACTIVE_THREADS_LIMIT) -> List[Dict]:
+    """The session's most recently updated active threads"""
+    return [row.as_dict() for row in await queries.ACTIVE_THREADS.all(db, session_id, limit)]
+
+async def snooze_stale_threads(db: aiosqlite.Connection, max_age_days: int = STALE_THREAD_DAYS) -> int:
+    """
+    Snooze active threads not seen for max_age_days, in one indexed update.
+    """
+    cutoff = (timestamps.now() - timedelta(days=max_age_days)).isoformat()
+    async with db.execute(
+        """
+        UPDATE threads
+        SET status = 'snoozed', updated_at = ?
+        WHERE status = 'active' AND updated_at < ?
+        RETURNING id, session_id
+        """,
+        (timestamps.now_iso(), cutoff)
+    ) as cursor:
+        snoozed = await cursor.fetchall()
+
+    by_session: Dict[str, List[int]] = {}
+    for thread_id, session_id in snoozed:
+        by_session.setdefault(session_id, []).append(thread_id)
+    for session_id, thread_ids in by_session.items():
+        await record_changes(db, session_id, THREAD, thread_ids)
+    await db.commit()
+    return len(snoozed)
+
+async def run_stale_thread_job():
+    """
+    Periodically snooze stale threads for all sessions.
+    """
+    while True:
+        try:
+            async with connect() as db:
+                snoozed = await snooze_stale_threads(db)
+            if snoozed:
+                print(f"Snoozed {snoozed} stale threads")
+        except Exception as e:
+            print(f"Stale thread job failed: {e}")
+        await asyncio.sleep(STALE_THREAD_JOB_INTERVAL_SECONDS)
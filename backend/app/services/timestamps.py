@@ -0,0 +1,103 @@
+"""
+Timestamps and calendar windows.
+
+Timestamps are written as timezone-aware ISO text in UTC, so they sort
+and compare correctly as text, and entries also keep theirs as integer
+epoch seconds so date windows are indexed range scans. Entries keep the
+offset they were written or imported with. Naive timestamps written by
+older versions are read as server local time; calendar windows are in
+UTC unless a time zone is given.
+"""
+
+import re
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Calendar days covered when no window is requested
+DEFAULT_WINDOW_DAYS = 7
+
+ISO_WEEK = re.compile(r"^(\d{4})-?W(\d{2})$")
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def now_iso() -> str:
+    """Current time as timezone-aware ISO text"""
+    return now().isoformat()
+
+def parse(value: str) -> datetime:
+    """Aware datetime of ISO text; naive values are taken as server local time"""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+def to_utc_iso(value: str) -> str:
+    """UTC ISO text of a timestamp; text order of such values is time order"""
+    return parse(value).astimezone(timezone.utc).isoformat()
+
+def to_epoch(value: str) -> int:
+    return int(parse(value).timestamp())
+
+def zone(name: Optional[str]) -> tzinfo:
+    """IANA time zone by name, UTC without one"""
+    if not name:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone '{name}'")
+
+def midnight(day: date, tz: tzinfo = timezone.utc) -> int:
+    """Epoch of the start of a day in tz, UTC by default"""
+    return int(datetime.combine(day, time(), tzinfo=tz).timestamp())
+
+def _bound(value: str, tz: tzinfo, end: bool) -> int:
+    """Epoch of a from/to value; a bare date is its whole day, so an end date is inclusive"""
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        return midnight(day + timedelta(days=1) if end else day, tz)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return int(parsed.timestamp())
+
+def window(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    week: Optional[str] = None,
+    tz: Optional[str] = None,
+    days: int = DEFAULT_WINDOW_DAYS,
+) -> Tuple[int, int]:
+    """
+    Epoch bounds [start, end) of a calendar window in time zone tz (UTC
+    by default).
+
+    week selects an ISO week ("2026-W42"); start and end are ISO dates or
+    datetimes, and a missing bound is now or days before the other one.
+    Without any of them the window is the last days calendar days,
+    today included. Raises ValueError for malformed or empty windows.
+    """
+    zone_info = zone(tz)
+    if week:
+        if start or end:
+            raise ValueError("week can't be combined with from or to")
+        match = ISO_WEEK.match(week.strip())
+        if not match:
+            raise ValueError(f"Invalid ISO week '{week}', expected YYYY-Www")
+        monday = date.fromisocalendar(int(match.group(1)), int(match.group(2)), 1)
+        return midnight(monday, zone_info), midnight(monday + timedelta(days=7), zone_info)
+
+    if start or end:
+        try:
+            end_epoch = _bound(end, zone_info, end=True) if end else int(now().timestamp()) + 1
+            start_epoch = _bound(start, zone_info, end=False) if start else end_epoch - days * 86400
+        except ValueError:
+            raise ValueError("from and to must be ISO dates or datetimes")
+    else:
+        today = now().astimezone(zone_info).date()
+        start_epoch = midnight(today - timedelta(days=days - 1), zone_info)
+        end_epoch = midnight(today + timedelta(days=1), zone_info)
+
+    if start_epoch >= end_epoch:
+        raise ValueError("from must be before to")
+    return start_epoch, end_epoch
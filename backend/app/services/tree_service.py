@@ -5,9 +5,15 @@ Trees represent journal entries visually. Each entry unlocks a tree
 with varying rarity based on entry characteristics.
 """
 
-import random
+import os
 import hashlib
-from typing import Dict, Literal
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, List
+import numpy as np
+from app.services import json_codec
+from app.services import timestamps
+from app.services.change_log import record_changes, TREE
 
 TREE_TYPES = [
     "oak", "birch", "pine", "maple", "cherry", "willow", "cedar",
@@ -38,6 +44,28 @@ RARITY_WEIGHTS = {
     "legendary": 0.01,   # 1%
 }
 
+RARITIES = list(RARITY_WEIGHTS)
+
+# Lower bound of every rarity but the first: [0.50, 0.80, 0.95, 0.99].
+# Rounded so float sums match the literal thresholds exactly.
+RARITY_THRESHOLDS = [round(w, 10) for w in accumulate(RARITY_WEIGHTS.values())][:-1]
+
+# Prefix for the hashed content; changing it re-seeds every tree (see rebuild_trees.py)
+TREE_SEED = os.environ.get("TREE_SEED", "")
+
+def _seed_key(entry_id: int, entry_text: str) -> bytes:
+    return f"{TREE_SEED}{entry_id}_{entry_text}".encode()
+
+def _rarity_roll(hash_int, entry_length, num_themes, num_emotions):
+    """
+    Hash roll plus the bonus for longer, more analyzed entries.
+
+    Works on ints and on NumPy arrays alike, in the same float order.
+    """
+    minimum = np.minimum if isinstance(entry_length, np.ndarray) else min
+    rarity_bonus = minimum(0.2, (entry_length / 1000) + (num_themes * 0.03) + (num_emotions * 0.02))
+    return (hash_int % 1000) / 1000.0 + rarity_bonus
+
 def generate_tree(entry_text: str, entry_id: int, themes: list = None, emotions: list = None) -> Dict:
     """
     Generate a tree for a journal entry.
@@ -55,29 +83,17 @@ def generate_tree(entry_text: str, entry_id: int, themes: list = None, emotions:
         Dict with tree type, rarity, and display_name
     """
     # Deterministic seed based on entry content and ID
-    content_hash = hashlib.md5(f"{entry_id}_{entry_text}".encode()).hexdigest()
+    content_hash = hashlib.md5(_seed_key(entry_id, entry_text)).hexdigest()
     hash_int = int(content_hash[:12], 16)
     
-    # Determine rarity (influenced by entry characteristics)
-    entry_length = len(entry_text)
-    num_themes = len(themes) if themes else 0
-    num_emotions = len(emotions) if emotions else 0
-    
-    # Longer, more analyzed entries have better rarity chances
-    rarity_bonus = min(0.2, (entry_length / 1000) + (num_themes * 0.03) + (num_emotions * 0.02))
-    
-    # Select rarity
-    rand = (hash_int % 1000) / 1000.0 + rarity_bonus
-    if rand >= 0.99:
-        rarity = "legendary"
-    elif rand >= 0.95:
-        rarity = "epic"
-    elif rand >= 0.80:
-        rarity = "rare"
-    elif rand >= 0.50:
-        rarity = "uncommon"
-    else:
-        rarity = "common"
+    # Select rarity (longer, more analyzed entries have better chances)
+    rand = _rarity_roll(
+        hash_int,
+        len(entry_text),
+        len(themes) if themes else 0,
+        len(emotions) if emotions else 0,
+    )
+    rarity = RARITIES[bisect_right(RARITY_THRESHOLDS, rand)]
     
     # Select tree type (deterministic)
     tree_type = TREE_TYPES[hash_int % len(TREE_TYPES)]
@@ -92,3 +108,137 @@ def generate_tree(entry_text: str, entry_id: int, themes: list = None, emotions:
         "display_name": display_name,
     }
 
+# Names of each type padded into one table, for lookups by array index
+_NAME_COUNTS = np.array([len(TREE_NAMES.get(t, ["Mystery Tree"])) for t in TREE_TYPES])
+_NAME_TABLE = [TREE_NAMES.get(t, ["Mystery Tree"]) for t in TREE_TYPES]
+
+def generate_trees(entries: List[Dict]) -> List[Dict]:
+    """
+    Generate trees for many entries at once, identical to generate_tree per entry.
+
+    Each entry is a dict with entry_id, text, and optional themes and emotions.
+    Only the MD5 digests are computed per entry; rarity, type and name
+    selection run as array operations over the hash prefixes.
+    """
+    if not entries:
+        return []
+
+    # First 6 bytes of each digest == int(hexdigest[:12], 16)
+    prefixes = b"".join(
+        hashlib.md5(_seed_key(e["entry_id"], e["text"])).digest()[:6]
+        for e in entries
+    )
+    hash_bytes = np.frombuffer(prefixes, dtype=np.uint8).reshape(-1, 6).astype(np.uint64)
+    hash_ints = np.zeros(len(entries), dtype=np.uint64)
+    for column in range(6):
+        hash_ints = (hash_ints << np.uint64(8)) | hash_bytes[:, column]
+
+    lengths = np.fromiter((len(e["text"]) for e in entries), dtype=np.int64, count=len(entries))
+    num_themes = np.fromiter((len(e.get("themes") or []) for e in entries), dtype=np.int64, count=len(entries))
+    num_emotions = np.fromiter((len(e.get("emotions") or []) for e in entries), dtype=np.int64, count=len(entries))
+
+    rolls = _rarity_roll(hash_ints, lengths, num_themes, num_emotions)
+    rarity_idx = np.searchsorted(RARITY_THRESHOLDS, rolls, side="right")
+    type_idx = (hash_ints % np.uint64(len(TREE_TYPES))).astype(np.int64)
+    name_idx = (hash_ints % _NAME_COUNTS[type_idx].astype(np.uint64)).astype(np.int64)
+
+    return [
+        {
+            "type": TREE_TYPES[t],
+            "rarity": RARITIES[r],
+            "display_name": _NAME_TABLE[t][n],
+        }
+        for t, r, n in zip(type_idx.tolist(), rarity_idx.tolist(), name_idx.tolist())
+    ]
+
+async def rebuild_trees(db, session_id: str = None, dry_run: bool = False, batch_size: int = 1000) -> Dict:
+    """
+    Regenerate the trees of all analyzed entries and rewrite the ones that differ.
+
+    Entries are read in keyset-paginated batches, with one transaction per batch.
+    Trees without a garden position are placed, as the layout read never does.
+    """
+    # garden_layout imports this module for the tree catalog
+    from app.services.garden_layout import place_new_trees
+
+    report = {"entries": 0, "changed": 0, "missing": 0}
+    last_id = 0
+    session_filter = "AND je.session_id = ?" if session_id else ""
+
+    while True:
+        params = [last_id] + ([session_id] if session_id else []) + [batch_size]
+        async with db.execute(
+            f"""
+            SELECT je.id, je.session_id, je.created_at, je.raw_text,
+                   ea.themes_json, ea.emotions_json,
+                   t.type, t.rarity, t.display_name
+            FROM journal_entries je
+            JOIN entry_analysis ea ON ea.entry_id = je.id
+            JOIN sessions s ON s.id = je.session_id
+            LEFT JOIN trees t ON t.entry_id = je.id
+            WHERE je.id > ? AND s.deleted_at IS NULL {session_filter}
+            ORDER BY je.id
+            LIMIT ?
+            """,
+            params
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        trees = generate_trees([
+            {
+                "entry_id": row[0],
+                "text": row[3],
+                "themes": json_codec.loads_or(row[4], []),
+                "emotions": json_codec.loads_or(row[5], []),
+            }
+            for row in rows
+        ])
+
+        updates = []
+        moved = []
+        for row, tree in zip(rows, trees):
+            if row[6] is None:
+                report["missing"] += 1
+                moved.append(row[0])
+            elif (row[6], row[7], row[8]) == (tree["type"], tree["rarity"], tree["display_name"]):
+                continue
+            else:
+                report["changed"] += 1
+                if (row[6], row[7]) != (tree["type"], tree["rarity"]):
+                    moved.append(row[0])
+            updates.append((row[0], row[1], timestamps.to_utc_iso(row[2]), tree["type"], tree["rarity"], tree["display_name"]))
+        report["entries"] += len(rows)
+
+        if dry_run:
+            continue
+        if updates:
+            await db.executemany(
+                """
+                INSERT INTO trees (entry_id, session_id, created_at, type, rarity, display_name)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (entry_id) DO UPDATE SET
+                    type = excluded.type, rarity = excluded.rarity, display_name = excluded.display_name
+                """,
+                updates
+            )
+            # Trees that changed type or rarity move to another grove and are re-placed there,
+            # which records them in the change log; the rest are recorded directly
+            if moved:
+                placeholders = ",".join("?" * len(moved))
+                await db.execute(f"DELETE FROM garden_layout WHERE entry_id IN ({placeholders})", moved)
+            moved_ids = set(moved)
+            restyled: Dict[str, List[int]] = {}
+            for update in updates:
+                if update[0] not in moved_ids:
+                    restyled.setdefault(update[1], []).append(update[0])
+            for tree_session_id, entry_ids in restyled.items():
+                await record_changes(db, tree_session_id, TREE, entry_ids)
+        # Places moved trees, and trees of older data that never had a position
+        for tree_session_id in {row[1] for row in rows}:
+            await place_new_trees(db, tree_session_id)
+        await db.commit()
+
+    return report
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cold import of the app with `python -X importtime`.
+
+Reports the slowest modules and fails if importing app.main exceeds the
+budget or pulls in a module that should only load on first use.
+Usage: python -m benchmarks.import_time [--budget-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# Heavy dependencies that must not be imported until a client is built
+LAZY_MODULES = ["chromadb", "mistralai"]
+
+def measure(target: str = "app.main") -> dict:
+    """
+    Import target in a fresh interpreter and return per-module cumulative times in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        timings[module.strip()] = int(cumulative_us)
+    return timings
+
+def run(budget_ms: int, top: int, runs: int = 3) -> bool:
+    # Take the best of several runs to smooth out disk cache effects
+    samples = [measure() for _ in range(runs)]
+    timings = min(samples, key=lambda t: t.get("app.main", 0))
+    total_ms = timings.get("app.main", 0) / 1000
+
+    print(f"{'module':<50} {'cumulative':>12}")
+    for module, cumulative_us in sorted(timings.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{module:<50} {cumulative_us / 1000:>10.1f}ms")
+
+    eager = [m for m in LAZY_MODULES if m in timings]
+    print(f"\nimport app.main: {total_ms:.1f}ms (budget {budget_ms}ms)")
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+    return total_ms <= budget_ms and not eager
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=int, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.budget_ms, args.top) else 1)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark embedding quantization on synthetic journals.
+
+Reports recall@5 against exact float32 search and the in-memory size of
+each storage mode.
+Usage: python -m benchmarks.quantization [--entries 500] [--sessions 20]
+"""
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.services.exact_index import ExactSearchIndex
+
+DIM = 1024  # mistral-embed
+K = 5
+
+def synthetic_journal(rng: np.random.Generator, num_entries: int, num_topics: int = 12):
+    """
+    Entries cluster around a handful of recurring topics, like a real journal.
+    """
+    topics = rng.normal(size=(num_topics, DIM))
+    assignments = rng.integers(0, num_topics, size=num_entries)
+    entries = topics[assignments] + 0.6 * rng.normal(size=(num_entries, DIM))
+    queries = topics[rng.integers(0, num_topics, size=20)] + 0.6 * rng.normal(size=(20, DIM))
+    return entries.astype(np.float32), queries.astype(np.float32)
+
+def run(num_sessions: int, num_entries: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    journals = [synthetic_journal(rng, num_entries) for _ in range(num_sessions)]
+
+    with tempfile.TemporaryDirectory() as root:
+        modes = ["none", "int8", "binary"]
+        indexes = {mode: ExactSearchIndex(root=f"{root}/{mode}", quantization=mode) for mode in modes}
+
+        for session, (entries, _) in enumerate(journals):
+            for entry_id, vector in enumerate(entries):
+                for index in indexes.values():
+                    index.add(f"s{session}", entry_id, str(entry_id), vector)
+
+        print(f"{num_sessions} sessions x {num_entries} entries, dim={DIM}, recall@{K}")
+        print(f"{'mode':<8} {'recall@5':>9} {'memory':>12} {'saved':>7} {'ms/query':>9}")
+
+        baseline_memory = None
+        for mode, index in indexes.items():
+            hits, total, memory, elapsed = 0, 0, 0, 0.0
+            for session, (entries, queries) in enumerate(journals):
+                session_id = f"s{session}"
+                memory += index.memory_bytes(session_id)
+                for query in queries:
+                    truth = {entry_id for entry_id, _ in indexes["none"].search(session_id, query, limit=K)}
+                    start = time.perf_counter()
+                    found = index.search(session_id, query, limit=K)
+                    elapsed += time.perf_counter() - start
+                    hits += len(truth & {entry_id for entry_id, _ in found})
+                    total += K
+
+            baseline_memory = baseline_memory or memory
+            saved = 1 - memory / baseline_memory
+            num_queries = total // K
+            print(
+                f"{mode:<8} {hits / total:>9.3f} {memory / 1e6:>10.2f}MB "
+                f"{saved:>6.0%} {1000 * elapsed / num_queries:>9.3f}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=500)
+    args = parser.parse_args()
+    run(args.sessions, args.entries)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark scoring a session's cached memories for one retrieval.
+
+Fills a candidate cache with synthetic memories and their embeddings and
+times the blended scoring pass (similarity of the closest candidates,
+recency, themes, threads) and top-k selection.
+Usage: python -m benchmarks.retrieval [--memories 1000] [--dim 1024] [--runs 200]
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+from app.services.retrieval import Memory, SessionMemories, RELEVANT_MEMORIES, RECENT_MEMORIES, RETRIEVAL_SIMILAR_CANDIDATES
+import app.services.retrieval as retrieval
+
+THEMES = ["work", "family", "rest", "sleep", "friends", "health", "money", "school", "creativity", "change"]
+
+def synthetic_memories(num_memories: int, dim: int, seed: int = 7):
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).standard_normal((num_memories + 1, dim)).astype(np.float32)
+    memories = [
+        Memory(
+            entry_id=entry_id,
+            summary=f"memory {entry_id}",
+            day=730000 + entry_id // 2,
+            themes=rng.sample(THEMES, rng.randint(1, 4)),
+            thread_ids=tuple(rng.sample(range(20), rng.randint(0, 2))),
+            embedding=vectors[entry_id - 1],
+        )
+        for entry_id in range(1, num_memories + 1)
+    ]
+    query = Memory(
+        entry_id=num_memories + 1,
+        summary="query",
+        day=730000 + num_memories // 2,
+        themes=["work", "rest"],
+        embedding=vectors[-1],
+    )
+    return memories, query
+
+def run(num_memories: int, dim: int, runs: int):
+    retrieval.RETRIEVAL_MAX_CANDIDATES = max(retrieval.RETRIEVAL_MAX_CANDIDATES, num_memories)
+    memories, query = synthetic_memories(num_memories, dim)
+    active_threads = [{"id": thread_id, "last_seen_entry_id": num_memories - thread_id} for thread_id in range(3)]
+
+    start = time.perf_counter()
+    cache = SessionMemories(seq=0)
+    for memory in memories:
+        cache.append(memory)
+    fill_seconds = time.perf_counter() - start
+
+    recent_rows = np.arange(cache.size - RECENT_MEMORIES, cache.size)
+    start = time.perf_counter()
+    for _ in range(runs):
+        scores = cache.scores(query, active_threads, recent_rows)
+        top = np.argpartition(-scores, RELEVANT_MEMORIES - 1)[:RELEVANT_MEMORIES]
+    score_seconds = (time.perf_counter() - start) / runs
+
+    print(f"{num_memories:,} memories of dim {dim}, {RETRIEVAL_SIMILAR_CANDIDATES} similarity candidates")
+    print(f"fill: {fill_seconds * 1000:.1f}ms ({fill_seconds / num_memories * 1e6:.1f}us per append)")
+    print(f"score + top-{RELEVANT_MEMORIES}: {score_seconds * 1000:.3f}ms per retrieval, best {sorted(int(cache.entry_ids[i]) for i in top)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    run(args.memories, args.dim, args.runs)
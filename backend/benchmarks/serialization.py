@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization of large gardens and stored JSON columns.
+
+"before" is the previous path: the loader builds a pydantic model, FastAPI
+validates the return value against the response model again and the
+stdlib encodes it. "after" is the current one: the loader's dict is
+encoded directly by DefaultJSONResponse. Stored columns compare stdlib
+json with json_codec.
+Usage: python -m benchmarks.serialization [--trees 20000] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.schemas.garden import GardenResponse
+from app.services import json_codec
+from app.services.json_codec import DefaultJSONResponse
+from app.services.tree_service import TREE_TYPES, TREE_NAMES, RARITIES
+
+WORDS = ["work", "family", "rest", "sleep", "friends", "health", "money", "school", "creativity", "change"]
+
+def synthetic_garden(num_trees: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    trees = []
+    for entry_id in range(1, num_trees + 1):
+        tree_type = rng.choice(TREE_TYPES)
+        trees.append({
+            "entry_id": entry_id,
+            "session_id": "5f0c7a52-8d1e-4c36-9b0b-3f6f1d2e9a41",
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T08:30:00.000000",
+            "type": tree_type,
+            "rarity": rng.choice(RARITIES),
+            "display_name": rng.choice(TREE_NAMES[tree_type]),
+        })
+    return {"streak_days": num_trees, "trees": trees}
+
+def synthetic_columns(num_rows: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "themes": rng.sample(WORDS, rng.randint(1, 5)),
+            "emotions": rng.sample(["calm", "anxious", "hopeful", "tired", "grateful"], rng.randint(1, 3)),
+            "unresolved": [" ".join(rng.choices(WORDS, k=6)) for _ in range(rng.randint(0, 3))],
+        }
+        for _ in range(num_rows)
+    ]
+
+def timed(fn, runs: int) -> tuple:
+    """Best wall time of `runs` calls and the last result"""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(num_trees: int, runs: int):
+    garden = synthetic_garden(num_trees)
+    field = create_model_field(name="Response_get_garden", type_=GardenResponse, mode="serialization")
+
+    def before() -> bytes:
+        model = GardenResponse(**garden)
+        content = asyncio.run(serialize_response(field=field, response_content=model))
+        return JSONResponse(content).body
+
+    def after() -> bytes:
+        return DefaultJSONResponse(garden).body
+
+    before_seconds, before_body = timed(before, runs)
+    after_seconds, after_body = timed(after, runs)
+    assert json.loads(before_body) == json.loads(after_body)
+
+    columns = synthetic_columns(num_trees)
+
+    def stdlib_columns() -> tuple:
+        encoded = [json.dumps(value) for row in columns for value in row.values()]
+        return encoded, [json.loads(value) for value in encoded]
+
+    def codec_columns() -> tuple:
+        encoded = [json_codec.dumps(value) for row in columns for value in row.values()]
+        return encoded, [json_codec.loads(value) for value in encoded]
+
+    stdlib_seconds, (stdlib_encoded, stdlib_decoded) = timed(stdlib_columns, runs)
+    codec_seconds, (codec_encoded, codec_decoded) = timed(codec_columns, runs)
+    assert stdlib_decoded == codec_decoded
+
+    print(f"encoder: {'orjson' if json_codec.orjson else 'stdlib json'}, {num_trees:,} trees / analysis rows, best of {runs}")
+    print(f"{'case':<28} {'ms':>9} {'bytes':>12}")
+    print(f"{'garden response (before)':<28} {before_seconds * 1000:>9.1f} {len(before_body):>12,}")
+    print(f"{'garden response (after)':<28} {after_seconds * 1000:>9.1f} {len(after_body):>12,}")
+    print(f"{'columns stdlib round trip':<28} {stdlib_seconds * 1000:>9.1f} {sum(map(len, stdlib_encoded)):>12,}")
+    print(f"{'columns codec round trip':<28} {codec_seconds * 1000:>9.1f} {sum(map(len, codec_encoded)):>12,}")
+    print(f"response speedup: {before_seconds / after_seconds:.1f}x, column speedup: {stdlib_seconds / codec_seconds:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trees", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.trees, args.runs)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched tree generation against per-entry generation.
+
+Checks that both produce identical trees and reports throughput.
+Usage: python -m benchmarks.trees [--entries 100000]
+"""
+
+import argparse
+import random
+import time
+from app.services.tree_service import generate_tree, generate_trees
+
+WORDS = ["today", "work", "walk", "tired", "friend", "rain", "coffee", "quiet", "deadline", "hope"]
+
+def synthetic_entries(num_entries: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        {
+            "entry_id": entry_id,
+            "text": " ".join(rng.choices(WORDS, k=rng.randint(5, 150))),
+            "themes": ["theme"] * rng.randint(0, 6),
+            "emotions": ["emotion"] * rng.randint(0, 4),
+        }
+        for entry_id in range(1, num_entries + 1)
+    ]
+
+def run(num_entries: int):
+    entries = synthetic_entries(num_entries)
+
+    start = time.perf_counter()
+    single = [generate_tree(e["text"], e["entry_id"], e["themes"], e["emotions"]) for e in entries]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = generate_trees(entries)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"{'mode':<10} {'seconds':>9} {'entries/s':>12}")
+    print(f"{'single':<10} {single_seconds:>9.3f} {num_entries / single_seconds:>12,.0f}")
+    print(f"{'batched':<10} {batch_seconds:>9.3f} {num_entries / batch_seconds:>12,.0f}")
+    print(f"speedup: {single_seconds / batch_seconds:.1f}x, identical: {single == batched}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.entries)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Script to bulk import a journal export into a session.
+Usage: python import_journal.py EXPORT_FILE --session SESSION_ID [--format jsonl|markdown]
+       python import_journal.py --resume JOB_ID
+"""
+
+import argparse
+import asyncio
+from app.db.database import connect, init_db
+from app.services.import_service import create_import, get_job, process_import
+from app.services.chroma_service import chroma_service
+
+async def report_progress(job_id: str, task: asyncio.Task):
+    async with connect() as db:
+        while not task.done():
+            job = await get_job(db, job_id)
+            print(f"{job['status']}: {job['processed']}/{job['total']} processed, {job['failed']} failed")
+            await asyncio.wait([task], timeout=2)
+        job = await get_job(db, job_id)
+        print(f"{job['status']}: {job['processed']}/{job['total']} processed, {job['failed']} failed")
+
+async def main(args):
+    await init_db()
+    chroma_service.init()
+
+    # A resumed job may have been left running by a process that died
+    job_id = args.resume
+    if not job_id:
+        async with connect() as db:
+            with open(args.file, encoding="utf-8") as f:
+                job = await create_import(db, args.session, f, args.format)
+        job_id = job["id"]
+        print(f"Created import {job_id} with {job['total']} entries")
+
+    task = asyncio.create_task(process_import(job_id, reclaim=bool(args.resume)))
+    await report_progress(job_id, task)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import journal entries")
+    parser.add_argument("file", nargs="?", help="JSONL or Markdown export")
+    parser.add_argument("--session", help="Session to import into")
+    parser.add_argument("--format", default="jsonl", choices=["jsonl", "markdown"])
+    parser.add_argument("--resume", help="Resume an existing import job, taking it over if a stopped process left it running")
+    args = parser.parse_args()
+
+    if not args.resume and not (args.file and args.session):
+        parser.error("EXPORT_FILE and --session are required unless --resume is given")
+
+    asyncio.run(main(args))
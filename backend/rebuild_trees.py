@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script to regenerate the trees table from entries and their analyses.
+Usage: python rebuild_trees.py [--session SESSION_ID] [--dry-run]
+
+Trees are deterministic, so this only rewrites rows that differ, e.g.
+after a change to the rarity table or TREE_SEED.
+"""
+
+import argparse
+import asyncio
+from app.db.database import connect, init_db
+from app.services.tree_service import rebuild_trees
+
+async def main(session_id: str = None, dry_run: bool = False):
+    await init_db()
+    async with connect() as db:
+        report = await rebuild_trees(db, session_id=session_id, dry_run=dry_run)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild trees from entries")
+    parser.add_argument("--session", help="Only rebuild this session")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    args = parser.parse_args()
+
+    print("Rebuilding trees...")
+    asyncio.run(main(args.session, args.dry_run))
+    print("Rebuild complete!")
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Script to reconcile the vector index with the database.
+Usage: python reconcile.py [--session SESSION_ID] [--dry-run]
+"""
+
+import argparse
+import asyncio
+from app.db.database import connect
+from app.services.reconciler import reconcile_all
+from app.services.chroma_service import chroma_service
+
+async def main(session_id: str = None, dry_run: bool = False):
+    chroma_service.init()
+    async with connect() as db:
+        report = await reconcile_all(db, session_id=session_id, dry_run=dry_run)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile vectors with the database")
+    parser.add_argument("--session", help="Only reconcile this session")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without fixing it")
+    args = parser.parse_args()
+
+    print("Reconciling vector index...")
+    asyncio.run(main(args.session, args.dry_run))
+    print("Reconciliation complete!")
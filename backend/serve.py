@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Production server runner: several uvicorn worker processes under gunicorn.
+Usage: python serve.py [--workers N] [--bind HOST:PORT]
+
+Set DATA_DIR (or DB_PATH / CHROMA_DB_PATH) to where the data should live,
+and CHROMA_HOST to share vectors through a Chroma server. Without
+CHROMA_HOST a single worker is run, as a local Chroma directory must not
+be opened by several processes.
+"""
+
+import argparse
+import os
+from gunicorn.app.base import BaseApplication
+from app.config import CHROMA_HOST, LLM_DRAIN_TIMEOUT_SECONDS
+
+class JournalForestServer(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Imported in each worker after fork, so every process builds its own
+        # SQLite connections, Chroma client and model client
+        from app.main import app
+        return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with multiple workers")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:8000"))
+    args = parser.parse_args()
+
+    workers = args.workers
+    if workers > 1 and not CHROMA_HOST:
+        print(f"CHROMA_HOST is not set, running 1 worker instead of {workers}: a local Chroma directory is not safe to share between processes")
+        workers = 1
+
+    JournalForestServer({
+        "bind": args.bind,
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        # Never load the app in the master: clients must not be shared across fork
+        "preload_app": False,
+        # Time for in-flight requests, then model calls of background work, to finish
+        "graceful_timeout": int(LLM_DRAIN_TIMEOUT_SECONDS) + 30,
+        "timeout": 120,
+        "loglevel": "info",
+    }).run()
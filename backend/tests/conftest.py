@@ -0,0 +1,56 @@
+"""
+Storage fixtures. Every test runs against SQLite, and against Postgres too
+when TEST_DATABASE_URL points at a database the tests may write to.
+"""
+
+import os
+import uuid
+import pytest
+from app.db import database
+from app.routes import home
+from app.db.sqlite import SQLiteBackend
+from app.services import change_log, deletion_service, digest_service, timestamps
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(params=["sqlite", "postgres"])
+async def backend(request, tmp_path, monkeypatch):
+    """An initialized backend that the app's connections and dialect point at"""
+    if request.param == "sqlite":
+        backend = SQLiteBackend(tmp_path / "journal.db")
+    else:
+        if not TEST_DATABASE_URL:
+            pytest.skip("TEST_DATABASE_URL is not set")
+        from app.db.postgres import PostgresBackend, asyncpg
+        if asyncpg is None:
+            pytest.skip("asyncpg is not installed")
+        backend = PostgresBackend(TEST_DATABASE_URL)
+    monkeypatch.setattr(database, "backend", backend)
+    for module in (database, home, change_log, deletion_service, digest_service):
+        monkeypatch.setattr(module, "dialect", backend.dialect)
+    monkeypatch.setattr(digest_service, "WEEK_START_SQL", backend.dialect.week_start("je.created_at_epoch"))
+    monkeypatch.setattr(deletion_service, "SESSION_TOMBSTONE_POLL_SECONDS", 0)
+    await backend.init()
+    yield backend
+    await backend.close()
+
+@pytest.fixture
+async def session_id(backend):
+    """A new session, purged with everything it owns afterwards"""
+    session_id = f"storage-test-{uuid.uuid4()}"
+    now = timestamps.now_iso()
+    async with backend.connect() as db:
+        await db.execute(
+            "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)",
+            (session_id, now, now)
+        )
+        await db.commit()
+    yield session_id
+    async with backend.connect() as db:
+        await db.execute("UPDATE sessions SET deleted_at = ? WHERE id = ?", (timestamps.now_iso(), session_id))
+        await db.commit()
+    await deletion_service.purge_session(session_id)
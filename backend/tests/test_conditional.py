@@ -0,0 +1,45 @@
+"""
+Conditional GETs on every storage backend.
+"""
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from app.db import database
+from app.middleware.conditional import ConditionalMiddleware
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def connections(backend, monkeypatch):
+    """Connections opened through the backend, counted"""
+    opened = []
+    connect = backend.connect
+
+    def counted_connect(*args, **kwargs):
+        opened.append(kwargs)
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(backend, "connect", counted_connect)
+    return opened
+
+async def test_one_connection_per_request(backend, session_id, connections):
+    app = FastAPI()
+
+    @app.get("/api/num_entries")
+    async def num_entries(session_id: str, db=Depends(database.get_db)):
+        async with db.execute("SELECT COUNT(*) FROM journal_entries WHERE session_id = ?", (session_id,)) as cursor:
+            return {"num_entries": (await cursor.fetchone())[0]}
+
+    app.add_middleware(ConditionalMiddleware, version="test")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/num_entries", params={"session_id": session_id})
+        assert len(connections) == 1
+        cached = await client.get(
+            "/api/num_entries",
+            params={"session_id": session_id},
+            headers={"if-none-match": response.headers["etag"]}
+        )
+    assert response.json() == {"num_entries": 0}
+    assert cached.status_code == 304
+    assert len(connections) == 2
@@ -0,0 +1,94 @@
+"""
+Garden layout placement on every storage backend.
+"""
+
+import asyncio
+import pytest
+from app.services import change_log
+from app.services.garden_layout import load_layout, place_new_trees, tree_position
+
+pytestmark = pytest.mark.anyio
+
+async def _plant(db, session_id: str, trees):
+    """Entries with a tree each, from (type, rarity, created_at), returning their IDs"""
+    entry_ids = []
+    for tree_type, rarity, created_at in trees:
+        async with db.execute(
+            "INSERT INTO journal_entries (session_id, created_at, raw_text) VALUES (?, ?, '') RETURNING id",
+            (session_id, created_at)
+        ) as cursor:
+            entry_id = (await cursor.fetchone())[0]
+        await db.execute(
+            """
+            INSERT INTO trees (entry_id, session_id, created_at, type, rarity, display_name)
+            VALUES (?, ?, ?, ?, ?, '')
+            """,
+            (entry_id, session_id, created_at, tree_type, rarity)
+        )
+        entry_ids.append(entry_id)
+    await db.commit()
+    return entry_ids
+
+async def _layout(db, session_id: str):
+    async with db.execute(
+        "SELECT entry_id, grove, slot, x, y FROM garden_layout WHERE session_id = ?",
+        (session_id,)
+    ) as cursor:
+        return {row[0]: tuple(row[1:]) for row in await cursor.fetchall()}
+
+async def test_groves_split_by_type_rarity_and_period(backend, session_id):
+    async with backend.connect() as db:
+        same, other_rarity, other_type, same_again, later = await _plant(db, session_id, [
+            ("oak", "common", "2026-01-05T10:00:00+00:00"),
+            ("oak", "rare", "2026-01-06T10:00:00+00:00"),
+            ("pine", "common", "2026-01-07T10:00:00+00:00"),
+            ("oak", "common", "2026-02-20T10:00:00+00:00"),
+            ("oak", "common", "2026-04-02T10:00:00+00:00"),
+        ])
+        assert await place_new_trees(db, session_id) == 5
+        await db.commit()
+        layout = await _layout(db, session_id)
+    assert layout[same][:2] == (0, 0)
+    assert layout[same_again][:2] == (0, 1)
+    assert [layout[entry_id][0] for entry_id in (other_rarity, other_type, later)] == [1, 2, 3]
+    for grove, slot, x, y in layout.values():
+        assert (x, y) == tree_position(grove, slot)
+
+async def test_planting_never_moves_trees(backend, session_id):
+    async with backend.connect() as db:
+        await _plant(db, session_id, [("oak", "common", "2026-01-05T10:00:00+00:00")] * 3)
+        await place_new_trees(db, session_id)
+        await db.commit()
+        before = await _layout(db, session_id)
+        [entry_id] = await _plant(db, session_id, [("oak", "common", "2026-01-09T10:00:00+00:00")])
+        assert await place_new_trees(db, session_id) == 1
+        await db.commit()
+        after = await _layout(db, session_id)
+    assert {key: after[key] for key in before} == before
+    assert after[entry_id][:2] == (0, 3)
+
+async def test_concurrent_backfills_place_each_tree_once(backend, session_id):
+    async with backend.connect() as db:
+        entry_ids = await _plant(db, session_id, [("birch", "common", "2026-01-05T10:00:00+00:00")] * 4)
+        since = await change_log.current_seq(db, session_id)
+
+    async def backfill():
+        async with backend.connect() as db:
+            placed = await place_new_trees(db, session_id)
+            await db.commit()
+            return placed
+
+    placed = await asyncio.gather(backfill(), backfill())
+    async with backend.connect() as db:
+        layout = await _layout(db, session_id)
+        changed, _, _ = await change_log.changes_since(db, session_id, since, 100)
+    assert sum(placed) == len(entry_ids)
+    assert sorted(layout) == entry_ids
+    assert set(changed[change_log.TREE]) == {str(entry_id) for entry_id in entry_ids}
+
+async def test_layout_read_never_places(backend, session_id):
+    async with backend.connect() as db:
+        await _plant(db, session_id, [("oak", "common", "2026-01-05T10:00:00+00:00")])
+        layout = await load_layout(db, session_id)
+        assert await _layout(db, session_id) == {}
+    assert layout["total"] == 0
@@ -0,0 +1,43 @@
+"""
+The combined home screen on every storage backend.
+"""
+
+import pytest
+from app.routes.home import get_home
+from app.services import json_codec, timestamps
+
+pytestmark = pytest.mark.anyio
+
+async def _home(db, session_id: str, window=None):
+    response = await get_home(session_id=session_id, fields="prompts,trends", window=window or timestamps.window(), db=db)
+    return json_codec.loads(response.body)
+
+async def test_default_prompts_without_onboarding(backend, session_id):
+    async with backend.connect() as db:
+        home = await _home(db, session_id)
+    assert home["prompts"]["prompts"]
+    assert home["prompts"]["active_threads"] == []
+
+async def test_trends_use_requested_window(backend, session_id):
+    created_at = "2026-01-05T23:30:00+00:00"
+    async with backend.connect() as db:
+        async with db.execute(
+            "INSERT INTO journal_entries (session_id, created_at, created_at_epoch, raw_text) VALUES (?, ?, ?, '') RETURNING id",
+            (session_id, created_at, int(timestamps.parse(created_at).timestamp()))
+        ) as cursor:
+            entry_id = (await cursor.fetchone())[0]
+        await db.execute(
+            """
+            INSERT INTO entry_analysis (
+                entry_id, memory_summary, patterns_reflection, follow_up_question,
+                themes_json, emotions_json, unresolved_json
+            )
+            VALUES (?, '', '', '', '["work"]', '[]', '[]')
+            """,
+            (entry_id,)
+        )
+        await db.commit()
+        utc = await _home(db, session_id, timestamps.window("2026-01-05", "2026-01-05", None, "UTC"))
+        auckland = await _home(db, session_id, timestamps.window("2026-01-05", "2026-01-05", None, "Pacific/Auckland"))
+    assert utc["trends"]["theme_counts"] == {"work": 1}
+    assert auckland["trends"]["theme_counts"] == {}
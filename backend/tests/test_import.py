@@ -0,0 +1,46 @@
+"""
+Bulk import writes on every storage backend.
+"""
+
+import pytest
+from app.services import change_log, import_service
+
+pytestmark = pytest.mark.anyio
+
+ANALYSIS = {
+    "memory_summary": "summary",
+    "patterns_reflection": "",
+    "follow_up_question": "",
+    "themes": ["work"],
+    "emotions": ["calm"],
+    "unresolved": [],
+}
+
+def _line(day: int) -> str:
+    return f'{{"text": "entry {day}", "created_at": "2026-01-0{day}T10:00:00+00:00"}}\n'
+
+async def test_failed_parse_deletes_synced_entries(backend, session_id, monkeypatch):
+    # The first batch is committed before the bad line is parsed
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    async with backend.connect() as db:
+        since = await change_log.current_seq(db, session_id)
+        with pytest.raises(ValueError):
+            await import_service.create_import(db, session_id, [_line(1), _line(2), _line(3), "not json\n"], "jsonl")
+        changed, _, _ = await change_log.changes_since(db, session_id, since, 100)
+        async with db.execute("SELECT COUNT(*) FROM journal_entries WHERE session_id = ?", (session_id,)) as cursor:
+            left = (await cursor.fetchone())[0]
+    assert left == 0
+    assert list(changed[change_log.ENTRY].values()) == ["delete", "delete"]
+
+async def test_streak_day_is_utc(backend, session_id):
+    created_at = "2026-01-05T22:30:00-05:00"
+    async with backend.connect() as db:
+        async with db.execute(
+            "INSERT INTO journal_entries (session_id, created_at, raw_text) VALUES (?, ?, 'entry') RETURNING id",
+            (session_id, created_at)
+        ) as cursor:
+            entry_id = (await cursor.fetchone())[0]
+        await import_service._store_analysis(db, (entry_id, session_id, created_at, "entry"), ANALYSIS, [])
+        async with db.execute("SELECT day FROM streak_days WHERE session_id = ?", (session_id,)) as cursor:
+            days = [row[0] for row in await cursor.fetchall()]
+    assert days == ["2026-01-06"]
@@ -0,0 +1,31 @@
+"""
+Fallbacks for model answers that don't parse.
+"""
+
+from types import SimpleNamespace
+import pytest
+from app.services import llm_service
+
+@pytest.fixture
+def unparsed_answers(monkeypatch):
+    """A model that answers every chat.parse call without structured output"""
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=None))])
+    client = SimpleNamespace(chat=SimpleNamespace(parse=lambda **kwargs: response))
+    monkeypatch.setattr(llm_service, "get_mistral_client", lambda: client)
+
+def test_entry_analysis_falls_back(unparsed_answers):
+    analysis = llm_service.analyze_entry("Long day at work, slept badly")
+    assert analysis["memory_summary"]
+    with pytest.raises(llm_service.LLMParseError):
+        llm_service.analyze_entry("Long day at work, slept badly", fallback=False)
+
+def test_onboarding_falls_back(unparsed_answers):
+    analysis = llm_service.analyze_brain_dump("Work, sleep and moving house")
+    assert analysis["starter_prompts"]
+    assert analysis["threads"] == []
+
+def test_prompts_and_digests_raise(unparsed_answers):
+    with pytest.raises(llm_service.LLMParseError):
+        llm_service.generate_prompts("Long day at work")
+    with pytest.raises(llm_service.LLMParseError):
+        llm_service.summarize_period("week", "week of 2026-01-05", [])
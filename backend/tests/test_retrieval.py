@@ -0,0 +1,97 @@
+"""
+Memory retrieval from the cached candidates on every storage backend.
+"""
+
+import pytest
+from app.services import change_log, retrieval, timestamps
+from app.services.retrieval import Memory, MemoryIndex
+
+pytestmark = pytest.mark.anyio
+
+DIM = 4
+
+def _vector(i: int):
+    vector = [0.0] * DIM
+    vector[i % DIM] = 1.0
+    return vector
+
+async def _add_memory(db, session_id: str, summary: str) -> int:
+    now = timestamps.now_iso()
+    async with db.execute(
+        "INSERT INTO journal_entries (session_id, created_at, raw_text) VALUES (?, ?, '') RETURNING id",
+        (session_id, now)
+    ) as cursor:
+        entry_id = (await cursor.fetchone())[0]
+    await db.execute(
+        """
+        INSERT INTO entry_analysis (
+            entry_id, memory_summary, patterns_reflection, follow_up_question,
+            themes_json, emotions_json, unresolved_json
+        )
+        VALUES (?, ?, '', '', '[]', '[]', '[]')
+        """,
+        (entry_id, summary)
+    )
+    await change_log.record_change(db, session_id, change_log.ENTRY, entry_id)
+    await db.commit()
+    return entry_id
+
+@pytest.fixture
+def stored_embeddings(monkeypatch):
+    """Embeddings the vector backend holds, with a log of the entries asked for"""
+    stored, requested = {}, []
+
+    def get_embeddings(session_id, entry_ids):
+        requested.append(sorted(entry_ids))
+        return {entry_id: stored[entry_id] for entry_id in entry_ids if entry_id in stored}
+
+    def search_similar(*args, **kwargs):
+        raise AssertionError("retrieval searched the vector backend")
+
+    monkeypatch.setattr(retrieval.chroma_service, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(retrieval.chroma_service, "search_similar", search_similar)
+    return stored, requested
+
+async def test_scores_cached_embeddings(backend, session_id, stored_embeddings):
+    stored, requested = stored_embeddings
+    index = MemoryIndex()
+    async with backend.connect() as db:
+        entry_ids = [await _add_memory(db, session_id, f"memory {i}") for i in range(3)]
+        for i, entry_id in enumerate(entry_ids):
+            stored[entry_id] = _vector(i)
+
+        query = Memory(entry_id=entry_ids[-1] + 100, summary="query", day=0, themes=[], embedding=_vector(1))
+        result = await index.retrieve(db, session_id, query, [], recent=1, limit=1)
+        assert result["relevant_memories"] == ["memory 1"]
+
+        # Only entries new to the cache are looked up
+        [new_id] = [await _add_memory(db, session_id, "memory 3")]
+        stored[new_id] = _vector(3)
+        query = Memory(entry_id=new_id + 100, summary="query", day=0, themes=[], embedding=_vector(3))
+        result = await index.retrieve(db, session_id, query, [], recent=1, limit=1)
+    assert result["relevant_memories"] == ["memory 3"]
+    assert requested == [entry_ids, [new_id]]
+
+async def test_thread_links_follow_change_log(backend, session_id, stored_embeddings):
+    index = MemoryIndex()
+    async with backend.connect() as db:
+        first, second = [await _add_memory(db, session_id, f"memory {i}") for i in range(2)]
+        now = timestamps.now_iso()
+        async with db.execute(
+            """
+            INSERT INTO threads (session_id, thread, status, created_at, updated_at, last_seen_entry_id)
+            VALUES (?, 'sleep', 'active', ?, ?, ?)
+            RETURNING id
+            """,
+            (session_id, now, now, first)
+        ) as cursor:
+            thread_id = (await cursor.fetchone())[0]
+        await db.commit()
+        memories = await index._sync(db, session_id)
+        assert memories.thread_rows[thread_id] == [memories.rows[first]]
+
+        await db.execute("UPDATE threads SET last_seen_entry_id = ? WHERE id = ?", (second, thread_id))
+        await change_log.record_change(db, session_id, change_log.THREAD, thread_id)
+        await db.commit()
+        memories = await index._sync(db, session_id)
+    assert memories.thread_rows[thread_id] == [memories.rows[first], memories.rows[second]]
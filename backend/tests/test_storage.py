@@ -0,0 +1,244 @@
+"""
+Behaviour the app expects of every storage backend.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from app.db import postgres
+from app.db.database import get_db
+from app.db.sqlite import SQLiteBackend
+from app.services import change_log, deletion_service, digest_service, timestamps
+from app.services.digest_service import _pending_weeks, _week_start
+
+pytestmark = pytest.mark.anyio
+
+# Entries written by a test, enough for more than one purge chunk
+NUM_ENTRIES = deletion_service.PURGE_CHUNK_SIZE + 20
+FIRST_ENTRY_AT = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+
+async def _scalar(db, sql: str, params: tuple = ()):
+    async with db.execute(sql, params) as cursor:
+        row = await cursor.fetchone()
+    return row[0] if row else None
+
+async def _add_entries(db, session_id: str, count: int = NUM_ENTRIES):
+    """Entries six hours apart, returning their IDs"""
+    entry_ids = []
+    for i in range(count):
+        created_at = FIRST_ENTRY_AT + timedelta(hours=6 * i)
+        async with db.execute(
+            """
+            INSERT INTO journal_entries (session_id, created_at, created_at_epoch, prompt_used, raw_text)
+            VALUES (?, ?, ?, ?, ?)
+            RETURNING id
+            """,
+            (session_id, created_at.isoformat(), int(created_at.timestamp()), None, f"entry {i}")
+        ) as cursor:
+            entry_ids.append((await cursor.fetchone())[0])
+    await db.commit()
+    return entry_ids
+
+async def _add_analyses(db, entry_ids):
+    await db.executemany(
+        """
+        INSERT INTO entry_analysis (
+            entry_id, memory_summary, patterns_reflection, follow_up_question,
+            themes_json, emotions_json, unresolved_json
+        )
+        VALUES (?, ?, '', '', '[]', '[]', '[]')
+        """,
+        [(entry_id, f"summary {entry_id}") for entry_id in entry_ids]
+    )
+    await db.commit()
+
+async def _columns(backend, db, table: str):
+    if backend.name == "postgres":
+        sql = "SELECT column_name FROM information_schema.columns WHERE table_name = ?"
+    else:
+        sql = "SELECT name FROM pragma_table_info(?)"
+    async with db.execute(sql, (table,)) as cursor:
+        return {row[0] for row in await cursor.fetchall()}
+
+async def test_init_is_idempotent(backend):
+    await backend.init()
+    await backend.init()
+
+async def test_schema_matches_sqlite(backend, tmp_path):
+    reference = SQLiteBackend(tmp_path / "reference.db")
+    await reference.init()
+    async with reference.connect() as db:
+        async with db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ) as cursor:
+            tables = [row[0] for row in await cursor.fetchall()]
+        expected = {table: await _columns(reference, db, table) for table in tables}
+    assert set(tables) == set(postgres.TABLES)
+    async with backend.connect() as db:
+        actual = {table: await _columns(backend, db, table) for table in tables}
+    assert actual == expected
+
+async def test_placeholders_skip_literals(backend, session_id):
+    async with backend.connect() as db:
+        value = await _scalar(db, "SELECT '?' || id FROM sessions WHERE id = ?", (session_id,))
+    assert value == f"?{session_id}"
+
+async def test_returning_ids_ascend(backend, session_id):
+    async with backend.connect(foreign_keys=True) as db:
+        entry_ids = await _add_entries(db, session_id)
+    assert len(set(entry_ids)) == NUM_ENTRIES
+    assert entry_ids == sorted(entry_ids)
+
+async def test_on_conflict_upserts(backend, session_id):
+    async with backend.connect() as db:
+        [entry_id] = await _add_entries(db, session_id, 1)
+        for display_name in ("Oak", "Birch"):
+            await db.execute(
+                """
+                INSERT INTO trees (entry_id, session_id, created_at, type, rarity, display_name)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (entry_id) DO UPDATE SET display_name = excluded.display_name
+                """,
+                (entry_id, session_id, timestamps.now_iso(), "oak", "common", display_name)
+            )
+        for _ in range(2):
+            await db.execute(
+                "INSERT INTO streak_days (session_id, day) VALUES (?, ?) ON CONFLICT DO NOTHING",
+                (session_id, "2026-01-05")
+            )
+        await db.commit()
+        display_name = await _scalar(db, "SELECT display_name FROM trees WHERE entry_id = ?", (entry_id,))
+        days = await _scalar(db, "SELECT COUNT(*) FROM streak_days WHERE session_id = ?", (session_id,))
+    assert display_name == "Birch"
+    assert days == 1
+
+async def test_blobs_round_trip(backend, session_id):
+    blob = bytes(range(256))
+    async with backend.connect() as db:
+        await db.execute(
+            """
+            INSERT INTO digests (session_id, level, period_start, summary, themes_json, emotions_json, entry_count, embedding, created_at)
+            VALUES (?, 'week', '2025-12-29', '', '[]', '{}', 0, ?, ?)
+            """,
+            (session_id, blob, timestamps.now_iso())
+        )
+        await db.commit()
+        stored = await _scalar(db, "SELECT embedding FROM digests WHERE session_id = ?", (session_id,))
+    assert bytes(stored) == blob
+
+async def test_cursor_streams_rows(backend, session_id):
+    async with backend.connect() as db:
+        entry_ids = await _add_entries(db, session_id)
+        async with db.execute(
+            "SELECT id FROM journal_entries WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ) as cursor:
+            streamed = [row[0] async for row in cursor]
+    assert streamed == entry_ids
+
+async def test_request_rows_are_named(backend, session_id):
+    dependency = get_db()
+    db = await dependency.__anext__()
+    async with db.execute("SELECT id AS session, deleted_at FROM sessions WHERE id = ?", (session_id,)) as cursor:
+        row = await cursor.fetchone()
+    await dependency.aclose()
+    assert row["session"] == session_id
+    assert row[1] is None
+
+async def test_week_start_matches_python(backend, session_id):
+    async with backend.connect() as db:
+        await _add_entries(db, session_id)
+        async with db.execute(
+            f"""
+            SELECT je.created_at_epoch, {backend.dialect.week_start("je.created_at_epoch")}
+            FROM journal_entries je
+            WHERE je.session_id = ?
+            """,
+            (session_id,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+    for epoch, week_start in rows:
+        assert week_start == _week_start(datetime.fromtimestamp(epoch, timezone.utc).date()).isoformat()
+
+async def test_close_rolls_back(backend, session_id):
+    db = await backend.connect()
+    await db.execute("UPDATE sessions SET updated_at = 'uncommitted' WHERE id = ?", (session_id,))
+    await db.close()
+    async with backend.connect() as db:
+        updated_at = await _scalar(db, "SELECT updated_at FROM sessions WHERE id = ?", (session_id,))
+    assert updated_at != "uncommitted"
+
+async def test_commits_are_visible(backend, session_id):
+    async with backend.connect() as writer, backend.connect() as reader:
+        await writer.execute("UPDATE sessions SET updated_at = 'committed' WHERE id = ?", (session_id,))
+        cursor = await writer.execute("UPDATE sessions SET updated_at = updated_at WHERE id = ?", (session_id,))
+        assert cursor.rowcount == 1
+        await writer.commit()
+        updated_at = await _scalar(reader, "SELECT updated_at FROM sessions WHERE id = ?", (session_id,))
+    assert updated_at == "committed"
+
+async def test_snapshot_ignores_later_commits(backend, session_id):
+    async with backend.connect() as reader, backend.connect() as writer:
+        await backend.dialect.begin_snapshot(reader)
+        before = await _scalar(reader, "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?", (session_id,))
+        await _add_entries(writer, session_id, 1)
+        during = await _scalar(reader, "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?", (session_id,))
+        await reader.commit()
+        after = await _scalar(reader, "SELECT COUNT(*) FROM journal_entries WHERE session_id = ?", (session_id,))
+    assert (before, during, after) == (0, 0, 1)
+
+async def test_foreign_keys_enforced(backend, session_id):
+    async with backend.connect(foreign_keys=True) as db:
+        with pytest.raises(Exception):
+            await db.execute(
+                "INSERT INTO trees (entry_id, session_id, created_at, type, rarity, display_name) VALUES (?, ?, ?, ?, ?, ?)",
+                (-1, session_id, timestamps.now_iso(), "oak", "common", "Oak")
+            )
+        await db.rollback()
+
+async def test_change_log_keeps_last_op(backend, session_id):
+    async with backend.connect() as db:
+        since = await change_log.current_seq(db, session_id)
+        await change_log.record_changes(db, session_id, change_log.ENTRY, [1, 2, 3])
+        await change_log.record_change(db, session_id, change_log.ENTRY, 2, op="delete")
+        await db.commit()
+        changed, cursor_seq, has_more = await change_log.changes_since(db, session_id, since, 10)
+    assert changed == {change_log.ENTRY: {"1": "upsert", "2": "delete", "3": "upsert"}}
+    assert cursor_seq > since
+    assert not has_more
+
+async def test_pending_digest_weeks(backend, session_id):
+    async with backend.connect() as db:
+        await _add_analyses(db, await _add_entries(db, session_id))
+        before = timestamps.midnight(_week_start(date(2026, 3, 2)), timezone.utc)
+        pending = [week for sid, week in await _pending_weeks(db, before, 1000) if sid == session_id]
+    assert pending
+    assert pending == sorted(pending)
+    assert pending[0] == "2026-01-05"
+
+async def test_failed_digest_skipped(backend, session_id, monkeypatch):
+    def summarize_period(level, period_label, items):
+        if period_label == "Week of 2026-01-05":
+            raise ValueError("unparseable answer")
+        return {"summary": period_label, "themes": []}
+
+    monkeypatch.setattr(digest_service, "summarize_period", summarize_period)
+    monkeypatch.setattr(digest_service.chroma_service, "embed_texts", lambda texts: None)
+    async with backend.connect() as db:
+        await _add_analyses(db, await _add_entries(db, session_id))
+        today = date(2026, 1, 21)
+        assert await digest_service.summarize_pending(db, today, 1) == 0
+        assert await digest_service.summarize_pending(db, today, 1) == 1
+        summaries = await _scalar(db, "SELECT summary FROM digests WHERE session_id = ?", (session_id,))
+    assert summaries == "Week of 2026-01-12"
+
+async def test_purge_removes_everything(backend, session_id):
+    async with backend.connect() as db:
+        await _add_analyses(db, await _add_entries(db, session_id))
+        await db.execute("UPDATE sessions SET deleted_at = ? WHERE id = ?", (timestamps.now_iso(), session_id))
+        await db.commit()
+    await deletion_service.purge_session(session_id)
+    async with backend.connect() as db:
+        for table in ("sessions", "journal_entries", "trees", "digests", "change_log", "streak_days"):
+            column = "id" if table == "sessions" else "session_id"
+            left = await _scalar(db, f"SELECT COUNT(*) FROM {table} WHERE {column} = ?", (session_id,))
+            assert left == 0, table
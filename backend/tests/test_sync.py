@@ -0,0 +1,62 @@
+"""
+Delta sync reads on every storage backend.
+"""
+
+import pytest
+from app.db import queries
+from app.services import change_log, timestamps
+
+pytestmark = pytest.mark.anyio
+
+async def _add_entries(db, session_id: str, count: int, import_job_id: str = None):
+    entry_ids = []
+    for i in range(count):
+        async with db.execute(
+            "INSERT INTO journal_entries (session_id, created_at, raw_text, import_job_id) VALUES (?, ?, ?, ?) RETURNING id",
+            (session_id, timestamps.now_iso(), f"entry {i}", import_job_id)
+        ) as cursor:
+            entry_ids.append((await cursor.fetchone())[0])
+    return entry_ids
+
+async def test_sync_returns_changed_rows(backend, session_id):
+    async with backend.connect() as db:
+        await queries.SAVE_PROMPT_SET.run(db, session_id, timestamps.now_iso(), "onboarding", '["onboarding"]')
+        await change_log.record_change(db, session_id, change_log.PROMPTS, "onboarding")
+        await db.commit()
+        since = await change_log.current_seq(db, session_id)
+
+        # More than one IN batch
+        entry_ids = await _add_entries(db, session_id, queries.IN_BATCH_SIZE + 3)
+        imported = await _add_entries(db, session_id, 2, import_job_id="job-1")
+        await queries.SAVE_PROMPT_SET.run(db, session_id, timestamps.now_iso(), "generated", '["generated"]')
+        await change_log.record_changes(db, session_id, change_log.ENTRY, entry_ids)
+        await change_log.record_change(db, session_id, change_log.IMPORT, "job-1")
+        await change_log.record_change(db, session_id, change_log.PROMPTS, "generated")
+        await db.commit()
+        sync = await change_log.load_sync(db, session_id, since, 1000)
+        full = await change_log.load_sync(db, session_id, 0, 1000)
+
+    assert [entry["entry_id"] for entry in sync["entries"]] == entry_ids + imported
+    assert sync["prompts"] == {"generated": ["generated"]}
+    assert not sync["full"] and not sync["has_more"]
+    assert len(full["entries"]) == len(entry_ids) + len(imported)
+    assert set(full["prompts"]) == {"onboarding", "generated"}
+    assert full["cursor"] == sync["cursor"]
+
+async def test_sync_ignores_other_sessions_imports(backend, session_id):
+    other_session_id = f"other-{session_id}"
+    now = timestamps.now_iso()
+    async with backend.connect() as db:
+        await db.execute("INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?)", (other_session_id, now, now))
+        await _add_entries(db, other_session_id, 1, import_job_id="job-elsewhere")
+        await change_log.record_change(db, session_id, change_log.PROMPTS, "onboarding")
+        await db.commit()
+        since = await change_log.current_seq(db, session_id)
+        await change_log.record_change(db, session_id, change_log.IMPORT, "job-elsewhere")
+        await db.commit()
+        sync = await change_log.load_sync(db, session_id, since, 1000)
+
+        await db.execute("DELETE FROM journal_entries WHERE session_id = ?", (other_session_id,))
+        await db.execute("DELETE FROM sessions WHERE id = ?", (other_session_id,))
+        await db.commit()
+    assert sync["entries"] == []
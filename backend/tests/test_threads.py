@@ -0,0 +1,36 @@
+"""
+Thread upserts on every storage backend.
+"""
+
+import pytest
+from app.services import timestamps
+from app.services.thread_service import upsert_threads
+
+pytestmark = pytest.mark.anyio
+
+async def _add_thread(db, session_id: str, thread: str, status: str) -> int:
+    now = timestamps.now_iso()
+    async with db.execute(
+        "INSERT INTO threads (session_id, thread, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?) RETURNING id",
+        (session_id, thread, status, now, now)
+    ) as cursor:
+        thread_id = (await cursor.fetchone())[0]
+    await db.commit()
+    return thread_id
+
+async def test_matches_open_threads_only(backend, session_id):
+    async with backend.connect() as db:
+        snoozed = await _add_thread(db, session_id, "sleep", "snoozed")
+        resolved = await _add_thread(db, session_id, "moving", "resolved")
+        threads = await upsert_threads(db, session_id, ["Sleep", "moving"], item_vectors=[None, None])
+        await db.commit()
+    assert threads[0]["id"] == snoozed and threads[0]["status"] == "active"
+    assert threads[1]["id"] not in (snoozed, resolved)
+
+async def test_caller_commits(backend, session_id):
+    async with backend.connect() as db:
+        await upsert_threads(db, session_id, ["sleep"], item_vectors=[None])
+        await db.rollback()
+        async with db.execute("SELECT COUNT(*) FROM threads WHERE session_id = ?", (session_id,)) as cursor:
+            left = (await cursor.fetchone())[0]
+    assert left == 0
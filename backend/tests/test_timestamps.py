@@ -0,0 +1,17 @@
+"""
+Calendar windows.
+"""
+
+import time
+from app.services import timestamps
+
+def test_windows_default_to_utc(monkeypatch):
+    # A server far from UTC must not shift windows requested without tz
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        assert timestamps.window("2026-01-05", "2026-01-05") == timestamps.window("2026-01-05", "2026-01-05", None, "UTC")
+        assert timestamps.window(week="2026-W02") == timestamps.window(week="2026-W02", tz="UTC")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -41,11 +41,10 @@ export default function Main() {
     
     try {
       setIsLoadingPrompts(true)
-      const nEntries = await apiClient.getNumEntries(sessionId)
-      setNumEntries(nEntries.num_entries)
-      const response = await apiClient.getTodayPrompts(sessionId)
-      setPrompts(response.prompts)
-      setThreads(response.active_threads)
+      const home = await apiClient.getHome(sessionId, ['num_entries', 'prompts'])
+      setNumEntries(home.num_entries ?? 0)
+      setPrompts(home.prompts?.prompts ?? [])
+      setThreads(home.prompts?.active_threads ?? [])
     } catch (error) {
       console.error('Failed to load prompts:', error)
     } finally {
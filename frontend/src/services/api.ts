@@ -80,6 +80,83 @@ export interface GardenResponse {
   trees: Tree[]
 }
 
+// Columnar layout; entry_ids and days are delta-encoded, types/rarities/names index into the catalog
+export interface GardenLayoutResponse {
+  version: number
+  total: number
+  count: number
+  entry_ids: number[]
+  x: number[]
+  y: number[]
+  types: number[]
+  rarities: number[]
+  names: number[]
+  days: number[]
+}
+
+export interface GardenCatalog {
+  types: string[]
+  rarities: Tree['rarity'][]
+  names: string[][]
+  tree_spacing: number
+  grove_spacing: number
+}
+
+export interface SyncEntry {
+  entry_id: number
+  created_at: string
+  prompt_used?: string | null
+  memory_summary?: string | null
+  patterns_reflection?: string | null
+  follow_up_question?: string | null
+  themes: string[]
+  emotions: string[]
+}
+
+// Rows changed after a cursor; when full is set the whole session was sent
+export interface SyncResponse {
+  cursor: number
+  has_more: boolean
+  full: boolean
+  entries: SyncEntry[]
+  trees: (Tree & { x: number | null; y: number | null })[]
+  threads: Thread[]
+  prompts: Record<string, Prompt[]>
+  deleted: { kind: string; ref: string }[]
+}
+
+export interface PlacedTree {
+  entry_id: number
+  x: number
+  y: number
+  type: string
+  rarity: Tree['rarity']
+  display_name: string
+  day: number
+}
+
+// Expand a layout response into one object per tree
+export function decodeGardenLayout(layout: GardenLayoutResponse, catalog: GardenCatalog): PlacedTree[] {
+  const trees: PlacedTree[] = []
+  let entryId = 0
+  let day = 0
+  for (let i = 0; i < layout.count; i++) {
+    entryId += layout.entry_ids[i]
+    day += layout.days[i]
+    const type = catalog.types[layout.types[i]] ?? 'unknown'
+    trees.push({
+      entry_id: entryId,
+      x: layout.x[i],
+      y: layout.y[i],
+      type,
+      rarity: catalog.rarities[layout.rarities[i]] ?? 'common',
+      display_name: catalog.names[layout.types[i]]?.[layout.names[i]] ?? 'Mystery Tree',
+      day,
+    })
+  }
+  return trees
+}
+
 export interface ThreadUpdateRequest {
   status: 'active' | 'snoozed' | 'resolved'
 }
@@ -97,6 +174,46 @@ export interface WeeklyInsightsResponse {
   emotions_summary: Record<string, number>
 }
 
+// Calendar window of trends and weekly insights; the last 7 days when omitted.
+// from/to are ISO dates or datetimes (a "to" date includes that day), week is an ISO week like "2026-W42"
+export interface TimeWindow {
+  from?: string
+  to?: string
+  week?: string
+  tz?: string
+}
+
+const LOCAL_TIME_ZONE = Intl.DateTimeFormat().resolvedOptions().timeZone
+
+export interface HomeResponse {
+  num_entries?: number
+  prompts?: TodayPromptsResponse
+  garden?: GardenResponse
+  trends?: TrendsResponse
+}
+
+export type HomeField = 'num_entries' | 'prompts' | 'garden' | 'trends'
+
+// Pushed on /api/ws; "hello" carries the sync cursor at connect time
+export type SessionEvent =
+  | { type: 'hello'; data: { cursor: number } }
+  | { type: 'analysis'; data: Omit<EntryResponse, 'tree' | 'new_prompts' | 'streak_updated'> }
+  | { type: 'tree'; data: SyncResponse['trees'][number] }
+  | { type: 'prompts'; data: { source: string; prompts: Prompt[] } }
+  | { type: 'weekly'; data: WeeklyInsightsResponse }
+  | { type: 'import'; data: { job_id: string; status: string; total: number; processed: number; failed: number } }
+
+// Open the session's event socket; close the returned socket to stop listening
+export function subscribeToSession(sessionId: string, onEvent: (event: SessionEvent) => void): WebSocket {
+  const url = new URL('/api/ws', API_BASE_URL.replace(/^http/, 'ws'))
+  url.searchParams.set('session_id', sessionId)
+  const socket = new WebSocket(url)
+  socket.onmessage = (message) => {
+    if (message.data !== 'pong') onEvent(JSON.parse(message.data))
+  }
+  return socket
+}
+
 export const apiClient = {
   async createSession(): Promise<SessionResponse> {
     const response = await client.post<SessionResponse>('/api/session')
@@ -127,6 +244,13 @@ export const apiClient = {
     return response.data
   },
 
+  async getHome(sessionId: string, fields?: HomeField[]): Promise<HomeResponse> {
+    const response = await client.get<HomeResponse>('/api/home', {
+      params: { session_id: sessionId, ...(fields ? { fields: fields.join(',') } : {}) },
+    })
+    return response.data
+  },
+
   async getGarden(sessionId: string): Promise<GardenResponse> {
     const response = await client.get<GardenResponse>('/api/garden', {
       params: { session_id: sessionId },
@@ -134,20 +258,39 @@ export const apiClient = {
     return response.data
   },
 
+  async getGardenLayout(sessionId: string, since = 0): Promise<GardenLayoutResponse> {
+    const response = await client.get<GardenLayoutResponse>('/api/garden/layout', {
+      params: { session_id: sessionId, since },
+    })
+    return response.data
+  },
+
+  async getGardenCatalog(): Promise<GardenCatalog> {
+    const response = await client.get<GardenCatalog>('/api/garden/catalog')
+    return response.data
+  },
+
+  async getSync(sessionId: string, since = 0): Promise<SyncResponse> {
+    const response = await client.get<SyncResponse>('/api/sync', {
+      params: { session_id: sessionId, since },
+    })
+    return response.data
+  },
+
   async updateThread(threadId: number, data: ThreadUpdateRequest): Promise<void> {
     await client.post(`/api/threads/${threadId}`, data)
   },
 
-  async getTrends(sessionId: string): Promise<TrendsResponse> {
+  async getTrends(sessionId: string, window: TimeWindow = {}): Promise<TrendsResponse> {
     const response = await client.get<TrendsResponse>('/api/insights/trends', {
-      params: { session_id: sessionId },
+      params: { session_id: sessionId, tz: LOCAL_TIME_ZONE, ...window },
     })
     return response.data
   },
 
-  async getWeeklyInsights(sessionId: string): Promise<WeeklyInsightsResponse> {
+  async getWeeklyInsights(sessionId: string, window: TimeWindow = {}): Promise<WeeklyInsightsResponse> {
     const response = await client.get<WeeklyInsightsResponse>('/api/insights/weekly', {
-      params: { session_id: sessionId },
+      params: { session_id: sessionId, tz: LOCAL_TIME_ZONE, ...window },
     })
     return response.data
   },